@@ -1,132 +1,94 @@
+import os
+import math
 import streamlit as st
-from utils.predictor import predict_needs
-from utils.map_utils import create_map
-
-def show_map():
-    st.header("Opportunities Map")
-    try:
-        df = predict_needs(None)
-    except Exception as e:
-        st.error(f"Cannot load scores: {e}")
-        return
-
-    st.write(df.head())
-    m = create_map(df)
-    st.components.v1.html(m.get_root().render(), height=600)
-import pandas as pd
-import folium
-from folium import Popup
-from streamlit_folium import st_folium
-
-def _marker_color(row):
-    try:
-        if str(row.get("active_posting","False")).lower() in ["1","true","yes"]:
-            return "green"
-        if str(row.get("high_likelihood","False")).lower() in ["1","true","yes"]:
-            return "red"
-        if str(row.get("specialty","HO")).upper() == "PDH":
-            return "lightblue"
-    except Exception:
-        pass
-    return "yellow"
-
-def show_map():
-    df = pd.read_csv("app/data/processed/scores_latest.csv")
-    # Basic validation
-    if df.empty:
-        return None
-
-    # Center map
-    if "lat" in df.columns and "lon" in df.columns:
-        center = [df["lat"].astype(float).mean(), df["lon"].astype(float).mean()]
+from utils.data_cache import contact_index_cached, file_stamp, get_or_build, read_table_cached
+from utils.map_page import build_popup, marker_style, with_changes
+from utils.score_history import SCORE_HISTORY_HIGHLIGHT_DAYS
+from utils.snapshot import flag_changes, highlight_key, scores_map_html
+from utils.spatial import build_grid_index, full_bounds, query_viewport
+from utils.storage import source_path
+# folium and streamlit_folium take about a second to import; they are imported
+# where a map is actually built, so serving the training job's snapshot skips them
+
+SCORES_PATH = 'app/data/processed/scores_latest.csv'
+CONTACTS_PATH = 'app/data/processed/contacts.csv'
+# Viewport mode is the default once the scores table has this many facilities
+VIEWPORT_MIN_ROWS = int(os.environ.get('MAP_VIEWPORT_MIN_ROWS', '2000'))
+
+
+def build_viewport_layer(index, view, contact_index):
+    """FeatureGroup with just the facilities (or cluster cells) inside view's bounds."""
+    import folium
+    from folium import Popup
+    kind, rows = query_viewport(index, view['bounds'], view['zoom'])
+    fg = folium.FeatureGroup(name='facilities')
+    if kind == 'points':
+        for r in rows.to_dict(orient='records'):
+            folium.CircleMarker(location=[r['lat'], r['lon']], popup=Popup(build_popup(r, contact_index), max_width=400),
+                                **marker_style(r)).add_to(fg)
     else:
-        center = [39.5, -98.35]
+        for c in rows.itertuples(index=False):
+            color = 'green' if c.active else ('red' if c.high else 'gray')
+            folium.CircleMarker(location=[c.lat, c.lon], radius=6 + 4 * math.log10(c.count), color=color, fill=True,
+                                fill_color=color, fill_opacity=0.5,
+                                tooltip=f"{c.count} facilities • max score {c.max_score:.2f} • {c.high} high • {c.active} active").add_to(fg)
+    return fg, kind, len(rows)
 
-    m = folium.Map(location=center, zoom_start=6)
 
-    # Load contacts if present
+def _view_from_state(state, default):
+    # st_folium stores the last reported bounds/zoom under its key
     try:
-        contacts = pd.read_csv("app/data/processed/contacts.csv")
-    except Exception:
-        contacts = pd.DataFrame()
-
-    for _, r in df.iterrows():
-        try:
-            lat = float(r.get("lat", 0))
-            lon = float(r.get("lon", 0))
-        except Exception:
-            continue
-        color = _marker_color(r)
-        import pandas as pd
-        import folium
-        from folium import Popup
-        from streamlit_folium import st_folium
-
+        b = state['bounds']
+        bounds = ((b['_southWest']['lat'], b['_southWest']['lng']), (b['_northEast']['lat'], b['_northEast']['lng']))
+        return {'bounds': bounds, 'zoom': int(state['zoom'])}
+    except (KeyError, TypeError, ValueError):
+        return default
 
-        def color_for_row(row):
-            # green: active posting
-            if str(row.get("active_posting", False)).lower() in ["1", "true", "yes"]:
-                return "green"
-            # red: model predicts high likelihood
-            if str(row.get("high_likelihood", False)).lower() in ["1", "true", "yes"]:
-                return "red"
-            # specialty-based colors
-            spec = str(row.get("specialty", "")).upper()
-            if spec == "HO":
-                return "yellow"
-            if spec == "PDH":
-                return "lightblue"
-            return "gray"
 
+def show_change_caption(changes):
+    if changes.empty:
+        return
+    counts = changes['change'].value_counts()
+    st.caption(f"Since {changes['since'].min()}: {counts.get('new red', 0)} newly red, "
+               f"{counts.get('new posting', 0)} with a new active posting (ringed in black)")
 
-        def build_popup(row, contacts_df=None):
-            lines = []
-            lines.append(f"<b>{row.get('facility_name','')}</b>")
-            lines.append(f"Score: {float(row.get('score',0)):.2f}")
-
-            if contacts_df is not None and not contacts_df.empty:
-                subset = contacts_df[contacts_df['facility_id'] == row.get('facility_id')]
-                if not subset.empty:
-                    lines.append('<hr>')
-                    for _, c in subset.sort_values(['contact_rank','last_verified'], ascending=[True, False]).head(4).iterrows():
-                        name = f"{c.get('first_name','')} {c.get('last_name','')}"
-                        title = c.get('title','') or ''
-                        email = c.get('email','') or ''
-                        phone = c.get('phone','') or ''
-                        mobile = c.get('mobile','') or ''
-                        contact_line = f"<b>{name}</b> — {title}<br/>{email}<br/>{phone}{(' • ' + mobile) if mobile else ''}"
-                        lines.append(contact_line)
 
-            # Cold-Call Prep placeholder
-            lines.append('<hr>')
-            lines.append('<i>Cold-Call Prep: check recent postings, outreach history, and notes in the facility profile.</i>')
-            return '<br/>'.join(lines)
+def show_viewport_map(df, stamp, contact_index):
+    import folium
+    from streamlit_folium import st_folium
+    index = get_or_build(('grid_index', SCORES_PATH, stamp), lambda: build_grid_index(df))
+    (south, west), (north, east) = full_bounds(index)
+    center = [(south + north) / 2, (west + east) / 2]
+    initial = {'bounds': ((south, west), (north, east)), 'zoom': 5}
+    view = _view_from_state(st.session_state.get('viewport_map'), initial)
 
+    fg, kind, n = build_viewport_layer(index, view, contact_index)
+    st.caption(f"Showing {n} {'facilities' if kind == 'points' else 'clusters'} in view")
+    # the base map never changes; only the facilities layer is swapped as the view moves
+    m = folium.Map(location=center, zoom_start=5)
+    st_folium(m, key='viewport_map', width=900, height=600, feature_group_to_add=fg,
+              returned_objects=['bounds', 'zoom'])
 
-        def show_map():
-            df = pd.read_csv('app/data/processed/scores_latest.csv')
-            try:
-                contacts = pd.read_csv('app/data/processed/contacts.csv')
-            except Exception:
-                contacts = pd.DataFrame()
 
-            if df.empty:
-                st_folium(folium.Map(location=[39.5, -98.35], zoom_start=4), width=700, height=500)
-                return
+def show_map():
+    stamp = (file_stamp(source_path(SCORES_PATH)), file_stamp(source_path(CONTACTS_PATH)))
+    df = read_table_cached(SCORES_PATH)
+    viewport = st.sidebar.checkbox('Only load facilities in view', value=len(df) >= VIEWPORT_MIN_ROWS)
+    highlight = st.sidebar.checkbox(f'Highlight new reds and postings (last {SCORE_HISTORY_HIGHLIGHT_DAYS} days)', value=True)
+    if not viewport:
+        # the training job's snapshot, rings included, when it matches; else rendered the same way and cached
+        html, changes = scores_map_html(SCORES_PATH, CONTACTS_PATH, highlight)
+        show_change_caption(changes)
+        st.components.v1.html(html, width=900, height=600)
+        return
 
-            center = [df['lat'].astype(float).mean() if 'lat' in df.columns else 39.5,
-                      df['lon'].astype(float).mean() if 'lon' in df.columns else -98.35]
-            m = folium.Map(location=center, zoom_start=5)
+    highlights = highlight_key() if highlight else None
+    changes = flag_changes(highlights)
+    show_change_caption(changes)
+    if not changes.empty:
+        df = with_changes(df, changes)
+        stamp += tuple(sorted(highlights.items()))
+    show_viewport_map(df, stamp, contact_index_cached(CONTACTS_PATH))
 
-            for _, r in df.iterrows():
-                try:
-                    lat = float(r.get('lat', 0))
-                    lon = float(r.get('lon', 0))
-                except Exception:
-                    continue
-                color = color_for_row(r)
-                popup = build_popup(r, contacts)
-                folium.CircleMarker(location=[lat, lon], radius=7, color=color, fill=True, fill_color=color,
-                                    popup=Popup(popup, max_width=400)).add_to(m)
 
-            st_folium(m, width=900, height=600)
+show_map()
@@ -0,0 +1,97 @@
+import os
+import sys
+import pandas as pd
+# Ensure this folder is on sys.path so train_predictor can be imported
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+import train_predictor as tp
+from utils.backtest import (BACKTEST_MIN_PRECISION, BACKTEST_OUT, BACKTEST_REPORT, BACKTEST_SNAPSHOTS,
+                            best_operating_points, current_operating_points, load_snapshots, replay, threshold_curves)
+from utils.instrumentation import run_report, stage
+from utils.scorer import Scorer
+from utils.storage import write_table
+from utils.thresholds import THRESHOLDS_PATH, read_threshold_file
+
+# usage: python app/scripts/backtest_thresholds.py [SNAPSHOTS] [--model NAME=MODEL_JSON ...] [--write-thresholds]
+# Replays labeled snapshots (see utils/backtest.py) through the saved model, any
+# other model versions given with --model, and the heuristic score, and reports
+# precision/recall of the red flag per specialty at the configured thresholds and
+# at the best ones on a 0.05..0.95 grid. --write-thresholds stores the saved
+# model's best-F1 thresholds as the specialty rows of the thresholds table.
+EXTRA_MODELS = [m for m in os.environ.get("BACKTEST_MODELS", "").split(",") if m.strip()]
+
+
+def _parse_args(argv):
+    path, models, i = BACKTEST_SNAPSHOTS, list(EXTRA_MODELS), 0
+    while i < len(argv):
+        if argv[i] == "--model":
+            models.append(argv[i + 1])
+            i += 1
+        elif not argv[i].startswith("--"):
+            path = argv[i]
+        i += 1
+    return path, models
+
+
+def load_models(extra):
+    models = {}
+    if os.path.exists(tp.MODEL_OUT):
+        models["current"] = Scorer.from_model_file(tp.MODEL_OUT)
+    for spec in extra:
+        name, _, path = spec.rpartition("=")
+        models[name or os.path.splitext(os.path.basename(path))[0]] = Scorer.from_model_file(path)
+    models["heuristic"] = tp.heuristic_score
+    return models
+
+
+def write_thresholds(report, model="current", path=THRESHOLDS_PATH):
+    """Replace the specialty-wide rows of the thresholds table with model's best-F1 thresholds."""
+    best = report[report["model"] == model]
+    if best.empty:
+        print(f"[backtest] No '{model}' results; thresholds table left unchanged")
+        return
+    # the file's own rows only: RED_THRESHOLD_* env overrides must not become permanent config
+    table = read_threshold_file(path)
+    keep = table[(table["state"] != "") | ~table["specialty"].isin(best["specialty"])]
+    rows = pd.DataFrame({"specialty": best["specialty"], "state": "", "threshold": best["best_f1_threshold"]})
+    pd.concat([rows, keep], ignore_index=True).to_csv(path, index=False)
+    print(f"[backtest] Wrote {len(rows)} specialty thresholds to {path}")
+
+
+def main():
+    path, extra = _parse_args(sys.argv[1:])
+    with run_report("backtest"):
+        with stage("load") as info:
+            snapshots = load_snapshots(path)
+            info["rows"] = sum(len(df) for _, df in snapshots)
+        if not snapshots:
+            print(f"[backtest] No snapshots at {path}; nothing to do")
+            return
+        with stage("replay") as info:
+            scored = replay(snapshots, load_models(extra), tp.LABEL_CANDIDATES)
+            info["rows"] = len(scored)
+        if scored.empty:
+            print(f"[backtest] No labeled rows ({', '.join(tp.LABEL_CANDIDATES)}) in {path}")
+            return
+        with stage("curves", rows=len(scored)):
+            curves = threshold_curves(scored)
+            report = best_operating_points(curves, current_operating_points(scored))
+        with stage("write", rows=len(curves)):
+            write_table(curves, BACKTEST_OUT)
+            write_table(report, BACKTEST_REPORT)
+
+    print(f"[backtest] {len(snapshots)} snapshots, {scored['snapshot_date'].nunique()} labeled, "
+          f"{len(scored) // scored['model'].nunique()} rows per model")
+    cols = ["model", "specialty", "positives", "current_threshold", "current_precision", "current_recall",
+            "best_f1_threshold", "best_f1_precision", "best_f1_recall", "precision_target_threshold",
+            "precision_target_recall"]
+    print(report[cols].round(3).to_string(index=False))
+    print(f"[backtest] precision_target = best recall with precision >= {BACKTEST_MIN_PRECISION:g}")
+    print(f"[backtest] Wrote {BACKTEST_OUT} and {BACKTEST_REPORT}")
+    if "--write-thresholds" in sys.argv[1:]:
+        write_thresholds(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import mock_sendgrid_server
+
+RECIPIENTS = int(os.environ.get("BENCH_RECIPIENTS", "1000"))
+FACILITIES = int(os.environ.get("BENCH_FACILITIES", "5000"))
+LATENCY_MS = int(os.environ.get("BENCH_LATENCY_MS", "50"))
+RATE_LIMIT_EVERY = int(os.environ.get("BENCH_RATE_LIMIT_EVERY", "50"))
+STATES = ["UT", "CO", "AZ", "NV", "ID", "TX", "CA", "WA"]
+
+
+def synthetic_scores(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "facility_name": [f"Facility {i}" for i in range(n)],
+        "city": rng.choice(["Springfield", "Riverton", "Fairview"], n),
+        "state": rng.choice(STATES, n),
+        "specialty": rng.choice(["HO", "PDH"], n),
+        "score": rng.random(n).round(4),
+    })
+
+
+def synthetic_profiles(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [{"email": f"recruiter{i}@example.com",
+             "states": list(rng.choice(STATES, rng.integers(0, 3), replace=False)),
+             "specialties": list(rng.choice(["HO", "PDH"], rng.integers(0, 2), replace=False))}
+            for i in range(n)]
+
+
+def main():
+    server, url = mock_sendgrid_server.start(latency_ms=LATENCY_MS, rate_limit_every=RATE_LIMIT_EVERY)
+    os.environ.update({"SENDGRID_HOST": url, "SENDGRID_API_KEY": "test", "DIGEST_RETRY_BASE_SECONDS": "0.05"})
+    import send_digest_sendgrid as digest
+
+    df = synthetic_scores(FACILITIES)
+    t0 = time.perf_counter()
+    digests = digest.render_digests(df, synthetic_profiles(RECIPIENTS))
+    render_s = time.perf_counter() - t0
+    print(f"[bench] rendered {len(digests)} digests in {render_s:.2f}s "
+          f"({len({body for _, body in digests})} distinct bodies)")
+
+    for workers in [1, digest.CONCURRENCY, 4 * digest.CONCURRENCY]:
+        subset = digests if workers > 1 else digests[:max(1, len(digests) // 10)]
+        t0 = time.perf_counter()
+        results = digest.deliver_all(subset, concurrency=workers)
+        secs = time.perf_counter() - t0
+        ok = sum(1 for _, status, _ in results if status == 202)
+        retries = sum(attempts - 1 for _, _, attempts in results)
+        print(f"[bench] workers={workers:<3} sent {ok}/{len(subset)} in {secs:.2f}s "
+              f"-> {len(subset) / secs:,.0f} msgs/s, {retries} retries")
+    print(f"[bench] mock server stats: {server.stats}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
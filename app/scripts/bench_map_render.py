@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.map_utils import create_map
+
+SIZES = [1_000, 10_000, 100_000]
+# The per-marker path takes minutes at 100k rows; only time it up to this size
+PER_ROW_MAX = int(os.environ.get("BENCH_PER_ROW_MAX", "10000"))
+
+
+def synthetic_scores(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "facility_id": [f"FAC-{i:06d}" for i in range(n)],
+        "facility_name": [f"Facility {i}" for i in range(n)],
+        "specialty": rng.choice(["HO", "PDH"], n),
+        "lat": rng.uniform(25, 49, n).round(4),
+        "lon": rng.uniform(-124, -67, n).round(4),
+        "likely_procedures": rng.choice(["Lines; peds", "Lines; intubations rare", ""], n),
+        "avg_volume": rng.choice(["8-10", "16-18", ""], n),
+        "pay_expect": rng.choice(["$190-205/hr", "$210-230/hr"], n),
+        "active_posting": rng.integers(0, 2, n),
+        "high_likelihood": rng.random(n) > 0.8,
+        "score": rng.random(n).round(4),
+    })
+
+
+def _time_render(df, bulk):
+    t0 = time.perf_counter()
+    html = create_map(df, contacts_path=None, bulk=bulk).get_root().render()
+    return time.perf_counter() - t0, len(html.encode("utf-8"))
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(f"{'rows':>8} {'mode':>8} {'seconds':>9} {'html_MB':>9}")
+    for n in sizes:
+        df = synthetic_scores(n)
+        modes = [("bulk", True)] + ([("per-row", False)] if n <= PER_ROW_MAX else [])
+        for label, bulk in modes:
+            secs, size = _time_render(df, bulk)
+            print(f"{n:>8} {label:>8} {secs:>9.2f} {size / 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
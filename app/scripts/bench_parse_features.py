@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.features import _parse_num_column, _safe_num
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+# The kinds of cells that show up in facility_features exports
+MESSY_VALUES = [
+    "16-18", " 8 - 10 ", "200", "200.0", "1.15", "", "nan", None, np.nan,
+    "-5", "3-", "n/a", "approx 40", "1e-05", "12-14-16", "1_000", " 45 ",
+]
+
+
+def messy_column(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    numeric = rng.integers(0, 500, n).astype(str)
+    picks = np.array(MESSY_VALUES, dtype=object)[rng.integers(0, len(MESSY_VALUES), n)]
+    # roughly 70% clean numbers, the rest drawn from the messy list
+    return pd.Series(np.where(rng.random(n) < 0.7, numeric, picks), dtype=object)
+
+
+def _time(fn, col):
+    t0 = time.perf_counter()
+    out = fn(col)
+    return time.perf_counter() - t0, out
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(f"{'rows':>9} {'input':>8} {'_safe_num s':>12} {'vectorized s':>13} {'speedup':>8} {'identical':>10}")
+    for n in sizes:
+        inputs = [
+            ("messy", messy_column(n)),
+            ("float", pd.Series(np.random.default_rng(1).normal(50, 80, n))),
+        ]
+        for label, col in inputs:
+            t_old, old = _time(lambda c: c.apply(_safe_num), col)
+            t_new, new = _time(_parse_num_column, col)
+            same = np.array_equal(old.to_numpy(dtype=float), new.to_numpy(dtype=float), equal_nan=True)
+            print(f"{n:>9} {label:>8} {t_old:>12.3f} {t_new:>13.3f} {t_old / max(t_new, 1e-9):>7.1f}x {str(same):>10}")
+
+
+if __name__ == "__main__":
+    main()
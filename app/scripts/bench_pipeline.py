@@ -0,0 +1,85 @@
+import os
+import shutil
+import sys
+import tempfile
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import send_digest_sendgrid as digest
+import train_predictor
+import utils.predictor as predictor
+from utils.contacts import build_contact_index
+from utils.data_cache import evict, map_html_cached
+from utils.instrumentation import load_reports, run_report, stage, stage_table
+from utils.scorer import Scorer
+from utils.storage import read_table, write_table
+from utils.synthetic import LABEL_COL, synthetic_contacts, synthetic_facilities
+from utils.thresholds import flag_high_likelihood
+
+SIZES = [1_000, 10_000, 100_000]
+CONTACTS_PER_FACILITY = int(os.environ.get("BENCH_CONTACTS_PER_FACILITY", "10"))
+# Map rendering is the slowest stage; skip it above this many facilities
+MAP_MAX_ROWS = int(os.environ.get("BENCH_MAP_MAX_ROWS", "100000"))
+
+
+def run_size(n: int, work_dir: str):
+    """One pipeline pass over n synthetic facilities; stages land in a bench_<n> run report."""
+    features_path = os.path.join(work_dir, "facility_features.csv")
+    contacts_path = os.path.join(work_dir, "contacts.csv")
+    scores_path = os.path.join(work_dir, "scores_latest.csv")
+    evict()
+    with run_report(f"bench_{n}") as report:
+        with stage("generate", rows=n):
+            fac = synthetic_facilities(n)
+            contacts = synthetic_contacts(fac, CONTACTS_PER_FACILITY)
+            fac.to_csv(features_path, index=False)
+            contacts.to_csv(contacts_path, index=False)
+        del fac, contacts
+
+        with stage("read_features", rows=n):
+            df = read_table(features_path)
+        _, coefs = train_predictor.fit_logit(df, LABEL_COL)
+        with stage("score", rows=n):
+            df["score"] = Scorer(coefs).score(df).round(4)
+        with stage("flag", rows=n):
+            df["high_likelihood"] = flag_high_likelihood(df)
+        with stage("write_scores", rows=n):
+            write_table(df, scores_path)
+
+        with stage("contact_index") as info:
+            contacts = read_table(contacts_path)
+            index = build_contact_index(contacts)
+            info["rows"] = len(contacts)
+        del contacts
+
+        # predict_needs merges uploads against the scores file it is configured with
+        predictor.SCORES_PATH = scores_path
+        with stage("predict_needs_merge", rows=n):
+            predictor.predict_needs(df[["facility_id", "facility_name", "specialty"]], scorer=Scorer(coefs))
+        with stage("load_scores", rows=n):
+            digest.top_per_specialty(read_table(scores_path, columns=digest.DIGEST_COLUMNS))
+
+        if n <= MAP_MAX_ROWS:
+            map_html_cached(df, contacts_path=contacts_path)
+        del index
+    return report
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        for n in sizes:
+            report = run_size(n, work_dir).to_dict()
+            history = load_reports(job=f"bench_{n}")[1:]
+            table = stage_table(report, history)
+            print(f"\n[bench] {n:,} facilities, {report['total_seconds']:.1f}s total, peak RSS {report['peak_rss_mb']:.0f} MB")
+            print(table.to_string(index=False))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
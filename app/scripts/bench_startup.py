@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+# Modules each entry point imports before drawing anything
+IMPORTS = {
+    "streamlit_app": ["streamlit", "utils.data_cache", "utils.ingest", "utils.instrumentation",
+                      "utils.ranking", "utils.snapshot"],
+    "map_page": ["streamlit", "utils.contacts", "utils.data_cache", "utils.snapshot", "utils.spatial"],
+    "folium (map build)": ["folium", "streamlit_folium"],
+}
+MAP_PAGE = "app/pages/1_Map.py"
+# Fail (exit 1) when a cold Map page first view takes longer than this; 0 disables the check
+BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", "0"))
+
+_IMPORT_SNIPPET = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+for m in sys.argv[1:]:
+    importlib.import_module(m)
+print(json.dumps({"seconds": time.perf_counter() - t0}))
+"""
+
+_PAGE_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300).run()
+print(json.dumps({"seconds": time.perf_counter() - t0, "folium_imported": "folium" in sys.modules,
+                  "error": [str(e.value) for e in at.exception]}))
+"""
+
+
+def _fresh_python(snippet, args, **env):
+    """Run snippet in a new interpreter (nothing imported or cached yet); returns its JSON line."""
+    full_env = dict(os.environ, PYTHONPATH=repo_root, **env)
+    out = subprocess.run([sys.executable, "-c", snippet, *args], cwd=repo_root, env=full_env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'imports':<22} {'seconds':>8}")
+    for label, modules in IMPORTS.items():
+        print(f"{label:<22} {_fresh_python(_IMPORT_SNIPPET, modules)['seconds']:>8.2f}")
+
+    print(f"\n{'map page first view':<22} {'seconds':>8} {'folium':>7}")
+    cold = None
+    for label, flag in [("with snapshot", "1"), ("without snapshot", "0")]:
+        res = _fresh_python(_PAGE_SNIPPET, [MAP_PAGE], MAP_SNAPSHOT=flag)
+        if res["error"]:
+            print(f"  {label}: page raised {res['error']}")
+        print(f"{label:<22} {res['seconds']:>8.2f} {str(res['folium_imported']):>7}")
+        cold = res["seconds"] if cold is None else cold
+    if BUDGET_SECONDS and cold > BUDGET_SECONDS:
+        sys.exit(f"[startup] Map page first view took {cold:.2f}s, budget {BUDGET_SECONDS:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.posting_features import POSTINGS_LOG_PATH, POSTINGS_STATE_DIR, update_posting_features, update_posting_windows
+
+# usage: python app/scripts/build_posting_features.py [FEATURES_CSV] [--rebuild]
+# Folds new rows of the postings log into the saved window state and writes
+# postings_90d / postings_365d / competitor_postings_30d / last_post_days into
+# the features table. --rebuild first rescans the whole log into fresh state.
+DEFAULT_TABLE = "app/data/processed/facility_features.csv"
+
+
+def main():
+    args = [a for a in sys.argv[1:] if a != "--rebuild"]
+    path = args[0] if args else DEFAULT_TABLE
+    if not os.path.exists(POSTINGS_LOG_PATH):
+        print(f"[postings] No postings log at {POSTINGS_LOG_PATH}; nothing to do")
+        return
+    if "--rebuild" in sys.argv[1:]:
+        _, _, rows = update_posting_windows(POSTINGS_LOG_PATH, POSTINGS_STATE_DIR, rebuild=True)
+        print(f"[postings] Rebuilt state from {rows} postings")
+    stats = update_posting_features(path)
+    print(f"[postings] {stats['new_postings']} new postings as of {stats['as_of']}, "
+          f"{stats['tracked']} facility/specialty windows, state {POSTINGS_STATE_DIR}")
+    print(f"[postings] Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+# Ensure this folder is on sys.path so train_predictor can be imported
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+import train_predictor as tp
+from sklearn.metrics import log_loss, roc_auc_score
+
+# Compare the in-memory statsmodels fit with the streaming SGD fit on one labeled history.
+# Usage: python app/scripts/compare_streaming_fit.py [history.csv|.parquet]
+# (the statsmodels side loads the whole file, so use a sample that fits in memory)
+
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, secs, peak / 1e6
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else tp.HISTORY_PATH
+    cols = tp.table_columns(path)
+    y_col = next((c for c in tp.LABEL_CANDIDATES if c in cols), None)
+    if not y_col:
+        raise SystemExit(f"No label column ({', '.join(tp.LABEL_CANDIDATES)}) in {path}")
+
+    df = tp.read_table(path)
+    df = df[df[y_col].notna()]
+    y = df[y_col].astype(float).clip(0, 1).to_numpy()
+
+    (_, sm_coefs), sm_secs, sm_mb = _measure(lambda: tp.fit_logit(df, y_col))
+    sgd_coefs, sgd_secs, sgd_mb = _measure(lambda: tp.fit_logit_streaming(path, y_col))
+    if sm_coefs is None or sgd_coefs is None:
+        raise SystemExit("Not enough label variation to fit")
+
+    coefs = pd.DataFrame({"statsmodels": pd.Series(sm_coefs), "streaming": pd.Series(sgd_coefs)})
+    coefs["diff"] = coefs["streaming"] - coefs["statsmodels"]
+    print(f"[compare] {len(df)} labeled rows from {path}, label {y_col}")
+    print(coefs.to_string(float_format=lambda v: f"{v:.5f}"))
+
+    print(f"\n{'fit':>12} {'seconds':>9} {'peak_MB':>9} {'log_loss':>9} {'auc':>7}")
+    for name, c, secs, mb in [("statsmodels", sm_coefs, sm_secs, sm_mb), ("streaming", sgd_coefs, sgd_secs, sgd_mb)]:
+        p = np.clip(tp.apply_coefs(df, c).to_numpy(), 1e-9, 1 - 1e-9)
+        print(f"{name:>12} {secs:>9.2f} {mb:>9.1f} {log_loss(y, p):>9.4f} {roc_auc_score(y, p):>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
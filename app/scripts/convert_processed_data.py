@@ -0,0 +1,31 @@
+import os
+import sys
+import pandas as pd
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.storage import HAVE_PARQUET, normalize_types, parquet_path
+
+# Hand-maintained inputs; scores_latest is written in both formats by train_predictor
+TABLES = [
+    "app/data/processed/facility_features.csv",
+    "app/data/processed/contacts.csv",
+    "app/data/processed/scores_latest.csv",
+]
+
+
+def main():
+    if not HAVE_PARQUET:
+        raise SystemExit("pyarrow is not installed; nothing to convert")
+    for csv_path in sys.argv[1:] or TABLES:
+        if not os.path.exists(csv_path):
+            print(f"[convert] Skipping missing {csv_path}")
+            continue
+        out = parquet_path(csv_path)
+        normalize_types(pd.read_csv(csv_path)).to_parquet(out, index=False)
+        print(f"[convert] {csv_path} -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.forecast import FORECAST_OUT, run_forecast
+from utils.instrumentation import run_report
+
+# usage: python app/scripts/forecast_openings.py [SCORES_CSV]
+# Run after train_predictor.py: updates the per-facility posting models from the
+# posting window state and writes predicted opening dates for the Calendar View.
+DEFAULT_TABLE = "app/data/processed/scores_latest.csv"
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE
+    with run_report("forecast"):
+        stats = run_forecast(path)
+    print(f"[forecast] {stats['rows']} rows as of {stats['as_of']}: {stats['tracked']} posting series, "
+          f"{stats['refitted']} refitted")
+    print(f"[forecast] Wrote {FORECAST_OUT}")
+
+
+if __name__ == "__main__":
+    main()
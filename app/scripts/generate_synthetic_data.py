@@ -0,0 +1,24 @@
+import os
+import sys
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.synthetic import write_synthetic
+
+# usage: python app/scripts/generate_synthetic_data.py OUT_DIR [FACILITIES] [CONTACTS_PER_FACILITY]
+# Never point OUT_DIR at app/data/processed: it would overwrite the real tables.
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("usage: generate_synthetic_data.py OUT_DIR [FACILITIES] [CONTACTS_PER_FACILITY]")
+    out_dir = sys.argv[1]
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    per = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    for path in write_synthetic(out_dir, n, per):
+        print(f"[synthetic] Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
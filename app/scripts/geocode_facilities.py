@@ -0,0 +1,31 @@
+import os
+import sys
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.geocode import GEOCODE_CACHE_PATH, GEOCODER, fill_missing_coordinates
+from utils.storage import read_table, write_table
+
+# usage: python app/scripts/geocode_facilities.py [TABLE_CSV] [--write]
+# Resolves missing lat/lon into the geocode cache (the training job then fills them
+# without any lookups); --write also saves the filled coordinates back to the table.
+DEFAULT_TABLE = "app/data/processed/facility_features.csv"
+
+
+def main():
+    args = [a for a in sys.argv[1:] if a != "--write"]
+    path = args[0] if args else DEFAULT_TABLE
+    df = read_table(path)
+    out, stats = fill_missing_coordinates(df)
+    filled = stats["facility"] + stats["city"]
+    print(f"[geocode] {path}: {stats['missing']} rows missing coordinates, filled {filled} "
+          f"({stats['facility']} facility-level, {stats['city']} city-level)")
+    print(f"[geocode] backend={GEOCODER}, {stats['lookups']} lookups, {stats['errors']} failed, cache {GEOCODE_CACHE_PATH}")
+    if "--write" in sys.argv[1:] and filled:
+        write_table(out, path)
+        print(f"[geocode] Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Local stand-in for the SendGrid mail endpoint, for testing digest delivery.
+
+Accepts POST /v3/mail/send and answers 202. Optional failure injection:
+  MOCK_RATE_LIMIT_EVERY=N  -> every Nth request gets 429 with Retry-After
+  MOCK_ERROR_EVERY=N       -> every Nth request gets 500
+  MOCK_LATENCY_MS=N        -> sleep N ms per request
+
+    python app/scripts/mock_sendgrid_server.py 8025
+    SENDGRID_HOST=http://127.0.0.1:8025 SENDGRID_API_KEY=test python app/scripts/send_digest_sendgrid.py
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockSendGrid(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, rate_limit_every=0, error_every=0, latency_ms=0, retry_after=0):
+        super().__init__(addr, _Handler)
+        self.rate_limit_every = rate_limit_every
+        self.error_every = error_every
+        self.latency_ms = latency_ms
+        self.retry_after = retry_after
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "accepted": 0, "rate_limited": 0, "errors": 0}
+
+    def next_status(self):
+        with self._lock:
+            n = next(self._counter)
+            self.stats["requests"] += 1
+            if self.rate_limit_every and n % self.rate_limit_every == 0:
+                self.stats["rate_limited"] += 1
+                return 429
+            if self.error_every and n % self.error_every == 0:
+                self.stats["errors"] += 1
+                return 500
+            self.stats["accepted"] += 1
+            return 202
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, like the real endpoint, so the digest's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.rstrip("/") != "/v3/mail/send":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000.0)
+        status = self.server.next_status()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port=0, **kwargs):
+    """Start the mock in a background thread; returns (server, base_url)."""
+    server = MockSendGrid(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8025
+    server = MockSendGrid(
+        ("127.0.0.1", port),
+        rate_limit_every=int(os.environ.get("MOCK_RATE_LIMIT_EVERY", "0")),
+        error_every=int(os.environ.get("MOCK_ERROR_EVERY", "0")),
+        latency_ms=int(os.environ.get("MOCK_LATENCY_MS", "0")),
+    )
+    print(f"[mock-sendgrid] listening on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"[mock-sendgrid] {server.stats}")
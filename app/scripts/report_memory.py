@@ -0,0 +1,37 @@
+import os
+import sys
+import numpy as np
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.storage import compact_types, memory_report, read_table
+from utils.synthetic import synthetic_facilities
+
+# usage: python app/scripts/report_memory.py [TABLE_CSV ...]
+# Without arguments, reports the scores table and a 100k-row synthetic scores table.
+DEFAULT_TABLES = ["app/data/processed/scores_latest.csv"]
+SYNTHETIC_ROWS = int(os.environ.get("REPORT_SYNTHETIC_ROWS", "100000"))
+
+
+def _print(label, before):
+    report = memory_report(before, compact_types(before))
+    total = report.iloc[-1]
+    print(f"\n[memory] {label}: {len(before):,} rows, {total['bytes_before'] / 2**20:.1f} MB -> "
+          f"{total['bytes_after'] / 2**20:.1f} MB ({total['bytes_after'] / max(total['bytes_before'], 1):.0%})")
+    print(report.to_string(index=False))
+
+
+def main():
+    for path in sys.argv[1:] or DEFAULT_TABLES:
+        _print(path, read_table(path))
+    if not sys.argv[1:] and SYNTHETIC_ROWS:
+        df = synthetic_facilities(SYNTHETIC_ROWS)
+        rng = np.random.default_rng(0)
+        df["score"] = rng.random(len(df)).round(4)
+        df["high_likelihood"] = df["score"] >= 0.7
+        _print("synthetic scores", df)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,252 @@
 import os
-import pandas as pd
+import random
 import sys
-import os
+import time
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
 # Ensure repo root is on sys.path so config can be imported
 repo_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if repo_root not in sys.path:
     sys.path.insert(0, repo_root)
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
-from config import EMAIL_RECIPIENTS
+from config import RECIPIENT_PROFILES
+from utils.instrumentation import run_report, stage
+from utils.ranking import top_n_per_group
+from utils.score_history import SCORE_HISTORY_PATH, changes_after, get_cursors, last_run_id, set_cursors
+from utils.storage import fill_text, read_table
 
 SCORES_PATH = "app/data/processed/scores_latest.csv"
 TOP_N = int(os.environ.get("DIGEST_TOP_N", "20"))
 SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
 FROM_EMAIL = os.environ.get("MAIL_FROM", "locum-agent@yourdomain.com")
+# Point at a local stand-in (see mock_sendgrid_server.py) to test delivery without the real service
+SENDGRID_HOST = os.environ.get("SENDGRID_HOST", "https://api.sendgrid.com")
+RECIPIENTS_PATH = os.environ.get("DIGEST_RECIPIENTS_PATH")
+CONCURRENCY = int(os.environ.get("DIGEST_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.environ.get("DIGEST_MAX_RETRIES", "4"))
+RETRY_BASE_SECONDS = float(os.environ.get("DIGEST_RETRY_BASE_SECONDS", "1.0"))
+SEND_TIMEOUT_SECONDS = float(os.environ.get("DIGEST_SEND_TIMEOUT_SECONDS", "30"))
+SUBJECT = "Daily Locum Need Digest"
+# delta: only what changed since the last digest (from the score history); full: the top-N every time
+DIGEST_MODE = os.environ.get("DIGEST_MODE", "delta").lower()
+# Smallest score increase listed under "Biggest score increases" in a delta digest
+DIGEST_MIN_MOVE = float(os.environ.get("DIGEST_MIN_MOVE", "0.05"))
+# Only these columns are needed to build the digest
+DIGEST_COLUMNS = ["facility_id", "facility_name", "Facility Name", "facility", "city", "state", "specialty", "score"]
 
 
 def load_scores():
-    df = pd.read_csv(SCORES_PATH)
+    return top_per_specialty(read_table(SCORES_PATH, columns=DIGEST_COLUMNS))
+
+
+def top_per_specialty(df: pd.DataFrame) -> pd.DataFrame:
     # Return top-N per specialty combined
-    out = []
-    for spec in ["HO", "PDH"]:
-        d = df[df.get('specialty') == spec].sort_values('score', ascending=False).head(TOP_N)
-        out.append(d)
-    if out:
-        return pd.concat(out, ignore_index=True)
-    return df
+    return top_n_per_group(df, TOP_N, by="specialty").reset_index(drop=True)
 
 
-def build_email_body(df: pd.DataFrame) -> str:
-    rows = df.to_dict(orient="records")
-    html = "<h3>Top Facilities Likely to Need Locum Coverage</h3><ul>"
-    for row in rows:
+def _facility_items(df: pd.DataFrame, moves: bool = False) -> str:
+    html = ""
+    for row in df.to_dict(orient="records"):
         name = row.get('facility_name') or row.get('Facility Name') or row.get('facility')
         city = row.get('city','')
         state = row.get('state','')
         spec = row.get('specialty','')
         score = float(row.get('score',0))
-        html += f"<li><b>{name}</b> in {city}, {state} — {spec} (score: {score:.2f})</li>"
-    html += "</ul>"
+        prev = row.get('prev_score')
+        change = f"{float(prev):.2f} → {score:.2f}" if moves and pd.notna(prev) else f"{score:.2f}"
+        html += f"<li><b>{name}</b> in {city}, {state} — {spec} (score: {change})</li>"
     return html
 
 
-def send_email(html_body: str):
+def build_email_body(df: pd.DataFrame) -> str:
+    return "<h3>Top Facilities Likely to Need Locum Coverage</h3><ul>" + _facility_items(df) + "</ul>"
+
+
+def build_delta_body(changes: pd.DataFrame):
+    """Digest of what changed since the last one; None if nothing worth sending changed."""
+    active = changes[changes["newly_active"]]
+    red = changes[changes["newly_red"] & ~changes["newly_active"]]
+    rest = changes[~changes["newly_red"] & ~changes["newly_active"]]
+    rising = rest[rest["score"] - rest["prev_score"] >= DIGEST_MIN_MOVE]
+    rising = rising.assign(move=rising["score"] - rising["prev_score"]).nlargest(TOP_N, "move")
+    sections = [("New active postings", active), ("Newly high likelihood", red), ("Biggest score increases", rising)]
+    html = "".join(f"<h3>{title}</h3><ul>{_facility_items(rows.sort_values('score', ascending=False), moves=True)}</ul>"
+                   for title, rows in sections if not rows.empty)
+    return html or None
+
+
+def cursor_name(email: str) -> str:
+    # one cursor per recipient, so a failed delivery only holds back that recipient's changes
+    return "digest:" + email.strip().lower()
+
+
+def recipient_cursors(profiles) -> dict:
+    """{email: last run covered by a digest sent to it}; None for recipients that never got one."""
+    if DIGEST_MODE != "delta" or not os.path.exists(SCORE_HISTORY_PATH):
+        return {p["email"]: None for p in profiles}
+    cursors = get_cursors("digest:")
+    return {p["email"]: cursors.get(cursor_name(p["email"])) for p in profiles}
+
+
+def load_changes(scores: pd.DataFrame, since: int):
+    """(changes in the runs after `since`, joined to the facility columns of scores, last recorded run id)."""
+    changes, last_run = changes_after(since)
+    key = [c for c in ["facility_id", "specialty"] if c in scores.columns]
+    if "facility_id" in key and not changes.empty:
+        # blank specialties are "" in the history; key both sides the same way
+        info = scores.drop(columns=["score"]).assign(**{c: fill_text(scores[c]) for c in key}).drop_duplicates(key)
+        changes = changes.assign(**{c: fill_text(changes[c]) for c in key}).merge(info, on=key, how="left")
+    # facilities that left the scores table have no score to report
+    return changes[changes["score"].notna()], last_run
+
+
+def render_all(df: pd.DataFrame, profiles, cursors) -> list:
+    """(email, html) per recipient: a delta digest from its cursor, or the full digest if it has none.
+
+    The full digest then sets the recipient's starting point. Recipients at the same cursor share one
+    read of the history; those with nothing new are left out.
+    """
+    groups = {}
+    for p in profiles:
+        groups.setdefault(cursors[p["email"]], []).append(p)
+    digests = []
+    for since, group in groups.items():
+        if since is None:
+            digests += render_digests(df, group)
+        else:
+            digests += render_digests(load_changes(df, since)[0], group, build=build_delta_body)
+    return digests
+
+
+def load_recipient_profiles():
+    """Recipients with their state/specialty filters (empty list = no filter)."""
+    if not RECIPIENTS_PATH:
+        return RECIPIENT_PROFILES
+    df = pd.read_csv(RECIPIENTS_PATH, dtype=str).fillna("")
+    split = lambda v: [p.strip() for p in str(v).split(";") if p.strip()]
+    return [{"email": r["email"].strip(), "states": split(r.get("states", "")), "specialties": split(r.get("specialties", ""))}
+            for r in df.to_dict(orient="records") if r.get("email", "").strip()]
+
+
+def render_digests(df: pd.DataFrame, profiles, build=None) -> list:
+    """(email, html) per recipient; recipients sharing the same filters share one rendered body.
+
+    build turns the recipient's rows into a body (default: the top-N per specialty); recipients
+    whose body is None are skipped.
+    """
+    if build is None:
+        build = lambda rows: build_email_body(top_per_specialty(rows))
+    bodies = {}
+    out = []
+    for p in profiles:
+        key = (tuple(sorted(p.get("states") or [])), tuple(sorted(p.get("specialties") or [])))
+        if key not in bodies:
+            mask = pd.Series(True, index=df.index)
+            if key[0] and "state" in df.columns:
+                mask &= df["state"].isin(key[0])
+            if key[1] and "specialty" in df.columns:
+                mask &= df["specialty"].isin(key[1])
+            bodies[key] = build(df[mask])
+        if bodies[key] is not None:
+            out.append((p["email"], bodies[key]))
+    return out
+
+
+def _session(pool_size: int = CONCURRENCY) -> requests.Session:
+    """Session keeping up to pool_size keep-alive connections to SENDGRID_HOST, shared by the workers.
+
+    SendGridAPIClient opens a new connection (and TLS handshake) for every message, so the
+    messages are posted with the client's own JSON payload (Mail.get()) over this pool instead.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Authorization": f"Bearer {SENDGRID_API_KEY}", "Content-Type": "application/json"})
+    return session
+
+
+def _retry_delay(attempt: int, err=None) -> float:
+    retry_after = None
+    headers = getattr(err, "headers", None)
+    if headers is not None:
+        retry_after = headers.get("Retry-After")
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return RETRY_BASE_SECONDS * (2 ** attempt) * (0.5 + random.random())
+
+
+def retryable(status) -> bool:
+    """Whether a failed send may succeed later: no response, 429 or 5xx."""
+    return status is None or status == 429 or status >= 500
+
+
+def send_one(email: str, html_body: str, session: requests.Session):
+    """Send one digest, retrying 429/5xx and connection errors with exponential backoff.
+
+    Returns (email, status_code, attempts); status_code is None if the send never got a response.
+    """
+    message = Mail(from_email=FROM_EMAIL, to_emails=email, subject=SUBJECT, html_content=html_body).get()
+    status = None
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.post(SENDGRID_HOST.rstrip("/") + "/v3/mail/send", json=message, timeout=SEND_TIMEOUT_SECONDS)
+        except OSError as e:  # requests' connection errors and timeouts are OSErrors
+            status, err = None, e
+        else:
+            status, err = response.status_code, response
+            if not retryable(status):
+                return email, status, attempt + 1
+        if attempt < MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, err))
+    return email, status, MAX_RETRIES + 1
+
+
+def deliver_all(digests, concurrency: int = CONCURRENCY) -> list:
+    """Send (email, html) pairs with at most `concurrency` requests in flight, over one connection pool."""
     if not SENDGRID_API_KEY:
         raise ValueError("Missing SENDGRID_API_KEY")
-    message = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=EMAIL_RECIPIENTS,
-        subject="Daily Locum Need Digest",
-        html_content=html_body,
-    )
-    sg = SendGridAPIClient(SENDGRID_API_KEY)
-    resp = sg.send(message)
-    return resp.status_code
+    with _session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda d: send_one(*d, session), digests))
 
 
 def main():
-    df = load_scores()
-    body = build_email_body(df)
-    status = send_email(body)
-    print(f"Sent via SendGrid, status: {status}")
+    with run_report("digest"):
+        with stage("load") as info:
+            df = read_table(SCORES_PATH, columns=DIGEST_COLUMNS)
+            profiles = load_recipient_profiles()
+            cursors = recipient_cursors(profiles)
+            last_run = last_run_id() if os.path.exists(SCORE_HISTORY_PATH) and DIGEST_MODE == "delta" else None
+            info["rows"] = len(df)
+        with stage("render") as info:
+            digests = render_all(df, profiles, cursors)
+            info["rows"] = len(digests)
+        # recipients with nothing new since their last digest are up to date without an email
+        sending = {email for email, _ in digests}
+        idle = [cursor_name(p["email"]) for p in profiles if p["email"] not in sending]
+        if last_run is not None and idle:
+            set_cursors(idle, last_run)
+        if not digests:
+            print("No changes since the last digest; nothing sent")
+            return
+        with stage("deliver", rows=len(digests)):
+            results = deliver_all(digests)
+    ok = sum(1 for _, status, _ in results if status is not None and 200 <= status < 300)
+    retried = sum(1 for _, _, attempts in results if attempts > 1)
+    print(f"Sent via SendGrid: {ok}/{len(results)} delivered, {retried} needed retries")
+    for email, status, attempts in results:
+        if retryable(status):
+            print(f"  failed: {email} (status {status}, {attempts} attempts); its changes go out with the next digest")
+        elif not 200 <= status < 300:
+            print(f"  rejected: {email} (status {status}); not retried, its cursor moves on")
+    # a retryable failure keeps that recipient's cursor, so the next digest repeats these changes;
+    # a rejected one (e.g. an invalid address) would fail the same way every time
+    done = [cursor_name(email) for email, status, _ in results if not retryable(status)]
+    if last_run is not None and done:
+        set_cursors(done, last_run)
+        print(f"Digest covers score history up to run {last_run} for {len(done)} recipients")
 
 
 if __name__ == '__main__':
@@ -1,65 +1,64 @@
 import os
+import sys
 import json
+import hashlib
 import numpy as np
 import pandas as pd
 import statsmodels.api as sm
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+# Ensure repo root is on sys.path so utils can be imported
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+from utils.facility_index import NAME_COLUMNS, normalize_names
+from utils.features import FEATURE_CANDIDATES, _parse_num_column, _safe_num, build_matrix  # noqa: F401
+from utils.geocode import fill_missing_coordinates
+from utils.instrumentation import run_report, stage, timed
+from utils.posting_features import POSTINGS_LOG_PATH, apply_posting_features, update_posting_windows
+from utils.ranking import top_n_per_group
+from utils.score_history import SCORE_HISTORY_PATH, record_scores
+from utils.scorer import Scorer, segment_keys
+from utils.snapshot import write_map_snapshot
+from utils.storage import iter_table_chunks, read_table, table_columns, write_table
+from utils.thresholds import DEFAULT_RED_THRESHOLD, flag_high_likelihood  # noqa: F401
 
 # -------- Paths (edit only if my repo differs) --------
 DATA_PATH = "app/data/processed/facility_features.csv"
+# Labeled history to fit on; defaults to the current features table
+HISTORY_PATH = os.environ.get("HISTORY_PATH", DATA_PATH)
 SCORES_OUT = "app/data/processed/scores_latest.csv"
 MODEL_OUT = "app/models/predictor_logit.json"
 
 # -------- Thresholds --------
-# Global default; can be overridden via env:
-DEFAULT_RED_THRESHOLD = float(os.environ.get("RED_THRESHOLD", "0.70"))
-
-# Optional per-specialty overrides via env:
-#   RED_THRESHOLD_HO=0.68
-#   RED_THRESHOLD_PDH=0.72
-RED_THRESHOLD_HO = os.environ.get("RED_THRESHOLD_HO")
-RED_THRESHOLD_PDH = os.environ.get("RED_THRESHOLD_PDH")
-
-FEATURE_CANDIDATES = [
-    "postings_90d", "postings_365d", "last_post_days",
-    "competitor_postings_30d", "census_index", "seasonality_index",
-    "turnover_index", "credentialing_days", "beds"
-]
-
-def _safe_num(x):
-    """Convert text ranges like '16-18' -> 17; leave numbers as float; NaNs -> np.nan."""
-    if pd.isna(x):
-        return np.nan
-    s = str(x).strip()
-    if "-" in s:
-        try:
-            parts = [float(p) for p in s.split("-") if p.strip() != ""]
-            return float(np.mean(parts)) if parts else np.nan
-        except:
-            return np.nan
-    try:
-        return float(s)
-    except:
-        return np.nan
-
-def build_matrix(df: pd.DataFrame) -> pd.DataFrame:
-    X = pd.DataFrame()
-    for col in FEATURE_CANDIDATES:
-        if col in df.columns:
-            X[col] = df[col].apply(_safe_num)
-        else:
-            X[col] = 0.0
-
-    # Recency helper boosts recent activity
-    if "last_post_days" in X.columns:
-        X["recency_1_over"] = 1.0 / (1.0 + X["last_post_days"].fillna(999))
-    else:
-        X["recency_1_over"] = 0.0
-
-    # Fill remaining NaNs and add intercept
-    X = X.fillna(0.0)
-    X = sm.add_constant(X, has_constant="add")
-    return X
+# RED_THRESHOLD (default 0.70), RED_THRESHOLD_<SPECIALTY> env vars and the
+# optional per-specialty/per-state table in app/data/thresholds.csv;
+# see utils/thresholds.py.
+
+# -------- Scoring mode --------
+# full:        refit the model and rescore every row
+# incremental: reuse the saved coefficients and rescore only rows whose features changed
+# auto:        incremental while the saved model is younger than REFIT_MAX_AGE_HOURS, else full
+SCORE_MODE = os.environ.get("SCORE_MODE", "auto").lower()
+REFIT_MAX_AGE_HOURS = float(os.environ.get("REFIT_MAX_AGE_HOURS", "24"))
+
+# -------- Fitting --------
+# statsmodels: sm.Logit on the whole table in memory (default)
+# streaming:   mini-batch SGD logistic regression over chunks of HISTORY_PATH,
+#              for histories that don't fit in memory
+FIT_MODE = os.environ.get("FIT_MODE", "statsmodels").lower()
+FIT_CHUNK_ROWS = int(os.environ.get("FIT_CHUNK_ROWS", "200000"))
+FIT_EPOCHS = int(os.environ.get("FIT_EPOCHS", "5"))
+LABEL_CANDIDATES = ["had_locum_next_45d", "need_within_45d", "need_within_30d"]
+
+# -------- Segmented models --------
+# e.g. SEGMENT_BY=specialty or SEGMENT_BY=specialty,state fits one extra model per
+# segment (in parallel); segments under MIN_SEGMENT_ROWS rows use the global model.
+SEGMENT_BY = [c.strip() for c in os.environ.get("SEGMENT_BY", "").split(",") if c.strip()]
+MIN_SEGMENT_ROWS = int(os.environ.get("MIN_SEGMENT_ROWS", "200"))
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", "0")) or None  # None = one per CPU
+# Rows per specialty printed in the run preview
+PREVIEW_ROWS = int(os.environ.get("PREVIEW_ROWS", "5"))
 
 def heuristic_score(df: pd.DataFrame) -> pd.Series:
     """Fallback 0..1 score when no labels are available."""
@@ -93,6 +92,7 @@ def heuristic_score(df: pd.DataFrame) -> pd.Series:
     lin = (lin - lin.min()) / (lin.max() - lin.min() + 1e-9)
     return lin.clip(0, 1)
 
+@timed("fit")
 def fit_logit(df: pd.DataFrame, y_col: str):
     X = build_matrix(df)
     y = df[y_col].astype(float).clip(0,1)
@@ -103,78 +103,278 @@ def fit_logit(df: pd.DataFrame, y_col: str):
     coefs = dict(model.params)
     return proba, coefs
 
+def _xy_chunks(path: str, y_col: str, chunk_rows: int):
+    """(features without const, labels) as numpy arrays per chunk of the history file."""
+    cols = FEATURE_CANDIDATES + [y_col]
+    for chunk in iter_table_chunks(path, chunk_rows, columns=cols):
+        chunk = chunk[chunk[y_col].notna()]
+        if chunk.empty:
+            continue
+        X = build_matrix(chunk).drop(columns="const")
+        yield X, chunk[y_col].astype(float).clip(0,1).to_numpy()
+
+@timed("fit.streaming")
+def fit_logit_streaming(path: str, y_col: str, chunk_rows: int = FIT_CHUNK_ROWS, epochs: int = FIT_EPOCHS, seed: int = 0):
+    """Mini-batch SGD logistic regression over a chunked history; coefs keyed like fit_logit's.
+
+    One pass collects per-column mean/std so SGD runs on standardized features;
+    the learned weights are mapped back to the raw scale so apply_coefs and the
+    Scorer can use them unchanged. Returns None if the labels never vary.
+    """
+    from sklearn.linear_model import SGDClassifier
+
+    n, sums, sq, seen = 0, None, None, set()
+    for X, y in _xy_chunks(path, y_col, chunk_rows):
+        v = X.to_numpy(dtype=float)
+        sums = v.sum(axis=0) if sums is None else sums + v.sum(axis=0)
+        sq = (v ** 2).sum(axis=0) if sq is None else sq + (v ** 2).sum(axis=0)
+        n += len(v)
+        seen.update(np.unique(y).tolist())
+        cols = list(X.columns)
+    if n == 0 or len(seen) < 2:
+        return None
+    mean = sums / n
+    std = np.sqrt(np.maximum(sq / n - mean ** 2, 0.0))
+    std[std == 0] = 1.0
+
+    # averaged SGD with a small constant step settles close to the unpenalized MLE
+    clf = SGDClassifier(loss="log_loss", penalty=None, learning_rate="constant", eta0=0.01, average=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        for X, y in _xy_chunks(path, y_col, chunk_rows):
+            order = rng.permutation(len(y))
+            clf.partial_fit(((X.to_numpy(dtype=float) - mean) / std)[order], y[order], classes=np.array([0.0, 1.0]))
+
+    w = clf.coef_[0] / std
+    coefs = {"const": float(clf.intercept_[0] - (w * mean).sum())}
+    coefs.update({c: float(v) for c, v in zip(cols, w)})
+    return coefs
+
 def apply_coefs(df: pd.DataFrame, coefs: dict) -> pd.Series:
-    X = build_matrix(df)
-    z = 0.0
-    for k, v in coefs.items():
-        if k in X.columns:
-            z += X[k] * float(v)
-    return 1 / (1 + np.exp(-z))
-
-def _threshold_for_spec(spec: str) -> float:
-    if spec == "HO" and RED_THRESHOLD_HO is not None:
-        try: return float(RED_THRESHOLD_HO)
-        except: pass
-    if spec == "PDH" and RED_THRESHOLD_PDH is not None:
-        try: return float(RED_THRESHOLD_PDH)
-        except: pass
-    return DEFAULT_RED_THRESHOLD
+    return Scorer(coefs).score(df)
 
-def main():
-    # Ensure output dirs exist
-    os.makedirs(os.path.dirname(MODEL_OUT), exist_ok=True)
-    os.makedirs(os.path.dirname(SCORES_OUT), exist_ok=True)
+def _fit_segment(job):
+    key, seg, y_col = job
+    try:
+        _, coefs = fit_logit(seg, y_col)
+    except Exception:
+        # singular or perfectly separated segments keep the global model
+        coefs = None
+    return key, coefs
 
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Missing features file: {DATA_PATH}")
+@timed("fit.segments")
+def fit_segments(df: pd.DataFrame, y_col: str, segment_by, min_rows: int = MIN_SEGMENT_ROWS, workers=TRAIN_WORKERS) -> dict:
+    """Fit one logit per segment across a process pool; returns {segment: coefs} for the ones that fit."""
+    keys = segment_keys(df, segment_by)
+    counts = keys.value_counts()
+    jobs = [(k, df[keys == k], y_col) for k in counts[counts >= min_rows].index]
+    if not jobs:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_fit_segment, jobs))
+    return {k: {c: float(v) for c, v in coefs.items()} for k, coefs in results if coefs}
 
-    df = pd.read_csv(DATA_PATH)
+def feature_hashes(df: pd.DataFrame) -> pd.Series:
+    """Per-row hash of facility_id, the segment columns and the model features, stored as int64 so it survives CSV.
+
+    specialty and state are always included, so a facility moving segment is rescored even if
+    SEGMENT_BY changes between runs.
+    """
+    keys = ["facility_id", "specialty", "state"] + SEGMENT_BY + FEATURE_CANDIDATES
+    cols = [c for c in dict.fromkeys(keys) if c in df.columns]
+    h = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return pd.Series(h.view("int64"), index=df.index)
+
+def _load_model():
+    if not os.path.exists(MODEL_OUT):
+        return None
+    try:
+        with open(MODEL_OUT) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def model_version(model) -> str:
+    """Short content hash of a saved model (coefficients and segments); "heuristic" for None."""
+    if not model:
+        return "heuristic"
+    fitted = {k: model.get(k) for k in ["coefficients", "segment_by", "segments"]}
+    # prefixed so a CSV reader never takes an all-digit hash for a number
+    return "logit-" + hashlib.sha1(json.dumps(fitted, sort_keys=True).encode()).hexdigest()[:12]
+
+def _model_age_hours(model: dict) -> float:
+    try:
+        trained = datetime.fromisoformat(model["trained_at"])
+    except (KeyError, TypeError, ValueError):
+        return float("inf")
+    return (datetime.utcnow() - trained).total_seconds() / 3600.0
+
+def _full_score(df: pd.DataFrame):
+    """(score, model_version) from a refit, or from the heuristic when there is nothing to fit."""
+    if FIT_MODE == "streaming":
+        return _streaming_score(df)
 
     # Try to find a label column for supervised training
-    label_col = next((c for c in ["had_locum_next_45d", "need_within_45d", "need_within_30d"] if c in df.columns), None)
+    label_col = next((c for c in LABEL_CANDIDATES if c in df.columns), None)
 
     if label_col:
         print(f"[train] Using supervised label: {label_col}")
         proba, coefs = fit_logit(df, label_col)
         if proba is None:
             print("[train] Not enough label variation; falling back to heuristic.")
-            score = heuristic_score(df)
-            coefs = None
-        else:
-            score = proba.clip(0,1)
-            with open(MODEL_OUT, "w") as f:
-                json.dump({
-                    "trained_at": datetime.utcnow().isoformat(),
-                    "label_col": label_col,
-                    "coefficients": coefs
-                }, f, indent=2)
-    else:
-        print("[train] No label column; using heuristic scoring.")
-        score = heuristic_score(df)
+            return heuristic_score(df), model_version(None)
+        model = {
+            "trained_at": datetime.utcnow().isoformat(),
+            "label_col": label_col,
+            "coefficients": coefs
+        }
+        if SEGMENT_BY:
+            segments = fit_segments(df, label_col, SEGMENT_BY)
+            n_total = segment_keys(df, SEGMENT_BY).nunique()
+            print(f"[train] Segment models by {','.join(SEGMENT_BY)}: {len(segments)} fitted, "
+                  f"{n_total - len(segments)} using the global model")
+            model.update({"segment_by": SEGMENT_BY, "segments": segments})
+            proba = Scorer.from_model(model).score(df)
+        with open(MODEL_OUT, "w") as f:
+            json.dump(model, f, indent=2)
+        return proba.clip(0,1), model_version(model)
+
+    print("[train] No label column; using heuristic scoring.")
+    return heuristic_score(df), model_version(None)
+
+def _streaming_score(df: pd.DataFrame):
+    """(score, model_version) from a streaming fit over HISTORY_PATH, or from the heuristic."""
+    label_col = next((c for c in LABEL_CANDIDATES if c in table_columns(HISTORY_PATH)), None)
+    if not label_col:
+        print("[train] No label column in history; using heuristic scoring.")
+        return heuristic_score(df), model_version(None)
+    print(f"[train] Streaming fit on {HISTORY_PATH} ({FIT_CHUNK_ROWS} rows/chunk, {FIT_EPOCHS} epochs), label: {label_col}")
+    coefs = fit_logit_streaming(HISTORY_PATH, label_col)
+    if coefs is None:
+        print("[train] Not enough label variation; falling back to heuristic.")
+        return heuristic_score(df), model_version(None)
+    model = {
+        "trained_at": datetime.utcnow().isoformat(),
+        "label_col": label_col,
+        "fit_mode": "streaming",
+        "coefficients": coefs
+    }
+    with open(MODEL_OUT, "w") as f:
+        json.dump(model, f, indent=2)
+    return Scorer(coefs).score(df).clip(0,1), model_version(model)
+
+def _incremental_score(df: pd.DataFrame, hashes: pd.Series, forced: bool):
+    """(score, model_version): last run's scores for unchanged rows, the saved model for the rest.
+
+    None if a full run is needed. If the last run's scores came from a different model (or the
+    heuristic), every row is rescored with the saved model so the table never mixes models.
+    """
+    model = _load_model()
+    if not model or not model.get("coefficients"):
+        print("[train] No saved model; running full refit.")
+        return None
+    if not forced and _model_age_hours(model) > REFIT_MAX_AGE_HOURS:
+        print(f"[train] Saved model older than {REFIT_MAX_AGE_HOURS:g}h; running full refit.")
+        return None
+    try:
+        prev = read_table(SCORES_OUT, columns=["facility_id", "feature_hash", "model_version", "score"])
+    except FileNotFoundError:
+        prev = None
+    if prev is None or not {"facility_id", "feature_hash", "score"} <= set(prev.columns) or "facility_id" not in df.columns:
+        print("[train] No previous scores with feature hashes; running full refit.")
+        return None
+    version = model_version(model)
+    scorer = Scorer.from_model(model)
+    if "model_version" not in prev.columns or (prev["model_version"].astype(str) != version).any():
+        print(f"[train] Previous scores are not all from model {version}; rescoring every row.")
+        return scorer.score(df).clip(0,1), version
+
+    prev = prev.drop(columns="model_version").drop_duplicates(["facility_id", "feature_hash"])
+    keys = pd.DataFrame({"facility_id": df["facility_id"].to_numpy(), "feature_hash": hashes.to_numpy()})
+    score = keys.merge(prev, on=["facility_id", "feature_hash"], how="left")["score"]
+    score.index = df.index
+    changed = score.isna()
+    if changed.any():
+        score[changed] = scorer.score(df[changed]).clip(0,1)
+    print(f"[train] Incremental: rescored {int(changed.sum())} of {len(df)} rows")
+    return score, version
+
+def main():
+    with run_report("train"):
+        _run()
+
+def _run():
+    # Ensure output dirs exist
+    os.makedirs(os.path.dirname(MODEL_OUT), exist_ok=True)
+    os.makedirs(os.path.dirname(SCORES_OUT), exist_ok=True)
+
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Missing features file: {DATA_PATH}")
+
+    with stage("load") as info:
+        df = read_table(DATA_PATH)
+        info["rows"] = len(df)
+    # Posting counts come from the postings log when there is one; only rows appended since the last run are read
+    if os.path.exists(POSTINGS_LOG_PATH):
+        with stage("posting_features") as info:
+            windows, as_of_day, new_rows = update_posting_windows(POSTINGS_LOG_PATH)
+            df = apply_posting_features(df, windows, as_of_day)
+            info["rows"] = new_rows
+        print(f"[train] Posting features: {new_rows} new postings, {len(windows)} facility/specialty windows")
+    # Facilities without coordinates would be left off the map
+    with stage("geocode", rows=len(df)):
+        df, geo = fill_missing_coordinates(df)
+    if geo["missing"]:
+        print(f"[train] Geocoded {geo['facility'] + geo['city']} of {geo['missing']} facilities missing coordinates "
+              f"({geo['lookups']} lookups, {geo['errors']} failed)")
+    with stage("feature_hash", rows=len(df)):
+        hashes = feature_hashes(df)
+
+    with stage("score", rows=len(df)):
+        scored = None
+        if SCORE_MODE in ("auto", "incremental"):
+            scored = _incremental_score(df, hashes, forced=SCORE_MODE == "incremental")
+        if scored is None:
+            scored = _full_score(df)
+        score, version = scored
 
     df_out = df.copy()
     df_out["score"] = score.round(4)
+    df_out["feature_hash"] = hashes
+    # which model produced the scores; incremental runs only reuse scores from the same one
+    df_out["model_version"] = version
 
     # High-likelihood flag per specialty threshold
-    df_out["high_likelihood"] = [
-        float(s) >= _threshold_for_spec(str(spc))
-        for s, spc in zip(df_out["score"], df_out.get("specialty", "HO"))
-    ]
+    with stage("flag", rows=len(df_out)):
+        df_out["high_likelihood"] = flag_high_likelihood(df_out)
+
+    # Normalized name key, so the app can match uploads by name without re-normalizing every facility
+    name_col = next((c for c in NAME_COLUMNS if c in df_out.columns), None)
+    if name_col:
+        df_out["name_key"] = normalize_names(df_out[name_col])
 
     # Keep active_posting as-is if present; otherwise default False
     if "active_posting" not in df_out.columns:
         df_out["active_posting"] = False
 
-    # Export scored table
-    df_out.to_csv(SCORES_OUT, index=False)
-    print(f"[train] Wrote scores  {SCORES_OUT}")
+    # Export scored table (CSV, plus a typed Parquet copy when pyarrow is available)
+    with stage("write", rows=len(df_out)):
+        write_table(df_out, SCORES_OUT)
+    print(f"[train] Wrote scores  {SCORES_OUT}")
 
-    # Show preview
-    prev = (
-        df_out.sort_values(["specialty","score"], ascending=[True, False])
-        [["facility_name","state","specialty","score","high_likelihood"]]
-        .head(10)
-    )
+    # Append-only history of the rows whose score or flags changed since the last run
+    with stage("score_history", rows=len(df_out)):
+        run_id, changed = record_scores(df_out)
+    print(f"[train] Score history run {run_id}: {changed} of {len(df_out)} rows changed ({SCORE_HISTORY_PATH})")
+
+    # Prebuilt map for the app's first view (skipped for tables too big to draw in full)
+    with stage("map_snapshot", rows=len(df_out)):
+        snapshot = write_map_snapshot(df_out, SCORES_OUT)
+    if snapshot:
+        print(f"[train] Wrote map snapshot {snapshot}")
+
+    # Show preview: best few per specialty, without sorting the whole table
+    prev = top_n_per_group(df_out, PREVIEW_ROWS)[["facility_name","state","specialty","score","high_likelihood"]]
     print(prev.to_string(index=False))
 
 if __name__ == "__main__":
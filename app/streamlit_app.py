@@ -1,69 +1,53 @@
 import streamlit as st
 import pandas as pd
-from utils.map_utils import create_map
+from utils.data_cache import map_html_cached, read_table_cached
+from utils.forecast import FORECAST_HORIZON_DAYS, FORECAST_OUT, upcoming_openings
+from utils.ingest import UPLOAD_COLUMNS, load_upload, upload_specialties
 from utils.predictor import predict_needs
+from utils.instrumentation import load_reports, stage_table
+from utils.ranking import top_n_per_group
+from utils.snapshot import scores_map_html
 
-st.set_page_config(page_title="Locum Tracker", layout="wide")
-
-st.title("Hospitalist & Pediatric Hospitalist Locum Tracker")
-
-uploaded_file = st.file_uploader("Upload job data Excel file", type=["xlsx"])
-if uploaded_file:
-    data = pd.read_excel(uploaded_file, engine="openpyxl")
-    filtered = st.multiselect("Filter by Specialty", options=data['Specialty'].unique())
-    if filtered:
-        data = data[data['Specialty'].isin(filtered)]
-
-    data = predict_needs(data)
-    st.dataframe(data)
-
-    st.subheader("Interactive Map")
-    map_html = create_map(data).get_root().render()
-    st.components.v1.html(map_html, height=600)
-
-    st.subheader("Calendar View (Coming Soon)")
-    st.info("Calendar integration will show predicted openings by date.")
-
-    st.subheader("Contact Outreach Tracker")
-    st.write(data[['Facility Name', 'Contact Name', 'Contact Email', 'Predicted Need']])
-import streamlit as st
-from app.pages import _1_Map
-
-st.set_page_config(page_title="Locums Map", layout="wide")
-
-st.title("Locums Opportunities Map")
-st.markdown("Use the map to explore top opportunities. Markers: Green=Active posting, Red=High likelihood, Yellow=HO, Light Blue=PDH.")
-
-with st.sidebar:
-    st.header("Controls")
-    st.write("No controls yet. Add filters in the Map page later.")
-
-import streamlit as st
-import pandas as pd
-from utils.map_utils import create_map
-from utils.predictor import predict_needs
+TOP_OPPORTUNITIES = 10  # rows per specialty in the top opportunities table
 
 st.set_page_config(page_title="Locum Tracker", layout="wide")
 
 st.title("Hospitalist & Pediatric Hospitalist Locum Tracker")
+st.markdown("Markers: Green=Active posting, Red=High likelihood, Yellow=HO, Light Blue=PDH.")
 
-uploaded_file = st.file_uploader("Upload job data Excel file", type=["xlsx"]) 
+uploaded_file = st.file_uploader("Upload job data file", type=["xlsx", "csv"])
 if uploaded_file:
-    data = pd.read_excel(uploaded_file, engine="openpyxl")
-    filtered = st.multiselect("Filter by Specialty", options=data['Specialty'].unique())
-    if filtered:
-        data = data[data['Specialty'].isin(filtered)]
-
-    data = predict_needs(data)
+    filtered = st.multiselect("Filter by Specialty", options=upload_specialties(uploaded_file))
+    bar = st.progress(0.0, text="Reading upload")
+    data = load_upload(uploaded_file, specialties=filtered, columns=UPLOAD_COLUMNS, progress=bar.progress)
+    bar.empty()
+    if "match" in data.columns:
+        matched = data["match"].value_counts().to_dict()
+        st.caption(f"Matched to scores: {matched.get('id', 0)} by ID, {matched.get('name', 0)} by name, "
+                   f"{matched.get('fuzzy', 0)} fuzzy, {matched.get('', 0)} unmatched")
     st.dataframe(data)
 
     st.subheader("Interactive Map")
-    m = create_map(data)
-    map_html = m.get_root().render()
+    map_html = map_html_cached(data)
     st.components.v1.html(map_html, height=600)
 
-    st.subheader("Calendar View (Coming Soon)")
-    st.info("Calendar integration will show predicted openings by date.")
+    st.subheader("Calendar View")
+    try:
+        openings = read_table_cached(FORECAST_OUT, compact=False)
+    except FileNotFoundError:
+        openings = None
+    if openings is None or openings.empty:
+        st.info("No forecast yet. Run app/scripts/forecast_openings.py after training to predict openings by date.")
+    else:
+        days = st.slider("Days ahead", 7, FORECAST_HORIZON_DAYS, 30, step=7)
+        # the forecast uses the scores' specialty codes (HO, PDH), which need not match the upload's labels
+        codes = sorted(openings["specialty"].dropna().astype(str).unique())
+        picked = st.multiselect("Forecast specialties", options=codes, default=[s for s in filtered if s in codes])
+        upcoming = upcoming_openings(openings, days, specialties=picked)
+        st.caption(f"{len(upcoming)} predicted openings in the next {days} days (as of {openings['as_of'].iloc[0]})")
+        st.bar_chart(upcoming.groupby(pd.Grouper(key="predicted_date", freq="W")).size().rename("openings"))
+        cal_cols = [c for c in ["predicted_date", "facility_name", "city", "state", "specialty", "prob_30d", "model"] if c in upcoming.columns]
+        st.dataframe(upcoming[cal_cols], hide_index=True)
 
     st.subheader("Contact Outreach Tracker")
     # best effort to show common columns
@@ -80,7 +64,27 @@ if st.button("Load latest scores and show map"):
     try:
         df = predict_needs(None)
         st.write(df.head())
-        m = create_map(df)
-        st.components.v1.html(m.get_root().render(), height=600)
+        st.subheader("Top opportunities")
+        top_cols = [c for c in ["facility_name", "city", "state", "specialty", "score", "active_posting", "high_likelihood"] if c in df.columns]
+        st.dataframe(top_n_per_group(df, TOP_OPPORTUNITIES)[top_cols], hide_index=True)
+        # the Map page's map of the same scores file (its snapshot when current), not a second renderer
+        html, changes = scores_map_html()
+        if not changes.empty:
+            st.caption(f"{len(changes)} facilities newly red or with a new posting since {changes['since'].min()} are ringed in black.")
+        st.components.v1.html(html, height=600)
     except Exception as e:
         st.error(str(e))
+
+with st.expander("Run diagnostics"):
+    reports = load_reports()
+    if not reports:
+        st.info("No run reports yet. They are written to app/data/runs by the train and digest jobs.")
+    else:
+        labels = [f"{r['job']} {r['started_at'][:19]} ({r['status']}, {r['total_seconds']:.1f}s)" for r in reports]
+        pick = st.selectbox("Run", range(len(reports)), format_func=labels.__getitem__)
+        report = reports[pick]
+        st.caption(f"Peak RSS {report.get('peak_rss_mb') or 0:.0f} MB")
+        table = stage_table(report, reports[pick + 1:])
+        st.dataframe(table, hide_index=True)
+        if "regression" in table.columns and table["regression"].any():
+            st.warning("Slower than recent runs: " + ", ".join(table.loc[table["regression"], "stage"]))
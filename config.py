@@ -4,3 +4,10 @@ SPECIALTY_COLORS = {
 }
 
 EMAIL_RECIPIENTS = ["andy.casey@comphealth.com"]
+
+# Per-recruiter digest filters. Empty lists mean "all". For large teams point
+# DIGEST_RECIPIENTS_PATH at a CSV with columns email,states,specialties
+# (states/specialties separated by ';') instead of editing this list.
+RECIPIENT_PROFILES = [
+    {"email": email, "states": [], "specialties": []} for email in EMAIL_RECIPIENTS
+]
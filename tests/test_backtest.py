@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from utils.backtest import THRESHOLD_GRID, replay, threshold_curves
+
+
+def test_threshold_curves_match_brute_force_counts():
+    rng = np.random.default_rng(3)
+    n = 2000
+    # scores on the grid itself too, to pin down score == threshold counting as flagged
+    score = np.where(rng.random(n) < 0.3, rng.choice(THRESHOLD_GRID, n), rng.random(n)).round(4)
+    scored = pd.DataFrame({"model": rng.choice(["a", "b"], n), "specialty": rng.choice(["HO", "PDH", ""], n),
+                           "score": score, "label": (rng.random(n) < score).astype(int)})
+    curves = threshold_curves(scored).set_index(["model", "specialty", "threshold"])
+
+    for (model, spec), g in scored.groupby(["model", "specialty"]):
+        for t in THRESHOLD_GRID:
+            flag = g["score"] >= t
+            row = curves.loc[(model, spec, t)]
+            assert row["rows"] == len(g) and row["positives"] == g["label"].sum()
+            assert row["flagged"] == flag.sum()
+            assert row["true_positives"] == (flag & (g["label"] == 1)).sum()
+
+
+def test_replay_keeps_blank_specialties_apart():
+    df = pd.DataFrame({"specialty": ["HO", None, " "], "had_locum_next_45d": [1, 0, 1]})
+    scored = replay([("2024-01-01", df)], {"m": lambda d: np.full(len(d), 0.5)}, ["had_locum_next_45d"])
+    assert scored["specialty"].tolist() == ["HO", "", ""]
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import _sizeof
+from utils.map_page import build_map
+
+
+def test_sizeof_measures_maps_and_nested_indexes():
+    n = 200
+    df = pd.DataFrame({"facility_name": ["Clinic"] * n, "lat": np.linspace(40, 41, n), "lon": np.linspace(-101, -100, n),
+                       "score": 0.5, "specialty": "HO"})
+    m = build_map(df, {})
+    assert _sizeof(m) > 200 * n  # each marker and popup renders to a few hundred bytes
+    grid = {"points": df, "lon": df["lon"].to_numpy(), "levels": [df.head(10)]}
+    assert _sizeof(grid) > df.memory_usage(deep=True).sum()
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pandas as pd
+
+from utils.geocode import OfflineGazetteer, fill_missing_coordinates, make_geocoder
+
+
+class FakeGeocoder:
+    source = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def geocode(self, name, city, state):
+        self.calls += 1
+        return (40.0, -100.0)
+
+
+def _missing_rows():
+    return pd.DataFrame({"facility_name": ["North Clinic"], "city": ["Boise"], "state": ["ID"],
+                         "lat": [None], "lon": [None]})
+
+
+def test_offline_without_gazetteer_caches_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert make_geocoder("offline") is None
+    cache = tmp_path / "cache.sqlite"
+    out, stats = fill_missing_coordinates(_missing_rows(), cache_path=str(cache))
+    assert stats["lookups"] == 0 and out["lat"].isna().all()
+    assert sqlite3.connect(cache).execute("SELECT COUNT(*) FROM geocode").fetchone()[0] == 0
+
+
+def test_misses_from_another_backend_are_retried(tmp_path):
+    cache = str(tmp_path / "cache.sqlite")
+    _, stats = fill_missing_coordinates(_missing_rows(), geocoder=OfflineGazetteer(path=None), cache_path=cache)
+    assert stats["lookups"] == 2  # facility, then city level, both misses
+    fake = FakeGeocoder()
+    out, stats = fill_missing_coordinates(_missing_rows(), geocoder=fake, cache_path=cache)
+    assert fake.calls == 1 and stats["facility"] == 1
+    assert out["lat"].tolist() == [40.0]
@@ -0,0 +1,31 @@
+import io
+
+import openpyxl
+import pytest
+
+from utils.ingest import UPLOAD_COLUMNS, load_upload
+
+
+def _xlsx(rows):
+    wb = openpyxl.Workbook()
+    for row in rows:
+        wb.active.append(row)
+    f = io.BytesIO()
+    wb.save(f)
+    f.name = "jobs.xlsx"
+    f.seek(0)
+    return f
+
+
+def _csv(rows):
+    f = io.BytesIO("\n".join(",".join(r) for r in rows).encode() + b"\n")
+    f.name = "jobs.csv"
+    return f
+
+
+@pytest.mark.parametrize("make", [_xlsx, _csv])
+def test_filter_matching_nothing_keeps_header_columns(make):
+    rows = [["Facility Name", "Contact Name", "Contact Email", "Specialty"], ["North Clinic", "Ann Lee", "ann@example.com", "HO"]]
+    data = load_upload(make(rows), specialties=["PDH"], columns=UPLOAD_COLUMNS)
+    assert data.empty
+    assert {"Facility Name", "Contact Name", "Contact Email", "Specialty"} <= set(data.columns)
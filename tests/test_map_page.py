@@ -0,0 +1,32 @@
+import os
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+MAP_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "pages", "1_Map.py")
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run the page from a scratch directory with a small scores and contacts table."""
+    processed = tmp_path / "app" / "data" / "processed"
+    processed.mkdir(parents=True)
+    pd.DataFrame({
+        "facility_id": ["F1", "F2"], "facility_name": ["North Clinic", "South Clinic"], "specialty": ["HO", "PDH"],
+        "lat": [40.0, 41.0], "lon": [-100.0, -101.0], "score": [0.8, 0.2],
+        "high_likelihood": [True, False], "active_posting": [False, False],
+    }).to_csv(processed / "scores_latest.csv", index=False)
+    pd.DataFrame({
+        "facility_id": ["F1"], "specialty": ["HO"], "first_name": ["Ann"], "last_name": ["Lee"],
+        "title": ["Director"], "email": ["ann@example.com"], "phone": ["555-0100"], "mobile": [None],
+    }).to_csv(processed / "contacts.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+    return processed
+
+
+@pytest.mark.parametrize("viewport_min_rows", ["100", "1"])
+def test_map_page_renders_contacts_with_blank_mobile(data_dir, monkeypatch, viewport_min_rows):
+    monkeypatch.setenv("MAP_VIEWPORT_MIN_ROWS", viewport_min_rows)
+    at = AppTest.from_file(MAP_PAGE, default_timeout=60).run()
+    assert not at.exception
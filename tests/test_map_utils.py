@@ -0,0 +1,14 @@
+import pandas as pd
+
+from utils.map_utils import create_map
+
+
+def test_bulk_layer_keeps_marker_colors():
+    df = pd.DataFrame({
+        "facility_name": ["Active", "Red"], "lat": [40.0, 41.0], "lon": [-100.0, -101.0], "score": [0.5, 0.9],
+        "active_posting": [True, False], "high_likelihood": [False, True], "specialty": ["HO", "HO"],
+    })
+    html = create_map(df, contacts_path=None, bulk=True).get_root().render()
+    assert '"fillColor": "green"' in html
+    assert '"fillColor": "red"' in html
+    assert "layer.setStyle(feature.properties.style)" in html
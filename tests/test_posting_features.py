@@ -0,0 +1,18 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.posting_features import apply_posting_features, update_posting_windows
+
+
+def test_blank_specialty_gets_its_postings(tmp_path):
+    as_of = date(2024, 6, 1)
+    log = tmp_path / "postings.csv"
+    pd.DataFrame({"facility_id": ["F1", "F2"], "specialty": ["HO", None],
+                  "posted_at": [(as_of - timedelta(days=d)).isoformat() for d in [20, 5]]}).to_csv(log, index=False)
+    windows, as_of_day, _ = update_posting_windows(str(log), str(tmp_path / "state"), as_of)
+
+    features = pd.DataFrame({"facility_id": ["F1", "F2", "F3"], "specialty": ["HO", None, "HO"]})
+    out = apply_posting_features(features, windows, as_of_day)
+    assert out["postings_90d"].tolist() == [1, 1, 0]
+    assert out["last_post_days"].tolist() == [20, 5, 999]
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+from utils.score_history import get_cursors, record_scores
+from utils.storage import write_table
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "scripts", "send_digest_sendgrid.py")
+PROFILES = [{"email": e, "states": [], "specialties": []} for e in ["ok@example.com", "bad@example.com", "down@example.com"]]
+
+
+@pytest.fixture
+def digest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app/data/processed")
+    spec = importlib.util.spec_from_file_location("send_digest_sendgrid", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "load_recipient_profiles", lambda: PROFILES)
+    return module
+
+
+def _scores(red):
+    return pd.DataFrame({"facility_id": ["F1", "F2"], "facility_name": ["North", "South"], "city": ["A", "B"],
+                         "state": ["TX", "OH"], "specialty": ["HO", None], "score": [0.3, 0.9 if red else 0.2],
+                         "high_likelihood": [False, red], "active_posting": [False, False]})
+
+
+def test_each_recipient_keeps_its_own_cursor(digest, monkeypatch):
+    statuses = {"ok@example.com": 202, "bad@example.com": 400, "down@example.com": 503}
+    sent = []
+
+    def deliver(digests):
+        sent.append(dict(digests))
+        return [(email, statuses[email], 1) for email, _ in digests]
+    monkeypatch.setattr(digest, "deliver_all", deliver)
+
+    write_table(_scores(red=False), digest.SCORES_PATH)
+    run1, _ = record_scores(_scores(red=False))
+    digest.main()
+    # no cursors yet: everyone gets the full digest; the unreachable recipient keeps no cursor
+    assert set(sent[0]) == set(statuses)
+    assert get_cursors("digest:") == {"digest:ok@example.com": run1, "digest:bad@example.com": run1}
+
+    write_table(_scores(red=True), digest.SCORES_PATH)
+    run2, _ = record_scores(_scores(red=True))
+    digest.main()
+    # the blank-specialty facility that turned red is joined to its name and city, not to "nan"
+    assert "South</b> in B, OH" in sent[1]["ok@example.com"] and "Newly high likelihood" in sent[1]["ok@example.com"]
+    assert "Top Facilities" in sent[1]["down@example.com"]
+    assert get_cursors("digest:") == {"digest:ok@example.com": run2, "digest:bad@example.com": run2}
@@ -0,0 +1,65 @@
+import re
+
+import pandas as pd
+
+from utils.data_cache import contact_index_cached, read_table_cached
+from utils.map_page import build_map
+from utils.score_history import record_scores
+from utils.snapshot import highlight_key, load_map_snapshot, scores_map_html, write_map_snapshot
+from utils.storage import write_table
+
+SCORES = "app/data/processed/scores_latest.csv"
+CONTACTS = "app/data/processed/contacts.csv"
+SNAPSHOT = "app/data/processed/map_snapshot.html"
+HISTORY = "app/data/score_history.sqlite"
+
+
+def _without_ids(html):
+    # folium names every element with a random 32-hex id
+    return re.sub(r"[0-9a-f]{32}", "", html)
+
+
+def test_served_snapshot_matches_live_page_render(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app" / "data" / "processed").mkdir(parents=True)
+    df = pd.DataFrame({
+        "facility_id": ["F1", "F2", "F3"], "facility_name": ["North", "South", "East"],
+        "specialty": ["HO", "PDH", "HO"], "lat": [40.1, 41.2, 42.3], "lon": [-100.1, -101.2, -102.3],
+        "score": [0.91, 0.2, 0.55], "high_likelihood": [True, False, False], "active_posting": [False, False, True],
+    })
+    write_table(df, SCORES)
+    pd.DataFrame({"facility_id": ["F1"], "specialty": ["HO"], "first_name": ["Ann"], "last_name": ["Lee"],
+                  "title": ["Director"], "email": ["ann@example.com"], "phone": ["555-0100"], "mobile": [None]}
+                 ).to_csv(CONTACTS, index=False)
+
+    assert write_map_snapshot(df, SCORES, CONTACTS, SNAPSHOT) == SNAPSHOT
+    served = load_map_snapshot(SCORES, CONTACTS, SNAPSHOT)
+    live = build_map(read_table_cached(SCORES), contact_index_cached(CONTACTS)).get_root().render()
+    assert served is not None
+    assert _without_ids(served) == _without_ids(live)
+    assert "Ann Lee" in served and '"fillColor": "red"' in served
+
+
+def test_snapshot_carries_the_recent_change_rings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app" / "data" / "processed").mkdir(parents=True)
+    df = pd.DataFrame({
+        "facility_id": ["F1", "F2"], "facility_name": ["North", "South"], "specialty": ["HO", ""],
+        "lat": [40.1, 41.2], "lon": [-100.1, -101.2], "score": [0.3, 0.2],
+        "high_likelihood": [False, False], "active_posting": [False, False],
+    })
+    record_scores(df, HISTORY)
+    df = df.assign(score=[0.9, 0.2], high_likelihood=[True, False])
+    write_table(df, SCORES)
+    record_scores(df, HISTORY)
+
+    assert write_map_snapshot(df, SCORES, None, SNAPSHOT, HISTORY) == SNAPSHOT
+    served = load_map_snapshot(SCORES, None, SNAPSHOT, highlight_key(HISTORY))
+    assert served is not None and '"color": "black"' in served
+    html, changes = scores_map_html(SCORES, None, True, SNAPSHOT, HISTORY)
+    assert html == served and changes["facility_id"].tolist() == ["F1"]
+
+    # with highlighting off the ringed snapshot is not served; the map is drawn without rings
+    assert load_map_snapshot(SCORES, None, SNAPSHOT, None) is None
+    html, changes = scores_map_html(SCORES, None, False, SNAPSHOT, HISTORY)
+    assert changes.empty and '"color": "black"' not in html and '"fillColor": "red"' in html
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from utils.instrumentation import run_report, stage
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "streamlit_app.py")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    (tmp_path / "app" / "data" / "processed").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_run_diagnostics_panel_lists_reports(workdir):
+    with run_report("train", out_dir="app/data/runs"):
+        with stage("load", rows=10):
+            pass
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    assert not at.exception
+    assert [e.label for e in at.expander] == ["Run diagnostics"]
+    assert at.selectbox[0].options[0].startswith("train ")
+    assert "load" in at.expander[0].dataframe[0].value["stage"].tolist()
+
+
+def test_top_opportunities_table(workdir):
+    import pandas as pd
+    n = 15
+    pd.DataFrame({
+        "facility_id": [f"F{i}" for i in range(n)], "facility_name": [f"Clinic {i}" for i in range(n)],
+        "specialty": ["HO"] * 12 + ["PDH"] * 3, "score": [i / n for i in range(n)],
+        "lat": 40.0, "lon": -100.0, "active_posting": False, "high_likelihood": False,
+    }).to_csv("app/data/processed/scores_latest.csv", index=False)
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    at.button[0].click().run()
+    assert not at.exception
+    assert "Top opportunities" in [h.value for h in at.subheader]
+    # the last table outside the diagnostics panel (which now lists the map render)
+    top = [d.value for d in at.dataframe if "stage" not in d.value.columns][-1]
+    assert top["specialty"].value_counts().to_dict() == {"HO": 10, "PDH": 3}
+    assert top["facility_name"].iloc[0] == "Clinic 11"
+
+
+def test_map_render_is_recorded_as_an_app_run(workdir):
+    import pandas as pd
+    pd.DataFrame({"facility_id": ["F1", "F2"], "facility_name": ["North", "South"], "specialty": ["HO", "PDH"],
+                  "score": [0.9, 0.1], "lat": [40.0, 41.0], "lon": [-100.0, -101.0],
+                  "active_posting": False, "high_likelihood": [True, False]}
+                 ).to_csv("app/data/processed/scores_latest.csv", index=False)
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    at.button[0].click().run()
+    assert not at.exception
+    assert at.selectbox[0].options[0].startswith("app ")
+    assert {"map_page.build_map", "map.render"} <= set(at.expander[0].dataframe[0].value["stage"])
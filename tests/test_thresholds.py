@@ -0,0 +1,34 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+from utils.thresholds import load_threshold_table, read_threshold_file
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "scripts")
+
+
+def _backtest_script():
+    spec = importlib.util.spec_from_file_location("backtest_thresholds", os.path.join(SCRIPTS, "backtest_thresholds.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_write_thresholds_ignores_env_overrides(tmp_path, monkeypatch):
+    path = tmp_path / "thresholds.csv"
+    pd.DataFrame({"specialty": ["HO", "HO"], "state": ["", "UT"], "threshold": [0.68, 0.65]}).to_csv(path, index=False)
+    monkeypatch.setenv("RED_THRESHOLD_PDH", "0.5")
+    assert "PDH" in load_threshold_table(str(path))["specialty"].tolist()
+
+    report = pd.DataFrame({"model": ["current"], "specialty": ["HO"], "best_f1_threshold": [0.6]})
+    _backtest_script().write_thresholds(report, path=str(path))
+    written = read_threshold_file(str(path))
+    assert sorted(zip(written["specialty"], written["state"], written["threshold"])) == [("HO", "", 0.6), ("HO", "UT", 0.65)]
+
+
+def test_blank_specialty_gets_default_threshold():
+    from utils.thresholds import thresholds_for
+    table = pd.DataFrame({"specialty": ["HO", "HO"], "state": ["", "UT"], "threshold": [0.6, 0.5]})
+    df = pd.DataFrame({"specialty": ["HO", None, "", "HO"], "state": ["CA", "UT", "UT", "UT"]})
+    assert thresholds_for(df, table, default=0.7).tolist() == [0.6, 0.7, 0.7, 0.5]
@@ -0,0 +1,57 @@
+import importlib.util
+import os
+
+import pytest
+
+from utils.storage import read_table, write_table
+from utils.synthetic import synthetic_facilities
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "scripts", "train_predictor.py")
+
+
+@pytest.fixture
+def tp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app/data/processed")
+    spec = importlib.util.spec_from_file_location("train_predictor", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "write_map_snapshot", lambda *a, **k: None)
+    return module
+
+
+def test_incremental_run_rescores_only_changed_rows(tp, monkeypatch):
+    features = synthetic_facilities(400, seed=1)
+    write_table(features, tp.DATA_PATH)
+    monkeypatch.setattr(tp, "SCORE_MODE", "full")
+    tp._run()
+    first = read_table(tp.SCORES_OUT).set_index("facility_id")
+
+    # tamper with the stored scores: rows the incremental run reuses keep the tampered value
+    tampered = read_table(tp.SCORES_OUT)
+    tampered["score"] = -1.0
+    write_table(tampered, tp.SCORES_OUT)
+    changed = features["facility_id"].iloc[:5]
+    features["postings_90d"] = features["postings_90d"].astype(object)
+    features.loc[features.index[:5], "postings_90d"] = "99"
+    write_table(features, tp.DATA_PATH)
+    monkeypatch.setattr(tp, "SCORE_MODE", "incremental")
+    tp._run()
+    second = read_table(tp.SCORES_OUT).set_index("facility_id")
+
+    rescored = second.loc[changed, "score"]
+    assert (rescored >= 0).all()
+    assert (second.drop(index=changed)["score"] == -1.0).all()
+    assert (second["model_version"] == first["model_version"].iloc[0]).all()
+
+
+def test_scores_from_another_model_are_all_rescored(tp, monkeypatch):
+    write_table(synthetic_facilities(400, seed=2), tp.DATA_PATH)
+    monkeypatch.setattr(tp, "SCORE_MODE", "full")
+    tp._run()
+    stale = read_table(tp.SCORES_OUT)
+    stale["score"], stale["model_version"] = -1.0, "heuristic"
+    write_table(stale, tp.SCORES_OUT)
+    monkeypatch.setattr(tp, "SCORE_MODE", "incremental")
+    tp._run()
+    assert (read_table(tp.SCORES_OUT)["score"] >= 0).all()
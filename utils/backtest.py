@@ -0,0 +1,150 @@
+"""Precision/recall of the high_likelihood flag over labeled historical snapshots.
+
+A snapshot is the features table as it stood on a past date, with the label
+(had_locum_next_45d) filled in once it became known. BACKTEST_SNAPSHOTS is
+either a directory of tables named <anything>_YYYY-MM-DD.csv (or .parquet)
+or a single table with a snapshot_date column. Each snapshot goes through
+build_matrix once; every model is then one matrix-vector product on it.
+
+The threshold grid is evaluated per (model, specialty) in one pass: rows are
+sorted by score once, and the flagged and true-positive counts at every
+threshold are read off cumulative sums with searchsorted, instead of
+re-flagging the rows for each threshold.
+"""
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.features import build_matrix
+from utils.scorer import MATRIX_COLUMNS, Scorer
+from utils.storage import fill_text, read_table
+from utils.thresholds import thresholds_for
+
+BACKTEST_SNAPSHOTS = os.environ.get("BACKTEST_SNAPSHOTS", "app/data/snapshots")
+BACKTEST_OUT = "app/data/processed/backtest_thresholds.csv"
+BACKTEST_REPORT = "app/data/processed/backtest_report.csv"
+THRESHOLD_GRID = np.round(np.arange(0.05, 0.96, 0.01), 2)
+# Second operating point: best recall among thresholds with at least this precision
+BACKTEST_MIN_PRECISION = float(os.environ.get("BACKTEST_MIN_PRECISION", "0.6"))
+GROUP_COLUMNS = ["model", "specialty"]
+_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})$")
+
+
+def load_snapshots(path=BACKTEST_SNAPSHOTS):
+    """[(snapshot_date, frame)] oldest first; [] if path does not exist."""
+    if os.path.isdir(path):
+        stems = sorted({os.path.splitext(f)[0] for f in glob.glob(os.path.join(path, "*.csv"))
+                        + glob.glob(os.path.join(path, "*.parquet"))})
+        out = []
+        for stem in stems:
+            m = _DATE_RE.search(os.path.basename(stem))
+            if m:
+                out.append((m.group(1), read_table(stem + ".csv")))
+        return sorted(out, key=lambda p: p[0])
+    if not os.path.exists(path):
+        return []
+    df = read_table(path)
+    if "snapshot_date" not in df.columns:
+        return [("", df)]
+    dates = fill_text(df["snapshot_date"]).astype(str).str[:10]
+    return [(d, g) for d, g in df.groupby(dates, sort=True)]
+
+
+def replay(snapshots, models, label_candidates):
+    """One row per (snapshot row, model): snapshot_date, model, specialty, score, label, threshold.
+
+    models maps a name to a Scorer or to a function df -> scores. Rows without a label are skipped.
+    """
+    parts = []
+    for when, df in snapshots:
+        label_col = next((c for c in label_candidates if c in df.columns), None)
+        if label_col is None:
+            continue
+        df = df[pd.to_numeric(df[label_col], errors="coerce").notna()]
+        if df.empty:
+            continue
+        label = pd.to_numeric(df[label_col]).clip(0, 1).to_numpy(dtype=np.int8)
+        # grouped as thresholds_for reads them: blank specialties stay blank (and get the default threshold)
+        specialty = fill_text(df["specialty"]).str.strip().to_numpy() if "specialty" in df.columns \
+            else np.full(len(df), "HO", dtype=object)
+        threshold = thresholds_for(df)
+        X = build_matrix(df)[MATRIX_COLUMNS].to_numpy(dtype=float)
+        for name, model in models.items():
+            score = model.score_matrix(X, df) if isinstance(model, Scorer) else model(df)
+            parts.append(pd.DataFrame({"snapshot_date": when, "model": name, "specialty": specialty,
+                                       "score": np.asarray(score, dtype=float), "label": label,
+                                       "threshold": threshold}))
+    if not parts:
+        return pd.DataFrame(columns=["snapshot_date", "model", "specialty", "score", "label", "threshold"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def threshold_curves(scored, grid=THRESHOLD_GRID, by=GROUP_COLUMNS):
+    """Flagged / true-positive counts, precision, recall and F1 at every grid threshold per group."""
+    grouped = scored.groupby(by, sort=True)
+    groups = grouped.size().index
+    codes = grouped.ngroup().to_numpy()
+    score = scored["score"].to_numpy(dtype=float)
+    # one sort on (group, descending score), as a single key: 2 * group + (1 - score)
+    key = codes * 2.0 + (1.0 - score)
+    order = np.argsort(key, kind="stable")
+    key, codes = key[order], codes[order]
+    cum = np.concatenate([[0], np.cumsum(scored["label"].to_numpy(dtype=np.int64)[order])])
+    ids = np.arange(len(groups))
+    starts = np.searchsorted(codes, ids, side="left")
+    ends = np.searchsorted(codes, ids, side="right")
+    # "score >= t within group g" is every sorted key up to 2g + 1 - t
+    probe = ids[:, None] * 2.0 + (1.0 - np.asarray(grid, dtype=float)[None, :])
+    idx = np.searchsorted(key, probe.ravel(), side="right").reshape(probe.shape)
+
+    flagged = idx - starts[:, None]
+    tp = cum[idx] - cum[starts][:, None]
+    positives = np.broadcast_to((cum[ends] - cum[starts])[:, None], flagged.shape)
+    rows = np.broadcast_to((ends - starts)[:, None], flagged.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(flagged > 0, tp / flagged, np.nan)
+        recall = np.where(positives > 0, tp / positives, np.nan)
+        f1 = np.where(tp > 0, 2 * tp / (flagged + positives), 0.0)
+
+    labels = np.array(list(groups), dtype=object).reshape(len(groups), -1)
+    out = pd.DataFrame(np.repeat(labels, len(grid), axis=0), columns=by)
+    out["threshold"] = np.tile(grid, len(groups))
+    for col, values in [("rows", rows), ("positives", positives), ("flagged", flagged), ("true_positives", tp),
+                        ("precision", precision), ("recall", recall), ("f1", f1)]:
+        out[col] = values.ravel()
+    return out
+
+
+def current_operating_points(scored, by=GROUP_COLUMNS):
+    """Precision/recall of the thresholds configured today (RED_THRESHOLD*, thresholds table) per group."""
+    s = scored.assign(flag=scored["score"] >= scored["threshold"])
+    s["hit"] = s["flag"] & (s["label"] == 1)
+    g = s.groupby(by)
+    out = pd.DataFrame({"current_threshold": g["threshold"].median(), "flagged": g["flag"].sum(),
+                        "true_positives": g["hit"].sum(), "positives": g["label"].sum()})
+    out["current_precision"] = out["true_positives"] / out["flagged"].where(out["flagged"] > 0)
+    out["current_recall"] = out["true_positives"] / out["positives"].where(out["positives"] > 0)
+    out["current_f1"] = (2 * out["true_positives"] / (out["flagged"] + out["positives"])).fillna(0.0)
+    return out[["current_threshold", "current_precision", "current_recall", "current_f1"]]
+
+
+def best_operating_points(curves, current=None, min_precision=BACKTEST_MIN_PRECISION, by=GROUP_COLUMNS):
+    """Per group: the best-F1 threshold, and the best-recall threshold reaching min_precision."""
+    # ties go to the higher threshold (fewer red markers for the same quality)
+    c = curves.sort_values(by + ["threshold"], ascending=[True] * len(by) + [False])
+    best_f1 = c.loc[c.groupby(by)["f1"].idxmax()].set_index(by)
+    ok = c[c["precision"] >= min_precision]
+    best_recall = ok.loc[ok.groupby(by)["recall"].idxmax()].set_index(by) if not ok.empty else ok.set_index(by)
+    report = best_f1[["rows", "positives"]].copy()
+    if current is not None:
+        report = report.join(current)
+    report["best_f1_threshold"] = best_f1["threshold"]
+    report["best_f1_precision"] = best_f1["precision"]
+    report["best_f1_recall"] = best_f1["recall"]
+    report["best_f1"] = best_f1["f1"]
+    report["precision_target_threshold"] = best_recall["threshold"]
+    report["precision_target_recall"] = best_recall["recall"]
+    return report.reset_index()
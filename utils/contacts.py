@@ -0,0 +1,63 @@
+"""Contact lookup for map popups.
+
+Contacts are grouped and sorted once so each facility lookup is a dict hit
+instead of a scan over the whole contacts table.
+"""
+import pandas as pd
+
+from utils.storage import fill_text, read_table
+
+TOP_CONTACTS = 4
+# Popup text fields; blank cells are stored as "" in the index so popups need no NaN checks
+CONTACT_TEXT_COLUMNS = ["first_name", "last_name", "title", "email", "phone", "ext", "mobile"]
+
+
+def _sorted_contacts(contacts):
+    by, ascending = ["facility_id"], [True]
+    if "contact_rank" in contacts.columns:
+        by.append("contact_rank")
+        ascending.append(True)
+    if "last_verified" in contacts.columns:
+        by.append("last_verified")
+        ascending.append(False)
+    return contacts.sort_values(by, ascending=ascending, kind="stable")
+
+
+def build_contact_index(contacts, top_n=TOP_CONTACTS):
+    """Return {(facility_id, specialty): [contact records]} plus (facility_id, None) fallbacks.
+
+    Each list holds at most top_n contacts ordered by contact_rank, then most recently verified.
+    """
+    if contacts is None or contacts.empty or "facility_id" not in contacts.columns:
+        return {}
+    contacts = _sorted_contacts(contacts)
+    text = [c for c in CONTACT_TEXT_COLUMNS if c in contacts.columns]
+    contacts = contacts.assign(**{c: fill_text(contacts[c]) for c in text})
+    index = {}
+    # facility-only fallback first so specialty keys can never be shadowed
+    top = contacts.groupby("facility_id", sort=False).head(top_n)
+    for fid, rec in zip(top["facility_id"], top.to_dict(orient="records")):
+        index.setdefault((fid, None), []).append(rec)
+    if "specialty" in contacts.columns:
+        spec = contacts["specialty"].fillna("")
+        top = contacts.groupby([contacts["facility_id"], spec], sort=False).head(top_n)
+        for key, rec in zip(zip(top["facility_id"], spec[top.index]), top.to_dict(orient="records")):
+            index.setdefault(key, []).append(rec)
+    return index
+
+
+def lookup_contacts(index, facility_id, specialty=None):
+    """Top contacts for a facility, preferring ones tagged with the given specialty."""
+    if specialty is not None:
+        hit = index.get((facility_id, "" if pd.isna(specialty) else specialty))
+        if hit:
+            return hit
+    return index.get((facility_id, None), [])
+
+
+def load_contact_index(path="app/data/processed/contacts.csv", top_n=TOP_CONTACTS):
+    """Read contacts from disk and index them; missing or unreadable files give an empty index."""
+    try:
+        return build_contact_index(read_table(path), top_n=top_n)
+    except Exception:
+        return {}
@@ -0,0 +1,171 @@
+"""Process-wide cache for the processed data files and rendered maps.
+
+Streamlit reruns the whole script on every widget interaction; keeping parsed
+frames and map HTML here means a rerun only pays for what actually changed.
+File entries are keyed on (mtime, size) — plus a content hash when
+DATA_CACHE_HASH=1 — so a rewritten scores file is picked up on the next read.
+The cache is LRU-bounded by DATA_CACHE_MB.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.contacts import load_contact_index
+from utils.facility_index import load_facility_index
+from utils.instrumentation import app_report, stage
+from utils.storage import compact_types, read_table, source_path
+
+MAX_CACHE_MB = float(os.environ.get("DATA_CACHE_MB", "256"))
+HASH_CONTENT = os.environ.get("DATA_CACHE_HASH", "0").lower() in ["1", "true", "yes"]
+# Cached tables use the compact schema (storage.compact_types) unless COMPACT_TABLES=0
+COMPACT_TABLES = os.environ.get("COMPACT_TABLES", "1").lower() in ["1", "true", "yes"]
+
+_lock = threading.RLock()
+_entries = OrderedDict()  # key -> (value, nbytes)
+_total_bytes = 0
+
+
+def file_stamp(path):
+    """Identity of a file's current contents, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    if HASH_CONTENT:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        stamp += (h.hexdigest(),)
+    return stamp
+
+
+def frame_fingerprint(df):
+    """Cheap content hash of a DataFrame, for keying results derived from in-memory data."""
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(repr(list(df.columns)).encode())
+    return h.hexdigest()
+
+
+def _sizeof(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if hasattr(value, "get_root"):
+        # folium maps: what they hold is roughly what they render to
+        return len(value.get_root().render())
+    if isinstance(value, dict):
+        if value and all(isinstance(v, list) for v in value.values()):
+            # contact index: rough per-record estimate is enough for eviction
+            return sum(len(v) for v in value.values()) * 512
+        return sum(_sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value)
+    return 1024
+
+
+def _evict_over_budget():
+    global _total_bytes
+    budget = MAX_CACHE_MB * 1024 * 1024
+    # always keep the most recent entry, even if it alone exceeds the budget
+    while _total_bytes > budget and len(_entries) > 1:
+        _, (_, nbytes) = _entries.popitem(last=False)
+        _total_bytes -= nbytes
+
+
+def get_or_build(key, build):
+    """Return the cached value for key, calling build() and storing the result on a miss."""
+    global _total_bytes
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key][0]
+    value = build()
+    nbytes = _sizeof(value)
+    with _lock:
+        if key in _entries:
+            _total_bytes -= _entries[key][1]
+        _entries[key] = (value, nbytes)
+        _total_bytes += nbytes
+        _evict_over_budget()
+    return value
+
+
+def evict(path=None):
+    """Drop cached entries for one file (any version), or everything when path is None."""
+    global _total_bytes
+    with _lock:
+        if path is None:
+            _entries.clear()
+            _total_bytes = 0
+            return
+        for key in [k for k in _entries if path in k[1:]]:
+            _total_bytes -= _entries.pop(key)[1]
+
+
+def _drop_stale(kind, path, stamp):
+    global _total_bytes
+    with _lock:
+        for key in [k for k in _entries if k[0] == kind and k[1] == path and k[2] != stamp]:
+            _total_bytes -= _entries.pop(key)[1]
+
+
+def cache_info():
+    with _lock:
+        return {"entries": len(_entries), "bytes": _total_bytes, "budget_bytes": int(MAX_CACHE_MB * 1024 * 1024)}
+
+
+def read_table_cached(path, columns=None, compact=COMPACT_TABLES):
+    """storage.read_table(path, columns), parsed once per file version. Callers get a shallow copy.
+
+    compact=True keeps the table in the compact schema (storage.compact_types).
+    """
+    stamp = file_stamp(source_path(path))
+    if stamp is None:
+        raise FileNotFoundError(path)
+    _drop_stale("table", path, stamp)
+    cols = tuple(columns) if columns is not None else None
+
+    def build():
+        df = read_table(path, columns=columns)
+        return compact_types(df) if compact else df
+    return get_or_build(("table", path, stamp, cols, compact), build).copy(deep=False)
+
+
+def contact_index_cached(path="app/data/processed/contacts.csv"):
+    """Contact index (utils.contacts) for path, rebuilt only when the file changes."""
+    stamp = file_stamp(source_path(path))
+    if stamp is None:
+        return {}
+    _drop_stale("contacts", path, stamp)
+    return get_or_build(("contacts", path, stamp), lambda: load_contact_index(path))
+
+
+def map_html_cached(df, contacts_path="app/data/processed/contacts.csv", **kwargs):
+    """Rendered create_map HTML for df, reused while df and the contacts file are unchanged."""
+    from utils.map_utils import create_map
+    key = ("map", contacts_path, file_stamp(source_path(contacts_path)) if contacts_path else None,
+           frame_fingerprint(df), tuple(sorted(kwargs.items())))
+    def build():
+        with app_report("app"):
+            m = create_map(df, contacts_path=contacts_path, **kwargs)
+            with stage("map.render", rows=len(df)):
+                return m.get_root().render()
+    return get_or_build(key, build)
+
+
+def facility_index_cached(path="app/data/processed/scores_latest.csv"):
+    """Facility key index (utils.facility_index) over the scores file, rebuilt only when it changes."""
+    stamp = file_stamp(source_path(path))
+    if stamp is None:
+        raise FileNotFoundError(path)
+    _drop_stale("facility_index", path, stamp)
+    return get_or_build(("facility_index", path, stamp), lambda: load_facility_index(path))
@@ -0,0 +1,171 @@
+"""Key index over the scores table for joining uploads and other frames to scores.
+
+Rows are matched, in order of preference, on:
+  1. facility_id
+  2. normalized facility name + city + state
+  3. normalized name + state
+  4. normalized name alone, when only one scored facility has that name
+  5. a close fuzzy match of the name among facilities in the same state
+     whose names start with the same word (difflib ratio >= FUZZY_CUTOFF)
+
+Names are normalized by lowercasing, dropping punctuation, expanding common
+abbreviations ("Hosp", "Med Ctr", "St.") and sorting the words, so "St.
+Mary's Med Ctr" and "Saint Marys Medical Center" share a key. The training
+job stores that key as the name_key column of the scores table, so the app
+never re-normalizes the scored names. Lookups are hash-index probes over the
+distinct keys of the incoming frame.
+"""
+import difflib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import compact_types, fill_text, read_table
+
+NAME_COLUMNS = ["facility_name", "Facility Name", "facility", "Facility"]
+CITY_COLUMNS = ["city", "City"]
+STATE_COLUMNS = ["state", "State"]
+# Scores columns copied onto matched rows
+MERGE_COLUMNS = ["facility_id", "score", "high_likelihood", "active_posting", "lat", "lon"]
+FUZZY_CUTOFF = float(os.environ.get("FACILITY_FUZZY_CUTOFF", "0.88"))
+# Distinct unmatched names tried fuzzily per call; the rest stay unmatched
+FUZZY_MAX_NAMES = int(os.environ.get("FACILITY_FUZZY_MAX_NAMES", "5000"))
+
+_ABBREVIATIONS = {
+    "hosp": "hospital", "med": "medical", "ctr": "center", "cntr": "center", "centre": "center",
+    "st": "saint", "mt": "mount", "reg": "regional", "gen": "general", "univ": "university",
+    "hlth": "health", "sys": "system", "peds": "pediatric", "childrens": "children", "mem": "memorial",
+}
+_DROP = {"the", "and", "of", "inc", "llc"}
+_PUNCT = re.compile(r"[^a-z0-9 ]+")
+
+
+def _normalize_one(name):
+    s = _PUNCT.sub(" ", str(name).lower().replace("&", " and ").replace("'", ""))
+    words = (_ABBREVIATIONS.get(w, w) for w in s.split())
+    return " ".join(sorted(w for w in words if w not in _DROP))
+
+
+def normalize_names(values) -> pd.Series:
+    """Name keys for a column of facility names (computed once per distinct name)."""
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    keys = np.array([_normalize_one(u) for u in uniques] + [""], dtype=object)
+    # missing names (code -1) map to the trailing ""
+    return pd.Series(keys[codes], index=values.index)
+
+
+def _column(df, candidates):
+    col = next((c for c in candidates if c in df.columns), None)
+    if col is None:
+        return pd.Series("", index=df.index, dtype=object)
+    return fill_text(df[col])
+
+
+def _place_key(s):
+    return s.str.strip().str.upper()
+
+
+def _positions(keys, valid):
+    """key -> first row position, over the rows where valid is True."""
+    pos = pd.Series(np.flatnonzero(valid.to_numpy()), index=keys[valid].to_numpy())
+    return pos[~pos.index.duplicated(keep="first")]
+
+
+def build_facility_index(scores: pd.DataFrame) -> dict:
+    """Lookup tables over the rows of a scores frame (see the module docstring for the match order)."""
+    rows = scores.reset_index(drop=True)
+    name = fill_text(rows["name_key"]) if "name_key" in rows.columns else normalize_names(_column(rows, NAME_COLUMNS))
+    city = _place_key(_column(rows, CITY_COLUMNS))
+    state = _place_key(_column(rows, STATE_COLUMNS))
+    ids = _column(rows, ["facility_id"]).str.strip()
+    named = name != ""
+
+    # fuzzy candidates, blocked by state and first word of the name key
+    distinct = pd.DataFrame({"name": name, "state": state})[named].drop_duplicates()
+    blocks = {}
+    for n, s, w in zip(distinct["name"], distinct["state"], distinct["name"].str.split(" ", n=1).str[0]):
+        blocks.setdefault((s, w), []).append(n)
+
+    return {
+        "rows": rows,
+        "id": _positions(ids, ids != ""),
+        "full": _positions(name + "|" + city + "|" + state, named),
+        "name_state": _positions(name + "|" + state, named),
+        # a bare name only identifies a facility when no other scored row shares it
+        "name": _positions(name, named & ~name.duplicated(keep=False)),
+        "blocks": blocks,
+    }
+
+
+def load_facility_index(path="app/data/processed/scores_latest.csv"):
+    cols = ["facility_id", "name_key"] + NAME_COLUMNS + CITY_COLUMNS + STATE_COLUMNS + MERGE_COLUMNS
+    return build_facility_index(compact_types(read_table(path, columns=list(dict.fromkeys(cols)))))
+
+
+def _probe(table, keys, pos, method, label):
+    """Fill pos/method for still-unmatched rows whose key is in table (one probe per distinct key)."""
+    todo = pos < 0
+    if not todo.any() or table.empty:
+        return
+    codes, uniques = pd.factorize(keys[todo])
+    hits = table.reindex(uniques).to_numpy()
+    found = hits[codes]
+    ok = ~np.isnan(found)
+    idx = np.flatnonzero(todo)[ok]
+    pos[idx] = found[ok].astype(np.int64)
+    method[idx] = label
+
+
+def _fuzzy(index, name, state, pos, method):
+    todo = (pos < 0) & (name != "").to_numpy() & (state != "").to_numpy()
+    if not todo.any():
+        return
+    pairs = pd.DataFrame({"name": name[todo].to_numpy(), "state": state[todo].to_numpy()})
+    distinct = pairs.drop_duplicates().head(FUZZY_MAX_NAMES)
+    lookup = {}
+    for n, s in distinct.itertuples(index=False):
+        candidates = index["blocks"].get((s, n.split(" ", 1)[0]), [])
+        best = difflib.get_close_matches(n, candidates, n=1, cutoff=FUZZY_CUTOFF)
+        if best:
+            lookup[n + "|" + s] = index["name_state"][best[0] + "|" + s]
+    if lookup:
+        _probe(pd.Series(lookup, dtype=float), (name + "|" + state).to_numpy(), pos, method, "fuzzy")
+
+
+def match_facilities(index, df: pd.DataFrame):
+    """Row position in index["rows"] for each row of df (-1 if unmatched) and how it was matched."""
+    pos = np.full(len(df), -1, dtype=np.int64)
+    method = np.full(len(df), "", dtype=object)
+    if "facility_id" in df.columns:
+        _probe(index["id"], fill_text(df["facility_id"]).str.strip().to_numpy(), pos, method, "id")
+    if (pos < 0).any() and any(c in df.columns for c in NAME_COLUMNS):
+        name = normalize_names(_column(df, NAME_COLUMNS))
+        city = _place_key(_column(df, CITY_COLUMNS))
+        state = _place_key(_column(df, STATE_COLUMNS))
+        _probe(index["full"], (name + "|" + city + "|" + state).to_numpy(), pos, method, "name")
+        _probe(index["name_state"], (name + "|" + state).to_numpy(), pos, method, "name")
+        _probe(index["name"], name.to_numpy(), pos, method, "name")
+        _fuzzy(index, name, state, pos, method)
+    return pos, method
+
+
+def join_scores(index, df: pd.DataFrame) -> pd.DataFrame:
+    """df with the scores columns of its matched facilities plus a 'match' column (id/name/fuzzy/'').
+
+    Columns df already has are kept and only their missing values are filled.
+    """
+    pos, method = match_facilities(index, df)
+    out = df.copy()
+    rows = index["rows"]
+    hit = pos >= 0
+    take = np.where(hit, pos, 0)
+    for col in MERGE_COLUMNS:
+        if col not in rows.columns or rows.empty:
+            continue
+        vals = pd.Series(rows[col].to_numpy()[take], index=df.index).where(hit)
+        out[col] = out[col].where(out[col].notna(), vals) if col in out.columns else vals
+    out["match"] = method
+    return out
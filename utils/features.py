@@ -0,0 +1,105 @@
+"""Feature parsing shared by training (app/scripts/train_predictor.py) and in-app scoring."""
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import timed
+
+FEATURE_CANDIDATES = [
+    "postings_90d", "postings_365d", "last_post_days",
+    "competitor_postings_30d", "census_index", "seasonality_index",
+    "turnover_index", "credentialing_days", "beds"
+]
+
+
+def _safe_num(x):
+    """Convert text ranges like '16-18' -> 17; leave numbers as float; NaNs -> np.nan."""
+    if pd.isna(x):
+        return np.nan
+    s = str(x).strip()
+    if "-" in s:
+        try:
+            parts = [float(p) for p in s.split("-") if p.strip() != ""]
+            return float(np.mean(parts)) if parts else np.nan
+        except:
+            return np.nan
+    try:
+        return float(s)
+    except:
+        return np.nan
+
+
+def _float_or_nan(s):
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Plain decimal/e-notation numbers; these can be cast in bulk
+_NUMBER_RE = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+
+
+def _to_float(s: pd.Series) -> pd.Series:
+    """float() on a Series of stripped strings; only cells that aren't plain numbers go through float()."""
+    out = pd.Series(np.nan, index=s.index)
+    clean = s.str.fullmatch(_NUMBER_RE).fillna(False).astype(bool)
+    out[clean] = s[clean].astype(float)
+    # float() also takes '1_000', 'inf' and non-ASCII digits; anything without those can't parse
+    retry = ~clean & s.str.contains(r"\d|inf|[^\x00-\x7f]", case=False, regex=True).fillna(False).astype(bool)
+    if retry.any():
+        out[retry] = s[retry].map(_float_or_nan)
+    return out
+
+
+def _parse_num_column(col: pd.Series) -> pd.Series:
+    """Vectorized col.apply(_safe_num): same output, including its quirks.
+
+    _safe_num works on str(x), so a leading '-' is read as a range separator
+    (-5 -> 5.0) and e-notation like '1e-05' is an unparseable range (-> NaN).
+    """
+    if pd.api.types.is_bool_dtype(col):
+        # str(True) is not a number
+        return pd.Series(np.nan, index=col.index)
+    if pd.api.types.is_numeric_dtype(col):
+        v = col.astype(float)
+        # str() switches to e-notation below 1e-4, which _safe_num rejects
+        return v.abs().where(~((v != 0) & (v.abs() < 1e-4)))
+
+    out = pd.Series(np.nan, index=col.index)
+    txt = col[col.notna()].astype(str).str.strip()
+    ranged = txt.str.contains("-", regex=False)
+    plain = txt[~ranged]
+    out[plain.index] = _to_float(plain)
+    if ranged.any():
+        parts = txt[ranged].str.split("-", expand=True)
+        parts = parts.apply(lambda p: p.str.strip())
+        filled = parts.notna() & (parts != "")
+        vals = parts.apply(_to_float).where(filled)
+        n = filled.sum(axis=1)
+        mean = vals.sum(axis=1) / n
+        # any unparseable piece (or no pieces at all) voids the whole range
+        bad = (filled & vals.isna()).any(axis=1) | (n == 0)
+        out[parts.index] = mean.where(~bad)
+    return out
+
+
+@timed("build_matrix")
+def build_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """Numeric design matrix: FEATURE_CANDIDATES, recency_1_over and a leading 'const' column."""
+    X = pd.DataFrame(index=df.index)
+    for col in FEATURE_CANDIDATES:
+        if col in df.columns:
+            X[col] = _parse_num_column(df[col])
+        else:
+            X[col] = 0.0
+
+    # Recency helper boosts recent activity
+    if "last_post_days" in X.columns:
+        X["recency_1_over"] = 1.0 / (1.0 + X["last_post_days"].fillna(999))
+    else:
+        X["recency_1_over"] = 0.0
+
+    # Fill remaining NaNs and add intercept
+    X = X.fillna(0.0)
+    X.insert(0, "const", 1.0)
+    return X
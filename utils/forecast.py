@@ -0,0 +1,281 @@
+"""Predicted posting dates per facility and specialty, for the Calendar View.
+
+Each (facility_id, specialty) with postings on record gets a small Poisson
+model of its weekly own-posting counts:
+    log E[count in week w] = b0 + b1 sin(2 pi w / 52.18) + b2 cos(2 pi w / 52.18)
+fitted with statsmodels once it has FORECAST_SEASONAL_WEEKS of history
+(before that, or when the seasonal fit is degenerate, just the mean weekly
+rate). Facilities with no postings on record fall back to a rate from their
+postings_90d / postings_365d columns scaled by seasonality_index.
+
+Weekly counts come from the per-day buckets kept by utils.posting_features
+(the last 365 days) and are appended to a weekly history in the state
+directory, so history longer than a year survives and nothing rescans the
+postings log. Fitted parameters are cached with a fingerprint of the series
+they were fitted on; a run refits only the series that changed (new postings,
+or a newly completed week), warm-started from the cached parameters, in
+batches of FORECAST_BATCH_SIZE across a process pool.
+
+The predicted opening date is the first day on which the chance of at least
+one posting since the as-of date reaches FORECAST_OPENING_PROB.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import stage
+from utils.posting_features import KEY, MAX_WINDOW, POSTINGS_STATE_DIR, load_state, to_day
+from utils.storage import HAVE_PARQUET, fill_text, read_table, write_table
+
+FORECAST_OUT = "app/data/processed/predicted_openings.csv"
+FORECAST_STATE_DIR = os.environ.get("FORECAST_STATE_DIR", POSTINGS_STATE_DIR)
+FORECAST_HORIZON_DAYS = int(os.environ.get("FORECAST_HORIZON_DAYS", "180"))
+FORECAST_OPENING_PROB = float(os.environ.get("FORECAST_OPENING_PROB", "0.5"))
+FORECAST_HISTORY_WEEKS = int(os.environ.get("FORECAST_HISTORY_WEEKS", "156"))
+FORECAST_SEASONAL_WEEKS = int(os.environ.get("FORECAST_SEASONAL_WEEKS", "52"))
+FORECAST_BATCH_SIZE = int(os.environ.get("FORECAST_BATCH_SIZE", "500"))
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "0")) or None  # None = one per CPU
+# Seasonal fits swinging more than e^MAX_AMPLITUDE between peak and mean are treated as degenerate
+MAX_AMPLITUDE = 3.0
+WEEKS_PER_YEAR = 365.25 / 7
+OUTPUT_COLUMNS = ["facility_id", "facility_name", "city", "state", "specialty", "predicted_date",
+                  "prob_30d", "expected_90d", "model", "as_of"]
+PARAM_COLUMNS = ["b0", "b1", "b2"]
+
+
+def _design(weeks):
+    phase = 2 * np.pi * np.asarray(weeks, dtype=float) / WEEKS_PER_YEAR
+    return np.column_stack([np.ones(len(phase)), np.sin(phase), np.cos(phase)])
+
+
+def weekly_counts(buckets, as_of_day):
+    """Own postings per key and complete week covered by the day buckets; returns (counts, first_week, last_week)."""
+    first_week = -(-(as_of_day - MAX_WINDOW + 1) // 7)  # first week whose days are all still bucketed
+    last_week = (as_of_day + 1) // 7 - 1  # last week that has ended by as_of
+    b = buckets[buckets["own"] > 0]
+    week = b["day"] // 7
+    b = b[(week >= first_week) & (week <= last_week)].assign(week=week)
+    counts = b.groupby(KEY + ["week"], as_index=False)["own"].sum().rename(columns={"own": "count"})
+    return counts, first_week, last_week
+
+
+def merge_history(history, counts, first_week, last_week):
+    """history with the weeks first_week..last_week replaced by counts, trimmed to FORECAST_HISTORY_WEEKS."""
+    keep = history[(history["week"] < first_week) & (history["week"] > last_week - FORECAST_HISTORY_WEEKS)]
+    return pd.concat([keep, counts], ignore_index=True).sort_values(KEY + ["week"], ignore_index=True)
+
+
+def _fingerprints(history, start_week, last_week):
+    """Per-key hash of the weekly series and the week range it spans."""
+    span = f"{start_week}:{last_week}|".encode()
+    out = {}
+    for key, g in history.groupby(KEY, sort=False):
+        out[key] = hashlib.sha1(span + g["week"].to_numpy().tobytes() + g["count"].to_numpy().tobytes()).hexdigest()
+    return pd.Series(out, dtype=object)
+
+
+def _fit_one(X, y, start_params=None):
+    """(model, params) for one weekly series."""
+    mean = np.log(y.mean())
+    if len(y) < FORECAST_SEASONAL_WEEKS:
+        return "mean", (mean, 0.0, 0.0)
+    import statsmodels.api as sm
+    try:
+        res = sm.GLM(y, X, family=sm.families.Poisson()).fit(start_params=start_params, maxiter=50)
+        b0, b1, b2 = (float(p) for p in res.params)
+    except Exception:
+        return "mean", (mean, 0.0, 0.0)
+    if not np.isfinite([b0, b1, b2]).all() or np.hypot(b1, b2) > MAX_AMPLITUDE:
+        return "mean", (mean, 0.0, 0.0)
+    return "seasonal", (b0, b1, b2)
+
+
+def _fit_batch(job):
+    """Fit every series in a batch; runs in a worker process."""
+    start_week, last_week, series = job
+    X = _design(np.arange(start_week, last_week + 1))
+    out = []
+    for key, weeks, counts, start_params in series:
+        y = np.zeros(len(X))
+        y[weeks - start_week] = counts
+        model, params = _fit_one(X, y, start_params)
+        out.append((key, model, params))
+    return out
+
+
+def fit_models(history, start_week, last_week, params=None, workers=FORECAST_WORKERS):
+    """Fitted parameters per key, reusing the rows of params whose series fingerprint is unchanged.
+
+    Returns (params, refitted) with params indexed by KEY.
+    """
+    prints = _fingerprints(history, start_week, last_week)
+    if params is None or params.empty:
+        params = pd.DataFrame(columns=["model", *PARAM_COLUMNS, "fingerprint"],
+                              index=pd.MultiIndex.from_arrays([[], []], names=KEY))
+    params = params[params.index.isin(prints.index)]
+    cached = params["fingerprint"].reindex(prints.index)
+    todo = prints.index[cached.to_numpy() != prints.to_numpy()]
+    if len(todo):
+        groups = history.groupby(KEY, sort=False)
+        warm = params[params["model"] == "seasonal"][PARAM_COLUMNS]
+        series = []
+        for key in todo:
+            g = groups.get_group(key)
+            start = warm.loc[key].to_numpy(dtype=float) if key in warm.index else None
+            series.append((key, g["week"].to_numpy(), g["count"].to_numpy(dtype=float), start))
+        jobs = [(start_week, last_week, series[i:i + FORECAST_BATCH_SIZE])
+                for i in range(0, len(series), FORECAST_BATCH_SIZE)]
+        if len(jobs) == 1 or workers == 1:
+            results = [_fit_batch(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_fit_batch, jobs))
+        fitted = pd.DataFrame([(*key, model, *p) for batch in results for key, model, p in batch],
+                              columns=KEY + ["model", *PARAM_COLUMNS]).set_index(KEY)
+        fitted["fingerprint"] = prints.reindex(fitted.index).to_numpy()
+        params = pd.concat([params.drop(index=fitted.index, errors="ignore"), fitted])
+        params[PARAM_COLUMNS] = params[PARAM_COLUMNS].astype(float)
+    return params, len(todo)
+
+
+def prior_rates(features):
+    """Posts per day for rows without a fitted model, from the posting columns and seasonality_index."""
+    def col(name, default):
+        if name not in features.columns:
+            return pd.Series(default, index=features.index, dtype=float)
+        return pd.to_numeric(features[name], errors="coerce").fillna(default)
+    rate = (col("postings_90d", 0.0) / 90 + col("postings_365d", 0.0) / 365) / 2
+    return (rate * col("seasonality_index", 1.0).clip(lower=0)).to_numpy()
+
+
+def daily_rates(params, as_of_day, horizon=FORECAST_HORIZON_DAYS):
+    """Expected postings on each of the horizon days after as_of_day, one row per params row."""
+    days = np.arange(as_of_day + 1, as_of_day + horizon + 1)
+    X = _design(days // 7)
+    return np.exp(params[PARAM_COLUMNS].to_numpy(dtype=float) @ X.T) / 7
+
+
+def opening_forecast(rates, as_of_day, prob=FORECAST_OPENING_PROB):
+    """predicted_date, prob_30d and expected_90d from a (rows x horizon days) matrix of daily rates."""
+    cum = np.cumsum(rates, axis=1)
+    # P(at least one posting by day d) >= prob  <=>  expected count by day d >= -ln(1 - prob)
+    hit = cum >= -np.log1p(-prob)
+    first = np.where(hit.any(axis=1), hit.argmax(axis=1) + 1, -1)
+    dates = [date.fromordinal(date(1970, 1, 1).toordinal() + as_of_day + int(d)).isoformat() if d > 0 else ""
+             for d in first]
+    horizon = rates.shape[1]
+    return pd.DataFrame({
+        "predicted_date": dates,
+        "prob_30d": (1 - np.exp(-cum[:, min(30, horizon) - 1])).round(4),
+        "expected_90d": cum[:, min(90, horizon) - 1].round(3),
+    })
+
+
+def _state_paths(state_dir):
+    ext = ".parquet" if HAVE_PARQUET else ".csv"
+    return (os.path.join(state_dir, "forecast_history" + ext), os.path.join(state_dir, "forecast_params" + ext),
+            os.path.join(state_dir, "forecast_state.json"))
+
+
+def _read(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, dtype={c: str for c in KEY})
+
+
+def _write(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def load_forecast_state(state_dir=FORECAST_STATE_DIR):
+    """(weekly history, params indexed by KEY, meta); empty when there is no saved state."""
+    history_path, params_path, meta_path = _state_paths(state_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        history = _read(history_path)
+        params = _read(params_path).set_index(KEY)
+    except (OSError, ValueError):
+        history = pd.DataFrame({"facility_id": pd.Series(dtype=str), "specialty": pd.Series(dtype=str),
+                                "week": pd.Series(dtype=np.int64), "count": pd.Series(dtype=np.int64)})
+        return history, None, {}
+    return history, params, meta
+
+
+def save_forecast_state(history, params, meta, state_dir=FORECAST_STATE_DIR):
+    history_path, params_path, meta_path = _state_paths(state_dir)
+    os.makedirs(state_dir, exist_ok=True)
+    _write(history, history_path)
+    _write(params.reset_index(), params_path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+
+def run_forecast(scores_path="app/data/processed/scores_latest.csv", out_path=FORECAST_OUT,
+                 state_dir=FORECAST_STATE_DIR, postings_state_dir=POSTINGS_STATE_DIR, as_of=None):
+    """Update the weekly history and models from the posting buckets and write predicted openings.
+
+    Returns a stats dict (rows, tracked series, refitted series, as_of).
+    """
+    with stage("forecast.load") as info:
+        features = read_table(scores_path)
+        info["rows"] = len(features)
+        buckets, _, posting_meta = load_state(postings_state_dir)
+        history, params, meta = load_forecast_state(state_dir)
+    # the forecast is as of the day the posting state was last advanced to
+    as_of_day = posting_meta.get("as_of_day") or to_day(as_of or date.today())
+
+    with stage("forecast.history", rows=len(buckets)):
+        counts, first_week, last_week = weekly_counts(buckets, as_of_day)
+        if last_week >= meta.get("last_week", -1):
+            history = merge_history(history, counts, first_week, last_week)
+        # every series starts where the postings log does (at most FORECAST_HISTORY_WEEKS back)
+        start_week = meta.get("start_week")
+        if start_week is None and not history.empty:
+            start_week = int(history["week"].min())
+        start_week = max(start_week if start_week is not None else first_week, last_week - FORECAST_HISTORY_WEEKS + 1)
+        history = history[history["week"] >= start_week]
+
+    with stage("forecast.fit") as info:
+        params, refitted = fit_models(history, start_week, last_week, params)
+        info["rows"] = refitted
+    save_forecast_state(history, params, {"start_week": None if history.empty else start_week,
+                                          "last_week": last_week}, state_dir)
+
+    with stage("forecast.predict", rows=len(features)):
+        keys = pd.DataFrame({"facility_id": fill_text(features["facility_id"]).astype(str),
+                             "specialty": fill_text(features["specialty"]).astype(str)
+                             if "specialty" in features.columns else ""})
+        fitted = params.reindex(pd.MultiIndex.from_frame(keys))
+        has_model = fitted["model"].notna().to_numpy()
+        rates = np.repeat(prior_rates(features)[:, None], FORECAST_HORIZON_DAYS, axis=1)
+        if has_model.any():
+            rates[has_model] = daily_rates(fitted[has_model], as_of_day)
+        out = opening_forecast(rates, as_of_day)
+        out.insert(0, "model", np.where(has_model, fitted["model"].to_numpy(), "prior"))
+        for col in ["facility_id", "facility_name", "city", "state", "specialty"]:
+            if col in features.columns:
+                out[col] = features[col].to_numpy()
+        out["as_of"] = date.fromordinal(date(1970, 1, 1).toordinal() + as_of_day).isoformat()
+        out = out[[c for c in OUTPUT_COLUMNS if c in out.columns]]
+
+    with stage("forecast.write", rows=len(out)):
+        write_table(out, out_path)
+    return {"rows": len(out), "tracked": len(params), "refitted": refitted, "as_of": out["as_of"].iloc[0] if len(out) else ""}
+
+
+def upcoming_openings(openings, days, specialties=None):
+    """Rows of the predicted openings table whose predicted_date falls within days of its as-of date."""
+    when = pd.to_datetime(openings["predicted_date"], errors="coerce")
+    as_of = pd.to_datetime(openings["as_of"], errors="coerce")
+    keep = when.notna() & (when <= as_of + pd.Timedelta(days=days))
+    if specialties:
+        keep &= openings["specialty"].isin(specialties)
+    return openings[keep].assign(predicted_date=when[keep]).sort_values(["predicted_date", "prob_30d"],
+                                                                         ascending=[True, False])
@@ -0,0 +1,197 @@
+"""Fill in missing facility coordinates from name/city/state.
+
+Each row needing coordinates is looked up first at facility level
+(name, city, state), then at city level (city, state). Lookups go through
+a SQLite cache (GEOCODE_CACHE_PATH) keyed on the normalized query, so a
+facility is only ever geocoded once; misses are cached too, per backend,
+and retried after GEOCODE_MISS_TTL_DAYS or as soon as a different backend
+is configured. Only distinct uncached queries reach the
+backend, and results are written to the cache in batches of
+GEOCODE_BATCH_SIZE so an interrupted run keeps its progress.
+
+Backends (GEOCODER):
+  offline    local gazetteer CSV (GAZETTEER_PATH) with columns city,state,lat,lon
+             and optionally facility_name for facility-level rows; no network
+             (without a gazetteer file this behaves like none)
+  nominatim  OpenStreetMap via geopy, rate limited to one request per
+             GEOCODE_MIN_DELAY_SECONDS
+  none       cache only
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import fill_text
+
+GEOCODER = os.environ.get("GEOCODER", "offline").lower()
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", "app/data/geocode_cache.sqlite")
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", "app/data/gazetteer.csv")
+GEOCODE_MIN_DELAY_SECONDS = float(os.environ.get("GEOCODE_MIN_DELAY_SECONDS", "1.0"))
+GEOCODE_BATCH_SIZE = int(os.environ.get("GEOCODE_BATCH_SIZE", "100"))
+GEOCODE_MISS_TTL_DAYS = float(os.environ.get("GEOCODE_MISS_TTL_DAYS", "30"))
+# Nominatim's usage policy asks for an identifying user agent
+GEOCODE_USER_AGENT = os.environ.get("GEOCODE_USER_AGENT", "locum-tracker")
+
+
+def _norm(s):
+    # "|" separates the parts of a cache key
+    return fill_text(s).str.replace("|", " ", regex=False).str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+
+
+def query_key(name, city, state):
+    """Cache key for a query; name="" for a city-level query."""
+    return f"{name}|{city}|{state}"
+
+
+class OfflineGazetteer:
+    """Exact lookups in a local gazetteer file; unknown places resolve to None."""
+    source = "gazetteer"
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.places = {}
+        if not path or not os.path.exists(path):
+            return
+        g = pd.read_csv(path, dtype=str)
+        name = _norm(g["facility_name"]) if "facility_name" in g.columns else pd.Series("", index=g.index)
+        keys = [query_key(n, c, s) for n, c, s in zip(name, _norm(g["city"]), _norm(g["state"]))]
+        coords = zip(pd.to_numeric(g["lat"], errors="coerce"), pd.to_numeric(g["lon"], errors="coerce"))
+        self.places = {k: (la, lo) for k, (la, lo) in zip(keys, coords) if not (np.isnan(la) or np.isnan(lo))}
+
+    def geocode(self, name, city, state):
+        return self.places.get(query_key(name, city, state))
+
+
+class NominatimGeocoder:
+    """OpenStreetMap Nominatim through geopy, at most one request per min_delay seconds."""
+    source = "nominatim"
+
+    def __init__(self, min_delay=GEOCODE_MIN_DELAY_SECONDS, user_agent=GEOCODE_USER_AGENT):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+        self._geocode = RateLimiter(Nominatim(user_agent=user_agent, timeout=10).geocode,
+                                    min_delay_seconds=min_delay, max_retries=2, error_wait_seconds=5.0,
+                                    swallow_exceptions=False)
+
+    def geocode(self, name, city, state):
+        parts = [p for p in (name, city, state) if p]
+        loc = self._geocode(", ".join(parts) + ", USA", country_codes="us")
+        return (loc.latitude, loc.longitude) if loc else None
+
+
+def make_geocoder(kind=GEOCODER):
+    if kind == "offline":
+        # an empty gazetteer answers nothing; caching its misses would only be noise
+        gazetteer = OfflineGazetteer()
+        return gazetteer if gazetteer.places else None
+    if kind == "nominatim":
+        return NominatimGeocoder()
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown GEOCODER: {kind}")
+
+
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS geocode ("
+                          "query TEXT PRIMARY KEY, lat REAL, lon REAL, source TEXT, resolved_at TEXT)")
+
+    def get_many(self, keys, source=None):
+        """{query: (lat, lon) or None} for cached keys.
+
+        Misses older than the TTL, or recorded by a backend other than source, count as uncached.
+        """
+        stale = (datetime.utcnow() - timedelta(days=GEOCODE_MISS_TTL_DAYS)).isoformat()
+        out = {}
+        keys = list(keys)
+        # stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT query, lat, lon, source, resolved_at FROM geocode WHERE query IN ({','.join('?' * len(chunk))})",
+                chunk)
+            for q, lat, lon, src, at in rows:
+                if lat is not None:
+                    out[q] = (lat, lon)
+                elif at >= stale and src == source:
+                    out[q] = None
+        return out
+
+    def put_many(self, results, source):
+        now = datetime.utcnow().isoformat()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO geocode (query, lat, lon, source, resolved_at) VALUES (?, ?, ?, ?, ?)",
+            [(q, *(r if r else (None, None)), source, now) for q, r in results.items()])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _resolve(keys, cache, geocoder, stats):
+    """Coordinates for each distinct key, from the cache or (in batches) the geocoder.
+
+    Failed lookups (network errors, timeouts) are not cached, so the next run retries them.
+    """
+    found = cache.get_many(keys, geocoder.source if geocoder is not None else None)
+    todo = [k for k in keys if k not in found]
+    if geocoder is None:
+        return found
+    for i in range(0, len(todo), GEOCODE_BATCH_SIZE):
+        batch = {}
+        for k in todo[i:i + GEOCODE_BATCH_SIZE]:
+            try:
+                batch[k] = geocoder.geocode(*k.split("|"))
+            except Exception:
+                stats["errors"] += 1
+        cache.put_many(batch, geocoder.source)
+        found.update(batch)
+        stats["lookups"] += len(batch)
+    return found
+
+
+def fill_missing_coordinates(df, geocoder=None, cache_path=GEOCODE_CACHE_PATH):
+    """df with missing lat/lon filled where a facility- or city-level lookup succeeds.
+
+    Returns (df, stats) where stats counts missing rows, facility/city-level fills, backend
+    lookups and failed lookups.
+    """
+    lat = pd.to_numeric(df["lat"], errors="coerce") if "lat" in df.columns else pd.Series(np.nan, index=df.index)
+    lon = pd.to_numeric(df["lon"], errors="coerce") if "lon" in df.columns else pd.Series(np.nan, index=df.index)
+    missing = lat.isna() | lon.isna()
+    stats = {"missing": int(missing.sum()), "facility": 0, "city": 0, "lookups": 0, "errors": 0}
+    if not missing.any():
+        return df, stats
+
+    rows = df[missing]
+    name = _norm(rows["facility_name"]) if "facility_name" in rows.columns else pd.Series("", index=rows.index)
+    city = _norm(rows["city"]) if "city" in rows.columns else pd.Series("", index=rows.index)
+    state = _norm(rows["state"]) if "state" in rows.columns else pd.Series("", index=rows.index)
+    fac_keys = pd.Series([query_key(n, c, s) for n, c, s in zip(name, city, state)], index=rows.index)
+    city_keys = pd.Series([query_key("", c, s) for c, s in zip(city, state)], index=rows.index)
+    has_place = (city != "") | (state != "")
+
+    if geocoder is None:
+        geocoder = make_geocoder()
+    cache = GeocodeCache(cache_path)
+    try:
+        found = _resolve(list(dict.fromkeys(fac_keys[(name != "") & has_place])), cache, geocoder, stats)
+        fac_hit = fac_keys.map(lambda k: found.get(k))
+        need_city = fac_hit.isna() & has_place
+        found_city = _resolve(list(dict.fromkeys(city_keys[need_city])), cache, geocoder, stats)
+        city_hit = city_keys.map(lambda k: found_city.get(k)).where(need_city)
+    finally:
+        cache.close()
+
+    coords = fac_hit.where(fac_hit.notna(), city_hit).dropna()
+    stats["facility"] = int(fac_hit.notna().sum())
+    stats["city"] = int(len(coords) - stats["facility"])
+    out = df.copy()
+    out["lat"], out["lon"] = lat, lon
+    out.loc[coords.index, "lat"] = [c[0] for c in coords]
+    out.loc[coords.index, "lon"] = [c[1] for c in coords]
+    return out, stats
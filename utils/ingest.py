@@ -0,0 +1,123 @@
+"""Streaming ingestion for uploaded job-board exports (.xlsx or .csv).
+
+Rows are read in bounded chunks (openpyxl read-only iteration for workbooks,
+pandas chunking for CSV). The specialty filter and column projection are
+applied while reading, so the full sheet is never held in memory at once.
+"""
+import os
+
+import pandas as pd
+
+from utils.data_cache import get_or_build
+from utils.features import FEATURE_CANDIDATES
+from utils.predictor import predict_needs
+from utils.scorer import load_scorer
+
+CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", "50000"))
+SPECIALTY_COL = "Specialty"
+
+# Columns the app shows, maps or scores; everything else in an upload is dropped while reading
+UPLOAD_COLUMNS = [
+    "Facility Name", "Contact Name", "Contact Email", "Predicted Need", "Specialty", "City", "State",
+    "facility_id", "facility_name", "city", "state", "specialty", "lat", "lon",
+    "likely_procedures", "avg_volume", "pay_expect", "active_posting", "high_likelihood", "score",
+] + FEATURE_CANDIDATES
+
+
+def _is_excel(uploaded_file):
+    return str(getattr(uploaded_file, "name", "")).lower().endswith((".xlsx", ".xlsm"))
+
+
+def _file_size(f):
+    size = getattr(f, "size", None)
+    if size is None:
+        pos = f.tell()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(pos)
+    return size or 1
+
+
+def _excel_chunks(f, specialties, columns, chunk_rows, progress):
+    import openpyxl
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        total = ws.max_row or 0
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h) if h is not None else f"col_{i}" for i, h in enumerate(next(rows, ()))]
+        keep = [i for i, h in enumerate(header) if columns is None or h in columns or h == SPECIALTY_COL]
+        names = [header[i] for i in keep]
+        spec_pos = names.index(SPECIALTY_COL) if SPECIALTY_COL in names else None
+
+        batch, yielded = [], False
+        for n, row in enumerate(rows, start=2):
+            vals = [row[i] if i < len(row) else None for i in keep]
+            if specialties is not None and spec_pos is not None and vals[spec_pos] not in specialties:
+                continue
+            batch.append(vals)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=names)
+                batch, yielded = [], True
+                if progress and total:
+                    progress(min(n / total, 1.0))
+        # a filter that matches nothing still yields the (empty) header columns
+        if batch or not yielded:
+            yield pd.DataFrame(batch, columns=names)
+    finally:
+        wb.close()
+
+
+def _csv_chunks(f, specialties, columns, chunk_rows, progress):
+    size = _file_size(f)
+    usecols = (lambda c: c in columns or c == SPECIALTY_COL) if columns is not None else None
+    for chunk in pd.read_csv(f, chunksize=chunk_rows, usecols=usecols):
+        if specialties is not None and SPECIALTY_COL in chunk.columns:
+            chunk = chunk[chunk[SPECIALTY_COL].isin(specialties)]
+        yield chunk
+        if progress:
+            progress(min(f.tell() / size, 1.0))
+
+
+def iter_upload_chunks(uploaded_file, specialties=None, columns=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Yield DataFrames of at most chunk_rows rows from an uploaded workbook or CSV.
+
+    specialties: keep only rows whose Specialty is in this collection (None keeps all).
+    columns: keep only these columns (Specialty is always kept so the filter can run).
+    progress: optional callable receiving the fraction of the file read so far.
+    """
+    uploaded_file.seek(0)
+    specialties = set(specialties) if specialties else None
+    columns = set(columns) if columns is not None else None
+    reader = _excel_chunks if _is_excel(uploaded_file) else _csv_chunks
+    yield from reader(uploaded_file, specialties, columns, chunk_rows, progress)
+    if progress:
+        progress(1.0)
+
+
+def upload_specialties(uploaded_file):
+    """Distinct Specialty values in an upload, read with only that column in memory."""
+    def build():
+        seen = set()
+        for chunk in iter_upload_chunks(uploaded_file, columns=[SPECIALTY_COL]):
+            if SPECIALTY_COL in chunk.columns:
+                seen.update(chunk[SPECIALTY_COL].dropna().unique())
+        return sorted(seen, key=str)
+    return get_or_build(("upload_specialties", _upload_key(uploaded_file)), build)
+
+
+def _upload_key(uploaded_file):
+    # Streamlit's UploadedFile has a stable file_id per upload; fall back to name+size elsewhere
+    return getattr(uploaded_file, "file_id", None) or (getattr(uploaded_file, "name", ""), _file_size(uploaded_file))
+
+
+def load_upload(uploaded_file, specialties=None, columns=None, progress=None):
+    """Read an upload chunk by chunk, scoring each chunk as it arrives; cached per upload and filter."""
+    def build():
+        scorer = load_scorer()
+        parts = [predict_needs(chunk, scorer=scorer)
+                 for chunk in iter_upload_chunks(uploaded_file, specialties, columns, progress=progress)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    key = ("upload", _upload_key(uploaded_file), tuple(sorted(map(str, specialties or []))),
+           tuple(sorted(columns)) if columns is not None else None)
+    return get_or_build(key, build)
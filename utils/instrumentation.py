@@ -0,0 +1,205 @@
+"""Stage timing and memory instrumentation for the batch jobs.
+
+A job wraps its work in run_report("train"), and marks stages either with
+the stage(...) context manager or the @timed(...) decorator. Per stage the
+report keeps call count, wall seconds, rows handled, RSS change and the
+process peak RSS. On exit it writes a JSON report to RUN_REPORT_DIR
+(<job>-<UTC timestamp>.json), which the Streamlit "Run diagnostics" panel
+reads back.
+
+Stages outside an open report cost one attribute lookup, so library code
+(build_matrix, create_map) can be decorated unconditionally. The Streamlit
+app has no job around it; it opens app_report("app") around the expensive
+work it does on a cache miss (rendering a map), so those stages show up in
+the panel too.
+"""
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_REPORT_DIR = os.environ.get("RUN_REPORT_DIR", "app/data/runs")
+# Reports kept per job; older files are removed when a new one is written
+RUN_REPORT_KEEP = int(os.environ.get("RUN_REPORT_KEEP", "50"))
+# A stage slower than this multiple of its recent median is flagged in stage_table
+SLOWDOWN_FLAG = float(os.environ.get("RUN_SLOWDOWN_FLAG", "1.5"))
+# ...and at least this many seconds slower, so millisecond jitter is not reported
+SLOWDOWN_MIN_SECONDS = 0.1
+
+_local = threading.local()
+
+
+def _current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+
+class RunReport:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.utcnow().isoformat()
+        self.status = "running"
+        self.stages = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=None, rss_delta=None):
+        with self._lock:
+            rec = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": None,
+                                                "rss_delta_mb": None, "peak_rss_mb": None})
+            rec["calls"] += 1
+            rec["seconds"] += seconds
+            if rows is not None:
+                rec["rows"] = (rec["rows"] or 0) + int(rows)
+            if rss_delta is not None:
+                rec["rss_delta_mb"] = (rec["rss_delta_mb"] or 0.0) + rss_delta
+            rec["peak_rss_mb"] = _peak_rss_mb()
+
+    def to_dict(self):
+        return {
+            "job": self.name,
+            "started_at": self.started_at,
+            "status": self.status,
+            "total_seconds": round(time.perf_counter() - self._t0, 4),
+            "peak_rss_mb": _peak_rss_mb(),
+            "stages": [{"stage": k, **{f: round(v, 4) if isinstance(v, float) else v for f, v in rec.items()}}
+                       for k, rec in self.stages.items()],
+        }
+
+    def write(self, out_dir=RUN_REPORT_DIR):
+        """Write the report as JSON and prune old reports of the same job; returns the path."""
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = datetime.fromisoformat(self.started_at).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(out_dir, f"{self.name}-{stamp}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        old = sorted(glob.glob(os.path.join(out_dir, f"{self.name}-*.json")))[:-max(RUN_REPORT_KEEP, 1)]
+        for p in old:
+            os.remove(p)
+        return path
+
+
+def _stack():
+    if not hasattr(_local, "reports"):
+        _local.reports = []
+    return _local.reports
+
+
+def active_report():
+    """The innermost open RunReport on this thread, or None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def run_report(name, out_dir=RUN_REPORT_DIR, write=True):
+    """Collect stages for one job run and write the JSON report on exit (also on failure)."""
+    report = RunReport(name)
+    _stack().append(report)
+    try:
+        yield report
+        report.status = "ok"
+    except BaseException:
+        report.status = "error"
+        raise
+    finally:
+        _stack().pop()
+        if write:
+            try:
+                print(f"[run] Report {report.write(out_dir)}")
+            except OSError as e:
+                print(f"[run] Could not write report: {e}")
+
+
+@contextmanager
+def app_report(name, out_dir=RUN_REPORT_DIR):
+    """run_report(name) unless a report is already open on this thread, whose stages are then used."""
+    if active_report() is not None:
+        yield active_report()
+        return
+    with run_report(name, out_dir) as report:
+        yield report
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Time a block as a stage of the active report; set info["rows"] inside to record rows."""
+    info = {"rows": rows}
+    report = active_report()
+    if report is None:
+        yield info
+        return
+    rss0 = _current_rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        rss1 = _current_rss_mb()
+        report.record(name, time.perf_counter() - t0, info["rows"],
+                      rss1 - rss0 if rss0 is not None and rss1 is not None else None)
+
+
+def timed(name):
+    """Decorator: record each call as stage `name`, with rows = len of the first DataFrame argument."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if active_report() is None:
+                return fn(*args, **kwargs)
+            rows = next((len(a) for a in args if isinstance(a, pd.DataFrame)), None)
+            with stage(name, rows):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def load_reports(out_dir=RUN_REPORT_DIR, job=None, limit=20):
+    """Most recent run reports (newest first), optionally for one job."""
+    paths = glob.glob(os.path.join(out_dir, f"{job or '*'}-*.json"))
+    paths.sort(key=lambda p: os.path.basename(p).rsplit("-", 1)[-1], reverse=True)
+    reports = []
+    for p in paths[:limit]:
+        try:
+            with open(p) as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return reports
+
+
+def stage_table(report, history=()):
+    """Stages of one report as a DataFrame, with each stage's median seconds over `history`
+    (earlier reports of the same job) and a flag when it is SLOWDOWN_FLAG times slower."""
+    df = pd.DataFrame(report.get("stages", []))
+    if df.empty:
+        return df
+    past = [pd.DataFrame(h.get("stages", [])) for h in history if h.get("job") == report.get("job")]
+    past = [p for p in past if not p.empty]
+    if past:
+        med = pd.concat(past).groupby("stage")["seconds"].median()
+        df["median_seconds"] = df["stage"].map(med)
+        df["slowdown"] = (df["seconds"] / df["median_seconds"]).round(2)
+        df["regression"] = (df["slowdown"] >= SLOWDOWN_FLAG) & (df["seconds"] - df["median_seconds"] >= SLOWDOWN_MIN_SECONDS)
+    return df
@@ -0,0 +1,101 @@
+"""Marker styling, popups and the full facility map for the Map page.
+
+The training job's prebuilt snapshot (utils.snapshot) is rendered with the
+same build_map, so serving it looks exactly like a live render.
+"""
+import math
+
+import pandas as pd
+
+from utils.contacts import lookup_contacts
+from utils.instrumentation import timed
+from utils.storage import fill_text
+# folium takes about a second to import; it is imported where a map is actually built
+
+
+def color_for_row(row):
+    # green: active posting
+    if str(row.get("active_posting", False)).lower() in ["1", "true", "yes"]:
+        return "green"
+    # red: model predicts high likelihood
+    if str(row.get("high_likelihood", False)).lower() in ["1", "true", "yes"]:
+        return "red"
+    # specialty-based colors
+    spec = str(row.get("specialty", "")).upper()
+    if spec == "HO":
+        return "yellow"
+    if spec == "PDH":
+        return "lightblue"
+    return "gray"
+
+
+def marker_style(row):
+    """CircleMarker options; facilities that newly turned red or got a posting get a heavy black ring."""
+    color = color_for_row(row)
+    if row.get('change'):
+        return {'radius': 10, 'color': 'black', 'weight': 4, 'fill': True, 'fill_color': color, 'fill_opacity': 0.9}
+    return {'radius': 7, 'color': color, 'fill': True, 'fill_color': color}
+
+
+def build_popup(row, contact_index=None):
+    lines = []
+    lines.append(f"<b>{row.get('facility_name','')}</b>")
+    lines.append(f"Score: {float(row.get('score',0)):.2f}")
+    if row.get('change'):
+        lines.append(f"<b>{row['change'].capitalize()} since {row.get('change_since', '')}</b>")
+
+    if contact_index:
+        top = lookup_contacts(contact_index, row.get('facility_id'), row.get('specialty'))
+        if top:
+            lines.append('<hr>')
+            for c in top:
+                # the contact index stores blank cells as ''
+                name = f"{c.get('first_name') or ''} {c.get('last_name') or ''}".strip()
+                title = c.get('title') or ''
+                email = c.get('email') or ''
+                phone = c.get('phone') or ''
+                mobile = c.get('mobile') or ''
+                contact_line = f"<b>{name}</b> — {title}<br/>{email}<br/>{phone}{(' • ' + mobile) if mobile else ''}"
+                lines.append(contact_line)
+
+    # Cold-Call Prep placeholder
+    lines.append('<hr>')
+    lines.append('<i>Cold-Call Prep: check recent postings, outreach history, and notes in the facility profile.</i>')
+    return '<br/>'.join(lines)
+
+
+@timed("map_page.build_map")
+def build_map(df, contact_index):
+    """Map with one CircleMarker per facility (contact_index from utils.contacts, or None)."""
+    import folium
+    from folium import Popup
+    lat = pd.to_numeric(df['lat'], errors='coerce') if 'lat' in df.columns else pd.Series(dtype=float)
+    lon = pd.to_numeric(df['lon'], errors='coerce') if 'lon' in df.columns else pd.Series(dtype=float)
+    located = lat.notna() & lon.notna()
+    if df.empty or not located.any():
+        return folium.Map(location=[39.5, -98.35], zoom_start=4)
+
+    center = [float(lat[located].mean()), float(lon[located].mean())]
+    m = folium.Map(location=center, zoom_start=5)
+
+    for _, r in df.iterrows():
+        try:
+            lat = float(r.get('lat', 0))
+            lon = float(r.get('lon', 0))
+        except Exception:
+            continue
+        # facilities the geocoder could not place are left off the map
+        if math.isnan(lat) or math.isnan(lon):
+            continue
+        popup = build_popup(r, contact_index)
+        folium.CircleMarker(location=[lat, lon], popup=Popup(popup, max_width=400), **marker_style(r)).add_to(m)
+    return m
+
+
+def with_changes(df, changes):
+    """df plus change / change_since columns ('' for facilities without a recent flag change)."""
+    lookup = changes.set_index(changes['facility_id'] + '|' + changes['specialty'])
+    spec = fill_text(df['specialty']).astype(str) if 'specialty' in df.columns else ''
+    keys = fill_text(df['facility_id']).astype(str) + '|' + spec
+    return df.assign(change=keys.map(lookup['change']).fillna('').to_numpy(),
+                     change_since=keys.map(lookup['since']).fillna('').to_numpy())
@@ -1,8 +1,17 @@
 import folium
 from folium.features import DivIcon
 from folium import Popup
+from folium.utilities import JsCode
+import numpy as np
 import pandas as pd
 import os
+from utils.contacts import lookup_contacts
+from utils.data_cache import contact_index_cached
+from utils.instrumentation import timed
+from utils.storage import fill_text, to_bool
+
+# Above this many rows create_map switches to a single GeoJSON layer instead of one CircleMarker per facility
+BULK_MIN_ROWS = int(os.environ.get("MAP_BULK_MIN_ROWS", "1000"))
 
 
 def _choose_color(row):
@@ -20,9 +29,26 @@ def _choose_color(row):
         return "gray"
 
 
-def _format_contacts_html(contacts_df):
+def _choose_colors(df):
+    """Column-wise version of _choose_color for a whole frame."""
+    n = len(df)
+    active = to_bool(df["active_posting"]) if "active_posting" in df.columns else pd.Series(False, index=df.index)
+    high = to_bool(df["high_likelihood"]) if "high_likelihood" in df.columns else pd.Series(False, index=df.index)
+    spec = df["specialty"].astype(str).str.upper() if "specialty" in df.columns else pd.Series([""] * n, index=df.index)
+    colors = np.select(
+        [active.to_numpy(), high.to_numpy(), (spec == "PDH").to_numpy()],
+        ["green", "red", "lightblue"],
+        default="yellow",
+    )
+    return pd.Series(colors, index=df.index)
+
+
+def _format_contacts_html(contacts):
+    # accepts contact records (as stored in the contact index) or a DataFrame
+    if isinstance(contacts, pd.DataFrame):
+        contacts = contacts.to_dict(orient="records")
     lines = []
-    for _, c in contacts_df.iterrows():
+    for c in contacts:
         name = " ".join([str(c.get('first_name','')).strip(), str(c.get('last_name','')).strip()]).strip()
         title = c.get('title','')
         email = c.get('email','')
@@ -51,7 +77,82 @@ def _format_contacts_html(contacts_df):
     return "<br><div style='margin-top:6px;'>" + "<hr style='border:none;border-top:1px solid #eee'/>".join([f"<div style='font-size:13px;color:#222'>{l}</div>" for l in lines]) + "</div>" if lines else ""
 
 
-def create_map(df, contacts_path="app/data/processed/contacts.csv"):
+def _contact_html_for(contact_index, facility_id, spec):
+    if not contact_index:
+        return ""
+    return _format_contacts_html(lookup_contacts(contact_index, facility_id, spec))
+
+
+def _text_col(df, col):
+    if col not in df.columns:
+        return pd.Series([""] * len(df), index=df.index)
+    return fill_text(df[col]).replace("nan", "")
+
+
+def _popup_html_columns(df, contact_index=None):
+    """Build the marker popup HTML for every row at once (same layout as the per-row path)."""
+    fname = fill_text(df["facility_name"], "Unknown") if "facility_name" in df.columns else pd.Series(["Unknown"] * len(df), index=df.index)
+    score = pd.to_numeric(df["score"], errors="coerce").fillna(0.0) if "score" in df.columns else pd.Series(0.0, index=df.index)
+    spec = _text_col(df, "specialty")
+
+    html = ("<div style='max-width:320px'><div style='font-weight:700;font-size:15px'>" + fname
+            + "</div><div style='font-size:13px;color:#555'>Score: " + score.map("{:.2f}".format) + " • " + spec + "</div>")
+
+    # Cold-call prep pieces, joined only where present
+    prep = pd.Series([""] * len(df), index=df.index)
+    for col, label in [("likely_procedures", "Likely procedures"), ("avg_volume", "Avg volume"), ("pay_expect", "Pay")]:
+        val = _text_col(df, col)
+        sep = pd.Series(np.where(prep != "", "<br>", ""), index=df.index)
+        prep = prep.where(val == "", prep + sep + label + ": " + val)
+    html = html + ("<div style='margin-top:6px;font-size:13px;color:#333'>" + prep + "</div>").where(prep != "", "")
+
+    if contact_index and "facility_id" in df.columns:
+        # format each distinct (facility, specialty) pair once
+        keys = pd.MultiIndex.from_arrays([df["facility_id"], spec]).unique()
+        by_key = {k: _contact_html_for(contact_index, k[0], k[1]) for k in keys}
+        contact_html = pd.Series([by_key[k] for k in zip(df["facility_id"], spec)], index=df.index)
+    else:
+        contact_html = pd.Series([""] * len(df), index=df.index)
+    html = html + ("<div style='margin-top:8px'><div style='font-weight:600'>Top contacts</div>" + contact_html + "</div>").where(
+        contact_html != "", "<div style='margin-top:8px;color:#777;font-size:13px'>No contacts on file</div>")
+    return html + "</div>"
+
+
+def _add_bulk_layer(m, df, center, contact_index=None):
+    """Add every facility as one GeoJSON layer; style and popup travel as feature properties."""
+    lat = pd.to_numeric(df["lat"], errors="coerce") if "lat" in df.columns else pd.Series(center[0], index=df.index)
+    lon = pd.to_numeric(df["lon"], errors="coerce") if "lon" in df.columns else pd.Series(center[1], index=df.index)
+    keep = lat.notna() & lon.notna()
+    df = df[keep]
+    colors = _choose_colors(df)
+    popups = _popup_html_columns(df, contact_index)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(x), float(y)]},
+            "properties": {"style": {"color": c, "fillColor": c}, "popup": p},
+        }
+        for y, x, c, p in zip(lat[keep], lon[keep], colors, popups)
+    ]
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        marker=folium.CircleMarker(radius=7, fill=True),
+        # styled in the browser from the feature's own properties; a Python style_function
+        # would make folium emit a lookup table keyed on the popup HTML
+        on_each_feature=JsCode("function(feature, layer) { layer.setStyle(feature.properties.style);"
+                               " layer.bindPopup(feature.properties.popup, {maxWidth: 400}); }"),
+    ).add_to(m)
+    return m
+
+
+@timed("map.create_map")
+def create_map(df, contacts_path="app/data/processed/contacts.csv", bulk=None, contact_index=None):
+    """Build the facilities map.
+
+    bulk=None picks the GeoJSON bulk layer automatically once df has BULK_MIN_ROWS rows;
+    pass True/False to force either path. A prebuilt contact_index (utils.contacts)
+    skips reading contacts_path.
+    """
     # Center map on mean lat/lon if available
     lat = df["lat"].dropna() if "lat" in df.columns else []
     lon = df["lon"].dropna() if "lon" in df.columns else []
@@ -61,15 +162,16 @@ def create_map(df, contacts_path="app/data/processed/contacts.csv"):
         center = [39.5, -98.35]  # center of US fallback
 
     # attempt to load contacts file if present
-    contacts = None
-    if contacts_path and os.path.exists(contacts_path):
-        try:
-            contacts = pd.read_csv(contacts_path)
-        except Exception:
-            contacts = None
+    if contact_index is None and contacts_path and os.path.exists(contacts_path):
+        contact_index = contact_index_cached(contacts_path)
 
     m = folium.Map(location=center, zoom_start=6)
 
+    if bulk is None:
+        bulk = len(df) >= BULK_MIN_ROWS
+    if bulk:
+        return _add_bulk_layer(m, df, center, contact_index)
+
     for _, r in df.iterrows():
         try:
             color = _choose_color(r)
@@ -89,15 +191,8 @@ def create_map(df, contacts_path="app/data/processed/contacts.csv"):
 
             # contacts
             contact_html = ""
-            if contacts is not None and 'facility_id' in contacts.columns and 'facility_id' in r:
-                subset = contacts[(contacts['facility_id'] == r.get('facility_id')) & (contacts.get('specialty', pd.Series()).fillna('') == spec)].copy()
-                if subset.empty:
-                    # try by facility only
-                    subset = contacts[contacts['facility_id'] == r.get('facility_id')].copy()
-                if not subset.empty:
-                    subset = subset.sort_values(['contact_rank','last_verified'] if 'contact_rank' in subset.columns else [], ascending=[True, False] if 'contact_rank' in subset.columns else [False])
-                    subset = subset.head(4)
-                    contact_html = _format_contacts_html(subset)
+            if 'facility_id' in r:
+                contact_html = _contact_html_for(contact_index, r.get('facility_id'), spec)
 
             popup_html = f"<div style='max-width:320px'><div style='font-weight:700;font-size:15px'>{fname}</div><div style='font-size:13px;color:#555'>Score: {score:.2f} • {spec}</div>"
             if prep_html:
@@ -0,0 +1,215 @@
+"""Posting aggregates kept up to date incrementally from an append-only postings log.
+
+The log (POSTINGS_LOG_PATH) is a CSV with one row per job posting:
+    facility_id,specialty,posted_at,is_competitor
+(is_competitor is optional, 1 for postings by other agencies). Each run
+reads only the bytes appended since the last run and keeps, per facility
+and specialty:
+  - per-day posting counts for the last 365 days (older days are dropped)
+  - running window sums for postings_90d, postings_365d and
+    competitor_postings_30d
+  - the day of the latest own posting (for last_post_days)
+Moving the as-of date forward subtracts the days that fell out of each
+window, and new postings are added to the windows they fall in, so a daily
+run costs O(new postings + one day of buckets) rather than a rescan of the
+whole history. State lives in POSTINGS_STATE_DIR.
+"""
+import io
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import HAVE_PARQUET, fill_text, read_table, write_table
+
+POSTINGS_LOG_PATH = os.environ.get("POSTINGS_LOG_PATH", "app/data/raw/postings.csv")
+POSTINGS_STATE_DIR = os.environ.get("POSTINGS_STATE_DIR", "app/data/state")
+KEY = ["facility_id", "specialty"]
+# feature -> (posting kind, window in days)
+WINDOWS = {"postings_90d": ("own", 90), "postings_365d": ("own", 365), "competitor_postings_30d": ("competitor", 30)}
+MAX_WINDOW = max(w for _, w in WINDOWS.values())
+# last_post_days for facilities with no own posting on record (build_matrix treats missing as 999 too)
+NEVER_POSTED_DAYS = 999
+_EPOCH = date(1970, 1, 1)
+
+
+def _days(values):
+    """Dates as int days since 1970-01-01 (NaT -> -1)."""
+    d = pd.to_datetime(values, errors="coerce")
+    out = d.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return np.where(d.isna(), -1, out)
+
+
+def to_day(d):
+    return (d - _EPOCH).days
+
+
+def _empty_buckets():
+    return pd.DataFrame({"facility_id": pd.Series(dtype=str), "specialty": pd.Series(dtype=str),
+                         "day": pd.Series(dtype=np.int64), "own": pd.Series(dtype=np.int64),
+                         "competitor": pd.Series(dtype=np.int64)})
+
+
+def _empty_windows():
+    cols = {c: pd.Series(dtype=np.int64) for c in WINDOWS}
+    return pd.DataFrame(cols, index=pd.MultiIndex.from_arrays([[], []], names=KEY)).assign(
+        last_post_day=pd.Series(dtype=np.int64))
+
+
+def read_new_postings(log_path, offset=0):
+    """Complete rows appended to the log after byte offset; returns (DataFrame, new offset)."""
+    header = list(pd.read_csv(log_path, nrows=0).columns)
+    with open(log_path, "rb") as f:
+        f.readline()
+        f.seek(max(offset, f.tell()))
+        start = f.tell()
+        data = f.read()
+    # a writer may be mid-append; leave a partial last line for the next run
+    end = data.rfind(b"\n") + 1
+    if not end:
+        return pd.DataFrame(columns=header), start
+    df = pd.read_csv(io.BytesIO(data[:end]), names=header, header=None,
+                     dtype={"facility_id": str, "specialty": str})
+    return df, start + end
+
+
+def to_buckets(postings, as_of_day):
+    """Per (facility_id, specialty, day) own/competitor counts; future-dated postings count as as_of."""
+    if postings.empty:
+        return _empty_buckets()
+    comp = pd.to_numeric(postings["is_competitor"], errors="coerce").fillna(0).astype(bool) \
+        if "is_competitor" in postings.columns else pd.Series(False, index=postings.index)
+    b = pd.DataFrame({
+        "facility_id": fill_text(postings["facility_id"]),
+        "specialty": fill_text(postings["specialty"]) if "specialty" in postings.columns else "",
+        "day": np.minimum(_days(postings["posted_at"]), as_of_day),
+        "own": (~comp).astype(np.int64),
+        "competitor": comp.astype(np.int64),
+    })
+    b = b[(b["day"] >= 0) & (b["facility_id"] != "")]
+    return b.groupby(KEY + ["day"], as_index=False)[["own", "competitor"]].sum()
+
+
+def _window_sums(buckets, kind, lo, hi):
+    """Per-key sum of `kind` counts over days lo < day <= hi."""
+    sel = buckets[(buckets["day"] > lo) & (buckets["day"] <= hi)]
+    return sel.groupby(KEY)[kind].sum()
+
+
+def advance(buckets, windows, new_buckets, prev_day, as_of_day):
+    """State moved from prev_day to as_of_day with new_buckets added; returns (buckets, windows)."""
+    windows = windows.copy()
+    if prev_day is not None and as_of_day > prev_day:
+        # days that slide out of each window
+        for col, (kind, w) in WINDOWS.items():
+            gone = _window_sums(buckets, kind, prev_day - w, as_of_day - w)
+            windows[col] = windows[col].sub(gone, fill_value=0)
+    windows = windows.reindex(windows.index.union(pd.MultiIndex.from_frame(new_buckets[KEY]).unique()))
+    for col, (kind, w) in WINDOWS.items():
+        windows[col] = windows[col].fillna(0).add(_window_sums(new_buckets, kind, as_of_day - w, as_of_day), fill_value=0)
+    latest = new_buckets[new_buckets["own"] > 0].groupby(KEY)["day"].max()
+    windows["last_post_day"] = np.fmax(windows["last_post_day"].astype(float), latest.reindex(windows.index).astype(float))
+
+    buckets = pd.concat([buckets, new_buckets], ignore_index=True)
+    buckets = buckets.groupby(KEY + ["day"], as_index=False)[["own", "competitor"]].sum()
+    buckets = buckets[buckets["day"] > as_of_day - MAX_WINDOW].reset_index(drop=True)
+    for col in WINDOWS:
+        windows[col] = windows[col].fillna(0).astype(np.int64)
+    return buckets, windows
+
+
+def window_features(windows, as_of_day):
+    """postings_90d, postings_365d, competitor_postings_30d and last_post_days per (facility_id, specialty)."""
+    out = windows[list(WINDOWS)].copy()
+    out["last_post_days"] = (as_of_day - windows["last_post_day"]).fillna(NEVER_POSTED_DAYS).astype(np.int64)
+    return out.reset_index()
+
+
+def _state_paths(state_dir):
+    # the state is only read back by this module, so it skips the CSV copy when Parquet is available
+    ext = ".parquet" if HAVE_PARQUET else ".csv"
+    return (os.path.join(state_dir, "posting_buckets" + ext), os.path.join(state_dir, "posting_windows" + ext),
+            os.path.join(state_dir, "posting_state.json"))
+
+
+def _read_state_table(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, dtype={c: str for c in KEY})
+
+
+def _write_state_table(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def load_state(state_dir=POSTINGS_STATE_DIR):
+    """(buckets, windows, meta) from state_dir, or empty state if there is none."""
+    buckets_path, windows_path, meta_path = _state_paths(state_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        buckets = _read_state_table(buckets_path)
+        windows = _read_state_table(windows_path)
+    except (OSError, ValueError):
+        return _empty_buckets(), _empty_windows(), {"offset": 0, "as_of_day": None}
+    for df in (buckets, windows):
+        df["facility_id"] = df["facility_id"].fillna("").astype(str)
+        df["specialty"] = df["specialty"].fillna("").astype(str)
+    return buckets, windows.set_index(KEY), meta
+
+
+def save_state(buckets, windows, meta, state_dir=POSTINGS_STATE_DIR):
+    buckets_path, windows_path, meta_path = _state_paths(state_dir)
+    os.makedirs(state_dir, exist_ok=True)
+    _write_state_table(buckets, buckets_path)
+    _write_state_table(windows.reset_index(), windows_path)
+    # meta last: a run interrupted before this point re-reads the same log bytes next time
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+
+def update_posting_windows(log_path=POSTINGS_LOG_PATH, state_dir=POSTINGS_STATE_DIR, as_of=None, rebuild=False):
+    """Fold new log rows into the saved state and move it to as_of (default today).
+
+    Starts over from the beginning of the log when asked to, when the log was
+    truncated or rotated, or when as_of is earlier than the saved state.
+    Returns (windows, as_of_day, new_rows).
+    """
+    as_of_day = to_day(as_of or date.today())
+    buckets, windows, meta = load_state(state_dir)
+    prev_day = meta.get("as_of_day")
+    if rebuild or meta.get("offset", 0) > os.path.getsize(log_path) or (prev_day is not None and as_of_day < prev_day):
+        buckets, windows, meta, prev_day = _empty_buckets(), _empty_windows(), {"offset": 0}, None
+    postings, offset = read_new_postings(log_path, meta.get("offset", 0))
+    buckets, windows = advance(buckets, windows, to_buckets(postings, as_of_day), prev_day, as_of_day)
+    save_state(buckets, windows, {"offset": offset, "as_of_day": as_of_day}, state_dir)
+    return windows, as_of_day, len(postings)
+
+
+def apply_posting_features(features, windows, as_of_day):
+    """features with the posting columns replaced from the windows (facilities without postings get 0 / 999)."""
+    feats = window_features(windows, as_of_day)
+    key = KEY if "specialty" in features.columns else ["facility_id"]
+    if key == ["facility_id"]:
+        feats = feats.groupby("facility_id", as_index=False).agg(
+            {**{c: "sum" for c in WINDOWS}, "last_post_days": "min"})
+    # blank specialties are keyed "" in the windows (see to_buckets), not "nan"
+    left = pd.DataFrame({c: fill_text(features[c]).to_numpy() for c in key})
+    merged = left.merge(feats, on=key, how="left")
+    out = features.copy()
+    for col in WINDOWS:
+        out[col] = merged[col].fillna(0).astype(np.int64).to_numpy()
+    out["last_post_days"] = merged["last_post_days"].fillna(NEVER_POSTED_DAYS).astype(np.int64).to_numpy()
+    return out
+
+
+def update_posting_features(features_path, log_path=POSTINGS_LOG_PATH, state_dir=POSTINGS_STATE_DIR, as_of=None):
+    """Refresh the posting columns of the features table from the log; None if there is no log."""
+    if not os.path.exists(log_path):
+        return None
+    windows, as_of_day, new_rows = update_posting_windows(log_path, state_dir, as_of)
+    write_table(apply_posting_features(read_table(features_path), windows, as_of_day), features_path)
+    return {"new_postings": new_rows, "tracked": len(windows), "as_of": date.fromordinal(_EPOCH.toordinal() + as_of_day).isoformat()}
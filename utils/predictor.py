@@ -1,24 +1,43 @@
 import os
 import pandas as pd
+from utils.data_cache import facility_index_cached, read_table_cached
+from utils.facility_index import NAME_COLUMNS, join_scores
+from utils.features import FEATURE_CANDIDATES
+from utils.scorer import load_scorer
 
 SCORES_PATH = "app/data/processed/scores_latest.csv"
 
-def predict_needs(df=None):
+def _score_fresh(df, scorer):
+    """Fill missing scores from the saved model for rows that carry their own feature columns."""
+    if scorer is None or not any(c in df.columns for c in FEATURE_CANDIDATES):
+        return df
+    out = df.copy()
+    missing = out["score"].isna() if "score" in out.columns else pd.Series(True, index=out.index)
+    if missing.any():
+        out.loc[missing, "score"] = scorer.score(out[missing]).round(4)
+    return out
+
+def predict_needs(df=None, scorer=None):
     """Return a DataFrame with predictions.
     If df is provided, return df with 'score' if present; otherwise try to read the latest scores file.
+    Rows are matched to the scores by facility_id or facility name (see utils.facility_index); the
+    'match' column says how each row matched.
+    Rows that get no precomputed score but include feature columns are scored with the saved model
+    (pass a utils.scorer.Scorer to override the one loaded from app/models/predictor_logit.json).
     """
     if df is not None:
         # if score column already present, return as-is
         if "score" in df.columns:
             return df
-        # else, try to merge by facility_id
-        if os.path.exists(SCORES_PATH) and "facility_id" in df.columns:
-            scores = pd.read_csv(SCORES_PATH)
-            out = df.merge(scores[['facility_id','score','high_likelihood','active_posting','lat','lon']], on='facility_id', how='left')
-            return out
-        return df
+        if scorer is None:
+            scorer = load_scorer()
+        # else, look rows up in the scores by facility_id, or by normalized name/city/state
+        if os.path.exists(SCORES_PATH) and any(c in df.columns for c in ["facility_id"] + NAME_COLUMNS):
+            out = join_scores(facility_index_cached(SCORES_PATH), df)
+            return _score_fresh(out, scorer)
+        return _score_fresh(df, scorer)
 
     # No input df — try to return scores file
     if os.path.exists(SCORES_PATH):
-        return pd.read_csv(SCORES_PATH)
+        return read_table_cached(SCORES_PATH)
     raise FileNotFoundError("Scores file not found and no input DataFrame provided")
@@ -0,0 +1,236 @@
+"""Append-only history of score changes, kept in SQLite next to the scores table.
+
+scores_latest.csv stays the full current table; each training run also
+records, in SCORE_HISTORY_PATH, only the rows whose score moved by at least
+SCORE_HISTORY_MIN_DELTA or whose high_likelihood / active_posting flag
+changed, together with their previous values. Facilities that drop out of
+the table get one row with an empty score. Tables:
+  runs           one row per recorded run (id increases with every run)
+  score_changes  changed rows per run, indexed on (run_id), (run_date) and
+                 (facility_id, run_date)
+  latest         the last recorded values per facility, for change detection
+  cursors        the last run a consumer (e.g. each digest recipient) has seen
+so "what changed since the last digest" reads only the runs after that
+digest's cursor, never the whole history.
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import fill_text, to_bool
+
+SCORE_HISTORY_PATH = os.environ.get("SCORE_HISTORY_PATH", "app/data/score_history.sqlite")
+SCORE_HISTORY_MIN_DELTA = float(os.environ.get("SCORE_HISTORY_MIN_DELTA", "0.01"))
+# The Map page highlights facilities that turned red or got an active posting within this many days
+SCORE_HISTORY_HIGHLIGHT_DAYS = int(os.environ.get("SCORE_HISTORY_HIGHLIGHT_DAYS", "7"))
+KEY = ["facility_id", "specialty"]
+VALUE_COLUMNS = ["score", "high_likelihood", "active_posting"]
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, run_date TEXT, recorded_at TEXT, rows INTEGER, changed INTEGER)",
+    "CREATE TABLE IF NOT EXISTS score_changes (run_id INTEGER, run_date TEXT, facility_id TEXT, specialty TEXT, "
+    "score REAL, high_likelihood INTEGER, active_posting INTEGER, "
+    "prev_score REAL, prev_high_likelihood INTEGER, prev_active_posting INTEGER)",
+    "CREATE INDEX IF NOT EXISTS score_changes_run ON score_changes (run_id)",
+    "CREATE INDEX IF NOT EXISTS score_changes_date ON score_changes (run_date)",
+    "CREATE INDEX IF NOT EXISTS score_changes_facility ON score_changes (facility_id, run_date)",
+    "CREATE TABLE IF NOT EXISTS latest (facility_id TEXT, specialty TEXT, score REAL, high_likelihood INTEGER, "
+    "active_posting INTEGER, PRIMARY KEY (facility_id, specialty))",
+    "CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, run_id INTEGER, updated_at TEXT)",
+]
+
+
+def connect(path=SCORE_HISTORY_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    for stmt in _SCHEMA:
+        conn.execute(stmt)
+    return conn
+
+
+def _current_values(df):
+    """KEY + VALUE_COLUMNS of a scores frame, one row per facility and specialty."""
+    out = pd.DataFrame({
+        "facility_id": fill_text(df["facility_id"]).astype(str),
+        "specialty": fill_text(df["specialty"]).astype(str) if "specialty" in df.columns else "",
+        "score": pd.to_numeric(df["score"], errors="coerce").to_numpy(dtype=float),
+    })
+    for col in ["high_likelihood", "active_posting"]:
+        out[col] = (to_bool(df[col]) if col in df.columns else pd.Series(False, index=df.index)).astype(int).to_numpy()
+    return out[out["facility_id"] != ""].drop_duplicates(KEY, keep="last")
+
+
+def record_scores(df, path=SCORE_HISTORY_PATH, run_at=None, min_delta=SCORE_HISTORY_MIN_DELTA):
+    """Append the rows of df that changed since the last recorded run; returns (run_id, changed rows)."""
+    run_at = run_at or datetime.utcnow()
+    cur = _current_values(df)
+    conn = connect(path)
+    try:
+        prev = pd.read_sql_query("SELECT * FROM latest", conn)
+        prev["specialty"] = prev["specialty"].fillna("")
+        merged = cur.merge(prev, on=KEY, how="outer", suffixes=("", "_prev"), indicator=True)
+        if prev.empty:
+            # the first run is the baseline: everything is recorded, nothing counts as newly red or active
+            for col in VALUE_COLUMNS:
+                merged[col + "_prev"] = merged[col]
+        new_score, old_score = merged["score"], merged["score_prev"]
+        moved = (new_score - old_score).abs() >= min_delta
+        moved |= new_score.isna() != old_score.isna()
+        for col in ["high_likelihood", "active_posting"]:
+            moved |= merged[col].fillna(-1) != merged[col + "_prev"].fillna(-1)
+        changed = merged[moved | (merged["_merge"] != "both")]
+        gone = changed["_merge"] == "right_only"
+
+        with conn:
+            run_id = conn.execute("INSERT INTO runs (run_date, recorded_at, rows, changed) VALUES (?, ?, ?, ?)",
+                                  (run_at.date().isoformat(), run_at.isoformat(), len(cur), len(changed))).lastrowid
+            rows = pd.DataFrame({
+                "run_id": run_id, "run_date": run_at.date().isoformat(),
+                "facility_id": changed["facility_id"], "specialty": changed["specialty"],
+                "score": changed["score"].where(~gone),
+                "high_likelihood": changed["high_likelihood"].where(~gone, 0),
+                "active_posting": changed["active_posting"].where(~gone, 0),
+                "prev_score": changed["score_prev"],
+                "prev_high_likelihood": changed["high_likelihood_prev"],
+                "prev_active_posting": changed["active_posting_prev"],
+            })
+            rows.to_sql("score_changes", conn, if_exists="append", index=False)
+            conn.executemany("DELETE FROM latest WHERE facility_id = ? AND specialty = ?",
+                             changed.loc[gone, KEY].itertuples(index=False, name=None))
+            upsert = changed.loc[~gone, KEY + VALUE_COLUMNS]
+            conn.executemany("INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?)",
+                             [(f, s, None if np.isnan(sc) else float(sc), int(h), int(a))
+                              for f, s, sc, h, a in upsert.itertuples(index=False, name=None)])
+    finally:
+        conn.close()
+    return run_id, len(changed)
+
+
+def _net_changes(rows):
+    """Collapse several changes per facility into first previous vs last current values."""
+    if rows.empty:
+        cols = {c: pd.Series(dtype=str) for c in KEY + ["run_date"]}
+        cols.update({c: pd.Series(dtype=float) for c in VALUE_COLUMNS + ["prev_" + c for c in VALUE_COLUMNS]})
+        return pd.DataFrame(cols).assign(newly_red=pd.Series(dtype=bool), newly_active=pd.Series(dtype=bool))
+    rows = rows.sort_values(KEY + ["run_id"])
+    first = rows.drop_duplicates(KEY, keep="first").set_index(KEY)
+    out = rows.drop_duplicates(KEY, keep="last").set_index(KEY)[["run_date"] + VALUE_COLUMNS]
+    for col in VALUE_COLUMNS:
+        out["prev_" + col] = first["prev_" + col].reindex(out.index)
+    out["newly_red"] = (out["high_likelihood"] == 1) & (out["prev_high_likelihood"].fillna(0) == 0)
+    out["newly_active"] = (out["active_posting"] == 1) & (out["prev_active_posting"].fillna(0) == 0)
+    return out.reset_index()
+
+
+def last_run_id(path=SCORE_HISTORY_PATH):
+    if not os.path.exists(path):
+        return None
+    conn = connect(path)
+    try:
+        return conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def changes_since(cursor="digest", path=SCORE_HISTORY_PATH):
+    """Net changes per facility in the runs after the cursor's run (all runs if it was never set).
+
+    Returns (changes, last_run_id); changes has the current and prev_ values plus newly_red/newly_active.
+    """
+    return changes_after(get_cursor(cursor, path) or 0, path)
+
+
+def changes_after(run_id, path=SCORE_HISTORY_PATH):
+    """changes_since for an explicit run id rather than a named cursor."""
+    conn = connect(path)
+    try:
+        rows = pd.read_sql_query("SELECT * FROM score_changes WHERE run_id > ?", conn, params=(run_id,))
+        last = conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+    finally:
+        conn.close()
+    rows["specialty"] = rows["specialty"].fillna("")
+    return _net_changes(rows), last
+
+
+def get_cursor(cursor, path=SCORE_HISTORY_PATH):
+    """Run id the cursor was last set to, or None."""
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT run_id FROM cursors WHERE name = ?", (cursor,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def set_cursor(cursor, run_id, path=SCORE_HISTORY_PATH):
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)", (cursor, run_id, datetime.utcnow().isoformat()))
+    finally:
+        conn.close()
+
+
+def get_cursors(prefix, path=SCORE_HISTORY_PATH):
+    """{name: run_id} of every cursor whose name starts with prefix."""
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT name, run_id FROM cursors WHERE substr(name, 1, ?) = ?", (len(prefix), prefix)).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def set_cursors(cursors, run_id, path=SCORE_HISTORY_PATH):
+    """set_cursor for several cursors in one transaction."""
+    now = datetime.utcnow().isoformat()
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)", [(c, run_id, now) for c in cursors])
+    finally:
+        conn.close()
+
+
+def recent_flag_changes(days=SCORE_HISTORY_HIGHLIGHT_DAYS, path=SCORE_HISTORY_PATH, today=None):
+    """Facilities that turned red or got an active posting in the last `days` days, and still are.
+
+    Returns facility_id, specialty, change ("new red" / "new posting") and since (date); empty if there is no history.
+    """
+    empty = pd.DataFrame(columns=KEY + ["change", "since"])
+    if not os.path.exists(path):
+        return empty
+    start = ((today or datetime.utcnow().date()) - timedelta(days=days)).isoformat()
+    conn = connect(path)
+    try:
+        # only rows where a flag flipped decide the flags' net change
+        rows = pd.read_sql_query(
+            "SELECT * FROM score_changes WHERE run_date > ? AND (high_likelihood IS NOT prev_high_likelihood "
+            "OR active_posting IS NOT prev_active_posting) ORDER BY run_id", conn, params=(start,))
+    finally:
+        conn.close()
+    rows["specialty"] = rows["specialty"].fillna("")
+    net = _net_changes(rows)
+    net = net[net["newly_red"] | net["newly_active"]]
+    if net.empty:
+        return empty
+    # an active posting outranks a red flag, as on the map
+    change = np.where(net["newly_active"], "new posting", "new red")
+    turned_on = rows[(rows["high_likelihood"] == 1) | (rows["active_posting"] == 1)]
+    since = turned_on.drop_duplicates(KEY, keep="first").set_index(KEY)["run_date"]
+    out = net[KEY].assign(change=change)
+    out["since"] = since.reindex(pd.MultiIndex.from_frame(out[KEY])).to_numpy()
+    return out.reset_index(drop=True)
+
+
+def facility_history(facility_id, path=SCORE_HISTORY_PATH):
+    """Every recorded change for one facility, oldest first."""
+    conn = connect(path)
+    try:
+        return pd.read_sql_query("SELECT * FROM score_changes WHERE facility_id = ? ORDER BY run_id", conn,
+                                 params=(str(facility_id),))
+    finally:
+        conn.close()
@@ -0,0 +1,89 @@
+"""Score facility features with the saved logistic model, without retraining.
+
+A Scorer holds the coefficients from app/models/predictor_logit.json as a
+vector aligned to build_matrix's columns, so scoring any frame (or a stream
+of chunks) is one matrix-vector product.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import file_stamp, get_or_build
+from utils.features import build_matrix
+from utils.storage import fill_text
+
+MODEL_PATH = "app/models/predictor_logit.json"
+# Column order build_matrix always produces
+MATRIX_COLUMNS = list(build_matrix(pd.DataFrame()).columns)
+
+
+def segment_keys(df: pd.DataFrame, segment_by) -> pd.Series:
+    """Segment label per row, e.g. 'HO' or 'HO|UT' for segment_by=['specialty', 'state']."""
+    parts = [fill_text(df[c]) if c in df.columns else pd.Series("", index=df.index) for c in segment_by]
+    keys = parts[0]
+    for p in parts[1:]:
+        keys = keys + "|" + p
+    return keys
+
+
+class Scorer:
+    def __init__(self, coefficients, label_col=None, trained_at=None, segments=None, segment_by=None):
+        self.coefficients = {k: float(v) for k, v in coefficients.items()}
+        self.label_col = label_col
+        self.trained_at = trained_at
+        # coefficients the matrix doesn't produce are ignored, as in apply_coefs
+        self.weights = self._vector(self.coefficients)
+        # optional per-segment models; rows outside any segment use the global weights
+        self.segment_by = list(segment_by or [])
+        self.segment_names = list(segments or {})
+        self.segment_weights = np.vstack(
+            [self.weights] + [self._vector(segments[name]) for name in self.segment_names])
+
+    @staticmethod
+    def _vector(coefs):
+        return np.array([float(coefs.get(c, 0.0)) for c in MATRIX_COLUMNS])
+
+    @classmethod
+    def from_model(cls, model):
+        if not model.get("coefficients"):
+            raise ValueError("Model has no coefficients")
+        return cls(model["coefficients"], model.get("label_col"), model.get("trained_at"),
+                   model.get("segments"), model.get("segment_by"))
+
+    @classmethod
+    def from_model_file(cls, path=MODEL_PATH):
+        with open(path) as f:
+            return cls.from_model(json.load(f))
+
+    def score(self, df: pd.DataFrame) -> pd.Series:
+        """Probability per row of df (0..1), indexed like df."""
+        return self.score_matrix(build_matrix(df)[MATRIX_COLUMNS].to_numpy(dtype=float), df)
+
+    def score_matrix(self, X: np.ndarray, df: pd.DataFrame) -> pd.Series:
+        """score() for a precomputed build_matrix array (MATRIX_COLUMNS order) of df's rows."""
+        if self.segment_names and self.segment_by:
+            # row i uses weight row codes[i] + 1; unknown segments (-1) land on the global row 0
+            codes = pd.Categorical(segment_keys(df, self.segment_by), categories=self.segment_names).codes
+            z = np.einsum("ij,ij->i", X, self.segment_weights[codes + 1])
+        else:
+            z = X @ self.weights
+        return pd.Series(1 / (1 + np.exp(-z)), index=df.index, name="score")
+
+    def score_chunks(self, chunks):
+        """Yield each chunk of an iterable of DataFrames with a 'score' column added."""
+        for chunk in chunks:
+            out = chunk.copy()
+            out["score"] = self.score(chunk).round(4)
+            yield out
+
+
+def load_scorer(path=MODEL_PATH):
+    """The Scorer for the current model file, loaded once per file version; None if no model exists."""
+    stamp = file_stamp(path)
+    if stamp is None:
+        return None
+    try:
+        return get_or_build(("scorer", path, stamp), lambda: Scorer.from_model_file(path))
+    except (OSError, ValueError):
+        return None
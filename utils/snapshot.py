@@ -0,0 +1,153 @@
+"""Prebuilt map HTML written by the training job, served by the app on first view.
+
+After writing the scores table, train_predictor renders the facility map
+once, with the Map page's own renderer (utils.map_page.build_map), and
+stores it next to the processed tables together with a content hash of
+the scores and contacts files it was built from. The recent-change rings
+(utils.score_history.recent_flag_changes) are drawn in as well, and the
+history run and date they were read for are stored with it. The app shows
+that snapshot as-is while both files, the renderer and the highlights are
+unchanged, so a cold process does not have to import folium or render any
+markers.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from utils.data_cache import contact_index_cached, file_stamp, get_or_build, read_table_cached
+from utils.instrumentation import app_report, stage
+from utils.score_history import SCORE_HISTORY_HIGHLIGHT_DAYS, SCORE_HISTORY_PATH, last_run_id, recent_flag_changes
+from utils.storage import source_path
+
+SCORES_PATH = "app/data/processed/scores_latest.csv"
+CONTACTS_PATH = "app/data/processed/contacts.csv"
+MAP_SNAPSHOT_PATH = "app/data/processed/map_snapshot.html"
+# MAP_SNAPSHOT=0 turns off both writing and serving the snapshot
+MAP_SNAPSHOT = os.environ.get("MAP_SNAPSHOT", "1").lower() in ["1", "true", "yes"]
+# Bigger tables are browsed in viewport mode on the Map page; a full snapshot would be too heavy
+MAP_SNAPSHOT_MAX_ROWS = int(os.environ.get("MAP_SNAPSHOT_MAX_ROWS", "20000"))
+# Bump when the snapshot's renderer changes, so snapshots drawn by an older one are not served
+SNAPSHOT_RENDERER = "map_page.build_map/2"
+
+
+def _meta_path(html_path):
+    return os.path.splitext(html_path)[0] + ".json"
+
+
+def _content_hash(path):
+    """sha1 of a file, computed once per file version."""
+    stamp = file_stamp(path)
+    if stamp is None:
+        return None
+
+    def build():
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+    return get_or_build(("sha1", path, stamp), build)
+
+
+def _sources(scores_path, contacts_path):
+    # the CSVs are always written, so hash those rather than an optional Parquet copy
+    return {"scores": _content_hash(scores_path),
+            "contacts": _content_hash(contacts_path) if contacts_path else None}
+
+
+def highlight_key(history_path=SCORE_HISTORY_PATH, days=SCORE_HISTORY_HIGHLIGHT_DAYS):
+    """Which recent flag changes a map should ring: the last history run and today's date, None without history."""
+    run = last_run_id(history_path)
+    if run is None:
+        return None
+    return {"run": run, "as_of": datetime.utcnow().date().isoformat(), "days": days}
+
+
+def flag_changes(highlights, history_path=SCORE_HISTORY_PATH):
+    """recent_flag_changes for a highlight_key (empty for None), read once per key."""
+    if highlights is None:
+        return pd.DataFrame(columns=["facility_id", "specialty", "change", "since"])
+    key = ("flag_changes", history_path) + tuple(sorted(highlights.items()))
+    as_of = datetime.fromisoformat(highlights["as_of"]).date()
+    return get_or_build(key, lambda: recent_flag_changes(highlights["days"], history_path, today=as_of))
+
+
+def render_scores_map(scores_path=SCORES_PATH, contacts_path=CONTACTS_PATH, highlights=None,
+                      history_path=SCORE_HISTORY_PATH):
+    """(html, rings): the Map page's map of scores_path with the highlights' changes ringed."""
+    from utils.map_page import build_map, with_changes
+    # drawn from the table as the Map page reads it back (compact schema)
+    df = read_table_cached(scores_path)
+    changes = flag_changes(highlights, history_path)
+    if not changes.empty:
+        df = with_changes(df, changes)
+    contact_index = contact_index_cached(contacts_path) if contacts_path else {}
+    rings = int((df["change"] != "").sum()) if "change" in df.columns else 0
+    m = build_map(df, contact_index)
+    with stage("map.render", rows=len(df)):
+        return m.get_root().render(), rings
+
+
+def write_map_snapshot(df, scores_path=SCORES_PATH, contacts_path=CONTACTS_PATH, html_path=MAP_SNAPSHOT_PATH,
+                       history_path=SCORE_HISTORY_PATH):
+    """Render the Map page's map of scores_path (df is the table just written there) and store it.
+
+    Call after record_scores, so the rings match the run just recorded. Returns the path, or None if skipped.
+    """
+    if not MAP_SNAPSHOT or len(df) > MAP_SNAPSHOT_MAX_ROWS:
+        return None
+    highlights = highlight_key(history_path)
+    html, rings = render_scores_map(scores_path, contacts_path, highlights, history_path)
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    with open(_meta_path(html_path), "w") as f:
+        json.dump({"rows": len(df), "renderer": SNAPSHOT_RENDERER, "sources": _sources(scores_path, contacts_path),
+                   "highlights": highlights, "rings": rings}, f)
+    return html_path
+
+
+def load_map_snapshot(scores_path=SCORES_PATH, contacts_path=CONTACTS_PATH, html_path=MAP_SNAPSHOT_PATH,
+                      highlights=None):
+    """Snapshot HTML if it was built from the current scores and contacts files with these highlights, else None.
+
+    With highlights None (no history, or highlighting turned off) only a snapshot without rings is served.
+    """
+    if not MAP_SNAPSHOT:
+        return None
+    stamp = file_stamp(html_path)
+    if stamp is None:
+        return None
+    try:
+        with open(_meta_path(html_path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("renderer") != SNAPSHOT_RENDERER or meta.get("sources") != _sources(scores_path, contacts_path):
+        return None
+    if meta.get("highlights") != highlights and (highlights is not None or meta.get("rings")):
+        return None
+
+    def build():
+        with open(html_path, encoding="utf-8") as f:
+            return f.read()
+    return get_or_build(("map_snapshot", html_path, stamp), build)
+
+
+def scores_map_html(scores_path=SCORES_PATH, contacts_path=CONTACTS_PATH, highlight=True,
+                    html_path=MAP_SNAPSHOT_PATH, history_path=SCORE_HISTORY_PATH):
+    """(html, changes) for the full facility map: the snapshot when it matches, else a render cached per version."""
+    highlights = highlight_key(history_path) if highlight else None
+    changes = flag_changes(highlights, history_path)
+    html = load_map_snapshot(scores_path, contacts_path, html_path, highlights)
+    if html is None:
+        key = ("scores_map", scores_path, file_stamp(source_path(scores_path)),
+               file_stamp(source_path(contacts_path)) if contacts_path else None,
+               tuple(sorted((highlights or {}).items())))
+        def build():
+            with app_report("app"):
+                return render_scores_map(scores_path, contacts_path, highlights, history_path)[0]
+        html = get_or_build(key, build)
+    return html, changes
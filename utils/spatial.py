@@ -0,0 +1,99 @@
+"""Grid index over facility lat/lon so a map only ships what is in view.
+
+For each zoom level the facilities are bucketed into a lat/lon grid whose
+cells shrink by half per zoom step, with per-cell aggregates (count,
+centroid, max score, active/high-likelihood counts). A viewport query
+returns individual facilities when few enough are visible, otherwise the
+cell aggregates inside the viewport, so payload size tracks what is on
+screen rather than the total facility count.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import to_bool
+
+MIN_ZOOM = 2
+MAX_ZOOM = 14
+# Cell edge at zoom z is CELL_DEGREES_Z0 / 2**z degrees (about 1/8 of a map tile)
+CELL_DEGREES_Z0 = 45.0
+# Above this many facilities in view, send cluster aggregates instead of markers
+MAX_MARKERS = int(os.environ.get("MAP_MAX_MARKERS", "1500"))
+
+
+def _cell_keys(lat, lon, zoom):
+    size = CELL_DEGREES_Z0 / (2 ** zoom)
+    cx = np.floor((lon + 180.0) / size).astype(np.int64)
+    cy = np.floor((lat + 90.0) / size).astype(np.int64)
+    return cy * (int(360.0 / size) + 1) + cx
+
+
+def build_grid_index(df, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """Precompute per-zoom cell aggregates plus a lon-sorted copy of the points.
+
+    Returns a dict: {"points": DataFrame sorted by lon, "lon": sorted lon array,
+    "levels": {zoom: aggregate DataFrame}}.
+    """
+    lat = pd.to_numeric(df["lat"], errors="coerce") if "lat" in df.columns else pd.Series(np.nan, index=df.index)
+    lon = pd.to_numeric(df["lon"], errors="coerce") if "lon" in df.columns else pd.Series(np.nan, index=df.index)
+    keep = lat.notna() & lon.notna()
+    points = df[keep].copy()
+    points["lat"] = lat[keep].astype(float)
+    points["lon"] = lon[keep].astype(float)
+    points = points.sort_values("lon", kind="stable").reset_index(drop=True)
+
+    score = pd.to_numeric(points["score"], errors="coerce").fillna(0.0) if "score" in points.columns else pd.Series(0.0, index=points.index)
+    active = to_bool(points["active_posting"]) if "active_posting" in points.columns else pd.Series(False, index=points.index)
+    high = to_bool(points["high_likelihood"]) if "high_likelihood" in points.columns else pd.Series(False, index=points.index)
+    base = pd.DataFrame({"lat": points["lat"], "lon": points["lon"], "score": score,
+                         "active": active.astype(int), "high": high.astype(int)})
+
+    levels = {}
+    for z in range(min_zoom, max_zoom + 1):
+        base["cell"] = _cell_keys(base["lat"].to_numpy(), base["lon"].to_numpy(), z)
+        levels[z] = (base.groupby("cell", sort=False)
+                     .agg(count=("lat", "size"), lat=("lat", "mean"), lon=("lon", "mean"),
+                          max_score=("score", "max"), active=("active", "sum"), high=("high", "sum"))
+                     .reset_index())
+    return {"points": points, "lon": points["lon"].to_numpy(), "levels": levels}
+
+
+def _in_bounds(lat, lon, bounds):
+    (south, west), (north, east) = bounds
+    lat_ok = (lat >= south) & (lat <= north)
+    if west <= east:
+        return lat_ok & (lon >= west) & (lon <= east)
+    # viewport crossing the antimeridian
+    return lat_ok & ((lon >= west) | (lon <= east))
+
+
+def query_viewport(index, bounds, zoom, max_markers=MAX_MARKERS):
+    """Facilities or cell aggregates inside bounds ((south, west), (north, east)).
+
+    Returns ("points", DataFrame of facility rows) when at most max_markers are in
+    view, else ("clusters", DataFrame of cell aggregates at this zoom).
+    """
+    points = index["points"]
+    (south, west), (north, east) = bounds
+    if west <= east:
+        lo = np.searchsorted(index["lon"], west, side="left")
+        hi = np.searchsorted(index["lon"], east, side="right")
+        cand = points.iloc[lo:hi]
+    else:
+        cand = points
+    visible = cand[_in_bounds(cand["lat"].to_numpy(), cand["lon"].to_numpy(), bounds)]
+    if len(visible) <= max_markers or zoom >= max(index["levels"]):
+        return "points", visible
+
+    z = min(max(int(zoom), min(index["levels"])), max(index["levels"]))
+    cells = index["levels"][z]
+    return "clusters", cells[_in_bounds(cells["lat"].to_numpy(), cells["lon"].to_numpy(), bounds)]
+
+
+def full_bounds(index, pad=0.5):
+    """Bounds covering every indexed facility, for the first render."""
+    pts = index["points"]
+    if pts.empty:
+        return (24.5, -125.0), (49.5, -66.9)
+    return ((pts["lat"].min() - pad, pts["lon"].min() - pad), (pts["lat"].max() + pad, pts["lon"].max() + pad))
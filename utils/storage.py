@@ -0,0 +1,160 @@
+"""Read/write helpers for the processed data tables.
+
+Every table keeps its CSV as the compatibility output. When pyarrow is
+installed a typed Parquet copy is written next to it (same stem, .parquet)
+and readers prefer that copy while it is at least as new as the CSV, loading
+only the requested columns.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+# Comma-separated list of formats to write; CSV is always written
+DATA_FORMATS = [f.strip().lower() for f in os.environ.get("DATA_FORMATS", "csv,parquet").split(",") if f.strip()]
+
+BOOL_COLUMNS = ["active_posting", "high_likelihood"]
+# Compact in-memory schema (compact_types): repeated text as categoricals, coordinates and
+# scores as float32, "$190-205/hr" style ranges parsed into <col>_min/<col>_max
+CATEGORY_COLUMNS = ["specialty", "state", "city", "likely_procedures", "avg_volume", "pay_expect", "bill_expect"]
+FLOAT32_COLUMNS = ["lat", "lon", "score"]
+RANGE_COLUMNS = ["pay_expect", "bill_expect", "avg_volume"]
+# Text columns only become categorical when distinct values are at most this share of rows
+CATEGORY_MAX_RATIO = 0.5
+_RANGE_RE = r"(-?\d+(?:\.\d+)?)\s*(?:-\s*(\d+(?:\.\d+)?))?"
+
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def to_bool(series):
+    """Flags as real booleans, whether they arrive as bools, 0/1 or 'true'/'yes' strings."""
+    if series.dtype == bool:
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).astype(bool)
+    return series.astype(str).str.strip().str.lower().isin(["1", "1.0", "true", "yes"])
+
+
+def normalize_types(df):
+    """Coerce the flag columns to bool so they survive a round trip without string hacks."""
+    df = df.copy()
+    for col in BOOL_COLUMNS:
+        if col in df.columns:
+            df[col] = to_bool(df[col])
+    return df
+
+
+def fill_text(series, value=""):
+    """series as str with missing values replaced by value (also for categorical columns)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    return series.fillna(value).astype(str)
+
+
+def parse_range(series):
+    """(min, max) float32 columns from values like "16-18", "$190-205/hr" or "200"; NaN if unparseable."""
+    codes, uniques = pd.factorize(series)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.replace(",", "", regex=False).str.extract(_RANGE_RE)
+    lo = pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=np.float32)
+    hi = pd.to_numeric(parts[1], errors="coerce").fillna(parts[0].astype(float)).to_numpy(dtype=np.float32)
+    # missing values (code -1) land on the trailing NaN
+    lo, hi = np.append(lo, np.nan)[codes], np.append(hi, np.nan)[codes]
+    return pd.Series(lo, index=series.index, dtype=np.float32), pd.Series(hi, index=series.index, dtype=np.float32)
+
+
+def compact_types(df):
+    """df in the compact in-memory schema (see CATEGORY_COLUMNS etc.); values are unchanged except float32 rounding."""
+    df = normalize_types(df)
+    for col in RANGE_COLUMNS:
+        if col in df.columns and f"{col}_min" not in df.columns:
+            df[f"{col}_min"], df[f"{col}_max"] = parse_range(df[col])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype) \
+                and df[col].nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(df):
+            df[col] = df[col].astype("category")
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    for col in df.select_dtypes("integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def memory_report(before, after):
+    """Per-column memory (bytes, deep) and dtype of two versions of a frame, plus a TOTAL row."""
+    rows = []
+    for col in dict.fromkeys(list(before.columns) + list(after.columns)):
+        b = int(before[col].memory_usage(deep=True, index=False)) if col in before.columns else 0
+        a = int(after[col].memory_usage(deep=True, index=False)) if col in after.columns else 0
+        rows.append({"column": col, "dtype_before": str(before[col].dtype) if col in before.columns else "",
+                     "dtype_after": str(after[col].dtype) if col in after.columns else "",
+                     "bytes_before": b, "bytes_after": a})
+    report = pd.DataFrame(rows)
+    total = {"column": "TOTAL", "dtype_before": "", "dtype_after": "",
+             "bytes_before": int(report["bytes_before"].sum()), "bytes_after": int(report["bytes_after"].sum())}
+    return pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+
+
+def write_table(df, csv_path):
+    """Write df as CSV and, if enabled and available, as a typed Parquet sibling."""
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    df = normalize_types(df)
+    df.to_csv(csv_path, index=False)
+    if "parquet" in DATA_FORMATS and HAVE_PARQUET:
+        df.to_parquet(parquet_path(csv_path), index=False)
+
+
+def source_path(csv_path):
+    """The file read_table will actually read for csv_path (Parquet copy if fresh, else the CSV)."""
+    pq = parquet_path(csv_path)
+    if HAVE_PARQUET and os.path.exists(pq):
+        if not os.path.exists(csv_path) or os.path.getmtime(pq) >= os.path.getmtime(csv_path):
+            return pq
+    return csv_path
+
+
+def read_table(csv_path, columns=None):
+    """Load a processed table, optionally only some columns (missing ones are skipped)."""
+    path = source_path(csv_path)
+    if path.endswith(".parquet"):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            available = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    usecols = (lambda c: c in columns) if columns is not None else None
+    return normalize_types(pd.read_csv(path, usecols=usecols))
+
+
+def table_columns(csv_path):
+    """Column names of a processed table without loading its rows."""
+    path = source_path(csv_path)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def iter_table_chunks(csv_path, chunk_rows=100_000, columns=None):
+    """Yield a processed table as DataFrames of at most chunk_rows rows (Parquet row batches or CSV chunks)."""
+    path = source_path(csv_path)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path, memory_map=True)
+        if columns is not None:
+            columns = [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    usecols = (lambda c: c in columns) if columns is not None else None
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=usecols):
+        yield normalize_types(chunk)
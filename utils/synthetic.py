@@ -0,0 +1,113 @@
+"""Synthetic facility_features.csv / contacts.csv tables for benchmarks at scale.
+
+Columns match the shipped sample files. Numeric feature columns are mostly
+clean numbers with a share of the messy cells seen in real exports (ranges,
+blanks, "n/a", padded strings), and a label column is drawn from a known
+logistic model so fit_logit has something to recover.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+STATES = ["UT", "CO", "AZ", "NV", "ID", "NM", "WY", "MT", "TX", "CA", "OR", "WA"]
+SPECIALTIES = ["HO", "PDH"]
+CITIES = ["Midvale", "Springfield", "Riverton", "Fairview", "Lakeside", "Franklin", "Greenville", "Madison"]
+PROCEDURES = ["Lines; intubations rare", "Lines; peds", "Procedures by IR", "Lines", ""]
+TITLES = ["Dir. of Hospital Medicine", "HR Recruiter", "Chief Pediatric Nurse", "Medical Staff Office", "CMO"]
+FIRST_NAMES = ["Jane", "John", "Alice", "Bob", "Maria", "Wei", "Priya", "Sam", "Olivia", "Diego"]
+LAST_NAMES = ["Doe", "Smith", "Brown", "Nguyen", "Garcia", "Patel", "Kim", "Jones", "Lee", "Clark"]
+MESSY_CELLS = np.array(["", "n/a", " 12 ", "3-5", "approx 40", "1e-05", "12-14-16"], dtype=object)
+LABEL_COL = "had_locum_next_45d"
+
+
+def _messy(values, rng, share):
+    """values as strings, with `share` of the cells replaced by messy ones."""
+    out = np.asarray(values).astype(str).astype(object)
+    hit = rng.random(len(out)) < share
+    out[hit] = MESSY_CELLS[rng.integers(0, len(MESSY_CELLS), int(hit.sum()))]
+    return out
+
+
+def _ranges(lo, hi, step, rng, n, fmt="{}-{}"):
+    start = rng.integers(lo, hi, n) // step * step
+    return np.array([fmt.format(a, a + step) for a in start], dtype=object)
+
+
+def synthetic_facilities(n: int, seed: int = 0, messy_share: float = 0.05, labels: bool = True) -> pd.DataFrame:
+    """n facility rows shaped like facility_features.csv (plus the label column when labels=True)."""
+    rng = np.random.default_rng(seed)
+    state = rng.choice(STATES, n)
+    postings_90d = rng.poisson(2, n)
+    postings_365d = postings_90d + rng.poisson(5, n)
+    last_post_days = rng.integers(1, 365, n)
+    turnover = rng.integers(5, 60, n)
+    df = pd.DataFrame({
+        "facility_id": [f"SYN-{s}-{i:07d}" for s, i in zip(state, range(n))],
+        "facility_name": [f"Synthetic Facility {i}" for i in range(n)],
+        "city": rng.choice(CITIES, n),
+        "state": state,
+        "specialty": rng.choice(SPECIALTIES, n, p=[0.7, 0.3]),
+        "lat": rng.uniform(25, 49, n).round(4),
+        "lon": rng.uniform(-124, -67, n).round(4),
+        "beds": _messy(rng.integers(20, 800, n), rng, messy_share),
+        "avg_volume": _ranges(4, 30, 2, rng, n),
+        "likely_procedures": rng.choice(PROCEDURES, n),
+        "pay_expect": _ranges(180, 240, 5, rng, n, "${}-{}/hr"),
+        "bill_expect": _ranges(210, 270, 5, rng, n, "${}-{}/hr"),
+        "active_posting": (rng.random(n) < 0.15).astype(int),
+        "postings_90d": _messy(postings_90d, rng, messy_share),
+        "postings_365d": _messy(postings_365d, rng, messy_share),
+        "last_post_days": _messy(last_post_days, rng, messy_share),
+        "competitor_postings_30d": _messy(rng.poisson(1, n), rng, messy_share),
+        "census_index": _messy(rng.normal(1.1, 0.1, n).round(2), rng, messy_share),
+        "seasonality_index": _messy(rng.normal(1.0, 0.08, n).round(2), rng, messy_share),
+        "turnover_index": _messy(turnover, rng, messy_share),
+        "credentialing_days": _messy(rng.integers(0, 90, n), rng, messy_share),
+    })
+    # blank coordinates for a few rows, as in partially geocoded exports
+    no_geo = rng.random(n) < messy_share / 5
+    df.loc[no_geo, ["lat", "lon"]] = np.nan
+    if labels:
+        z = -2.0 + 0.35 * postings_90d + 1.5 / (1 + last_post_days) + 0.02 * turnover
+        df[LABEL_COL] = (rng.random(n) < 1 / (1 + np.exp(-z))).astype(int)
+    return df
+
+
+def synthetic_contacts(facilities: pd.DataFrame, per_facility: int = 10, seed: int = 0) -> pd.DataFrame:
+    """About per_facility contacts per facility, shaped like contacts.csv (ranks, blanks and all)."""
+    rng = np.random.default_rng(seed + 1)
+    counts = rng.poisson(per_facility, len(facilities))
+    fac = np.repeat(np.arange(len(facilities)), counts)
+    n = len(fac)
+    # rank within facility: position since the facility's first row
+    rank = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    first = rng.choice(FIRST_NAMES, n)
+    last = rng.choice(LAST_NAMES, n)
+    phone = np.array([f"801-555-{x:04d}" for x in rng.integers(0, 10000, n)], dtype=object)
+    mobile = phone.copy()
+    mobile[rng.random(n) < 0.4] = ""
+    return pd.DataFrame({
+        "facility_id": facilities["facility_id"].to_numpy()[fac],
+        "specialty": facilities["specialty"].to_numpy()[fac],
+        "contact_rank": rank,
+        "first_name": first,
+        "last_name": last,
+        "title": rng.choice(TITLES, n),
+        "email": [f"{a.lower()}.{b.lower()}{i}@example.com" for i, (a, b) in enumerate(zip(first, last))],
+        "phone": phone,
+        "ext": np.where(rng.random(n) < 0.2, rng.integers(100, 999, n).astype(str), ""),
+        "mobile": mobile,
+        "last_verified": (pd.Timestamp("2025-10-01") - pd.to_timedelta(rng.integers(0, 400, n), unit="D")).strftime("%Y-%m-%d"),
+    })
+
+
+def write_synthetic(out_dir: str, n_facilities: int, contacts_per_facility: int = 10, seed: int = 0):
+    """Write facility_features.csv and contacts.csv to out_dir; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    fac = synthetic_facilities(n_facilities, seed)
+    features_path = os.path.join(out_dir, "facility_features.csv")
+    contacts_path = os.path.join(out_dir, "contacts.csv")
+    fac.to_csv(features_path, index=False)
+    synthetic_contacts(fac, contacts_per_facility, seed).to_csv(contacts_path, index=False)
+    return features_path, contacts_path
@@ -0,0 +1,87 @@
+"""Red-marker (high_likelihood) thresholds per specialty, optionally per state.
+
+Thresholds come from, lowest precedence first:
+  1. RED_THRESHOLD (global default, 0.70)
+  2. RED_THRESHOLD_<SPECIALTY> env vars, e.g. RED_THRESHOLD_HO=0.68
+  3. rows in THRESHOLDS_PATH (CSV with columns specialty,state,threshold;
+     leave state empty for a specialty-wide row), e.g.
+         specialty,state,threshold
+         HO,,0.68
+         PDH,,0.72
+         HO,UT,0.65
+
+New specialties only need a row (or env var), no code change.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import fill_text
+
+THRESHOLDS_PATH = os.environ.get("THRESHOLDS_PATH", "app/data/thresholds.csv")
+DEFAULT_RED_THRESHOLD = float(os.environ.get("RED_THRESHOLD", "0.70"))
+_ENV_PREFIX = "RED_THRESHOLD_"
+
+
+def _normalized(table):
+    table["specialty"] = table["specialty"].astype(str).str.strip()
+    table["state"] = table["state"].astype(str).str.strip().str.upper()
+    return table
+
+
+def read_threshold_file(path=THRESHOLDS_PATH):
+    """Threshold rows (specialty, state, threshold) from the table file alone, without env overrides."""
+    table = pd.DataFrame(columns=["specialty", "state", "threshold"])
+    if path and os.path.exists(path):
+        f = pd.read_csv(path, dtype={"specialty": str, "state": str})
+        f["state"] = f["state"].fillna("") if "state" in f.columns else ""
+        f["threshold"] = pd.to_numeric(f["threshold"], errors="coerce")
+        table = f[["specialty", "state", "threshold"]].dropna(subset=["specialty", "threshold"])
+    return _normalized(table).drop_duplicates(["specialty", "state"], keep="last").reset_index(drop=True)
+
+
+def load_threshold_table(path=THRESHOLDS_PATH):
+    """Threshold rows (specialty, state, threshold) from env overrides plus the table file."""
+    rows = []
+    for key, val in os.environ.items():
+        if key.startswith(_ENV_PREFIX) and key != _ENV_PREFIX:
+            try:
+                rows.append((key[len(_ENV_PREFIX):], "", float(val)))
+            except ValueError:
+                pass
+    env = _normalized(pd.DataFrame(rows, columns=["specialty", "state", "threshold"]))
+    # later rows (the file) win over earlier ones (env)
+    table = pd.concat([env, read_threshold_file(path)], ignore_index=True)
+    return table.drop_duplicates(["specialty", "state"], keep="last").reset_index(drop=True)
+
+
+def thresholds_for(df, table=None, default=DEFAULT_RED_THRESHOLD):
+    """Threshold for every row of df: (specialty, state) row, else specialty row, else default."""
+    if table is None:
+        table = load_threshold_table()
+    if table.empty:
+        return np.full(len(df), default, dtype=float)
+
+    # map over the distinct values only (categorical codes), then broadcast back to rows
+    spec = df["specialty"] if "specialty" in df.columns else pd.Series("HO", index=df.index)
+    # blank specialties match no table row and get the default, as before the table existed
+    spec = fill_text(spec).str.strip().astype("category")
+    by_spec = table[table["state"] == ""].set_index("specialty")["threshold"]
+    spec_level = pd.Series(spec.cat.categories).map(by_spec).to_numpy(dtype=float)
+    out = spec_level[spec.cat.codes.to_numpy()]
+
+    by_state = table[table["state"] != ""]
+    if not by_state.empty and "state" in df.columns:
+        pair = (spec.astype(str) + "|" + fill_text(df["state"]).str.upper()).astype("category")
+        lookup = pd.Series(by_state["threshold"].to_numpy(), index=by_state["specialty"] + "|" + by_state["state"])
+        pair_level = pd.Series(pair.cat.categories).map(lookup).to_numpy(dtype=float)
+        state_vals = pair_level[pair.cat.codes.to_numpy()]
+        out = np.where(np.isnan(state_vals), out, state_vals)
+
+    return np.where(np.isnan(out), default, out)
+
+
+def flag_high_likelihood(df, score_col="score", table=None, default=DEFAULT_RED_THRESHOLD):
+    """Boolean array: score >= the row's threshold."""
+    return df[score_col].to_numpy(dtype=float) >= thresholds_for(df, table, default)